@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Ground-truth anomaly label sidecars for generated corpora.
+
+A sidecar is a small CSV of label runs written next to the corpus. Each line
+gives the offset of the first row of a run and its scenario id. The run lasts
+until the offset on the next line. The last line carries the total row count
+and an empty label. Scenario ids are the generator block names, and
+DETECTORS maps each one to the AnomalyDetectionService anomalyType it
+targets, so detector output can be scored at any corpus size without
+re-deriving labels from the corpus itself.
+"""
+
+import csv
+from collections import deque
+from itertools import count, groupby
+from operator import itemgetter
+
+NORMAL = 'normal'
+
+# AnomalyDetectionService anomalyType each scenario targets
+DETECTORS = {
+    'high_frequency': 'unusual_request_frequency',
+    'suspicious_agents': 'unusual_user_agent',
+    'geographic': 'unusual_geographic_access',
+    'traffic_spike': 'unusual_time_patterns',
+    'tls': 'unusual_ssl_behavior',
+    'file_access': 'unusual_file_access',
+    'response_codes': 'unusual_response_codes',
+    'bandwidth': 'unusual_bandwidth_usage',
+    'url_patterns': 'unusual_url_patterns',
+    'ransomware_download': 'unusual_file_access',
+    'ransomware_encryption': 'unusual_request_frequency',
+    'insider_hr_access': 'unusual_time_patterns',
+    'insider_exfiltration': 'unusual_bandwidth_usage',
+    'botnet_registration': 'unusual_url_patterns',
+    'botnet_ddos': 'unusual_request_frequency',
+}
+
+# Runs held back from the file, so rows a writer pulled but never wrote can be dropped on close
+LOOKAHEAD = 1 << 16
+
+
+def sidecar_path(output):
+    """Default sidecar path for a corpus written to output"""
+    return f"{output}.labels.csv"
+
+
+def periodic_runs(pattern, period):
+    """Endless (offset, label) runs repeating one cycle's pattern every period rows"""
+    for base in count(0, period):
+        for offset, label in pattern:
+            yield base + offset, label
+
+
+def chunk_labels(pairs):
+    """Group a stream of (label, row) pairs into (label, rows) chunks for LabelSidecar.tag()"""
+    for label, group in groupby(pairs, key=itemgetter(0)):
+        yield label, [row for _, row in group]
+
+
+class LabelSidecar:
+    """Streams (row offset -> scenario id) runs to a sidecar file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file, lineterminator='\n')
+        self._writer.writerow(['offset', 'label'])
+        self._runs = deque()
+        self._label = None
+
+    def add(self, offset, label):
+        """Start a run of label at row offset"""
+        if label == self._label:
+            return
+        self._label = label
+        self._runs.append((offset, label))
+        if len(self._runs) > 2 * LOOKAHEAD:
+            self._flush(LOOKAHEAD)
+
+    def tag(self, chunks):
+        """Yield the rows of (label, list of rows) chunks, recording each run as its first row is pulled"""
+        for label, rows in chunks:
+            self.add(self.rows, label)
+            yield from rows
+            self.rows += len(rows)
+
+    def _flush(self, keep):
+        """Write all but the newest keep runs"""
+        runs = self._runs
+        while len(runs) > keep:
+            self._writer.writerow(runs.popleft())
+
+    def close(self, rows):
+        """Write the runs covering the first rows rows (the count the corpus writer actually wrote)"""
+        while self._runs and self._runs[-1][0] >= rows:
+            self._runs.pop()
+        self._flush(0)
+        self._writer.writerow([rows, ''])
+        self._file.close()
+
+
+def write_labels(path, runs, rows):
+    """Write a sidecar for rows rows from an (offset, label) run stream such as periodic_runs()"""
+    sidecar = LabelSidecar(path)
+    for offset, label in runs:
+        if offset >= rows:
+            break
+        sidecar.add(offset, label)
+    sidecar.close(rows)
+    print(f"Wrote anomaly labels for {rows} rows to {path}")
+
+
+def read_labels(path):
+    """Yield (start, stop, label) runs from a sidecar"""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        previous = None
+        for offset, label in reader:
+            offset = int(offset)
+            if previous is not None and offset > previous[0]:
+                yield previous[0], offset, previous[1]
+            previous = (offset, label)
+
+
+def iter_labels(path):
+    """Yield the scenario id of every row, in row order"""
+    for start, stop, label in read_labels(path):
+        for _ in range(stop - start):
+            yield label
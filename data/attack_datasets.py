@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Parametric streaming generators for the ransomware, insider-threat and IoT attack datasets.
+
+ransomware_logs.csv, insider_threat_logs.csv and iot_attack_logs.csv are small
+fixed files. Each narrative is declared here with the scenario registry, as a
+population scenario plus an attack campaign:
+- ransomware: user-2000… workstations reading mail; a compromised host
+  downloads an encryptor and then runs an encryption burst.
+- insider: emp-1000… employees on the dashboard; an insider pulls salary data
+  at night and then uploads it to cloud storage.
+- iot: an iot-device-3000… fleet reporting status with the IoT-Device/1.0 UA;
+  compromised devices register with a botnet and then join a DDoS.
+
+Population size, attacker count, the seconds between a host's normal
+requests, and the duration are all parameters, so a narrative scales to tens
+of thousands of hosts over several days. Each host reports once per period;
+attackers are population members whose campaigns are spread evenly over the
+duration, except the IoT botnet, which strikes together. The defaults
+reproduce the committed files' rows. Streams are merged in timestamp order,
+so insider_threat_logs.csv, whose two attack phases overlap, comes out
+interleaved rather than phase by phase.
+
+    python attack_datasets.py iot --users 20000 --attackers 500 --days 3 --output iot_fleet.csv.gz --labels
+"""
+
+import argparse
+import heapq
+from collections import namedtuple
+from datetime import datetime, timedelta
+from fractions import Fraction
+from itertools import count, islice, repeat
+
+from anomaly_labels import LabelSidecar, chunk_labels, sidecar_path
+from compressed_output import COMPRESSORS
+from generate_correct_logs import write_csv
+from render_tables import render_ipv4
+from scenario_merge import timestamp_key
+from scenario_registry import Scenario, compile_scenario, generate_scenario
+
+# name: dataset id; base_time: first population request
+# login / first_id: host login pattern and the id of host 0; first_ip: client IP of host 0 (host k gets first_ip + k)
+# users / period: default population size and seconds between one host's normal requests
+# first_attacker: host index of attacker 0 (user-2050 in the committed files)
+# spread: spread attacker campaigns over the duration (False: every attacker runs the campaign at once)
+# fields: {field: value} shared by every row; population: the normal-traffic scenario; campaign: attack phase scenarios
+Dataset = namedtuple('Dataset', 'name base_time login first_id first_ip users period first_attacker spread fields '
+                                'population campaign')
+
+DATASETS = {
+    'ransomware': Dataset(
+        'ransomware', datetime(2024, 1, 25, 14, 0, 0), "user-{}", 2000, "172.17.5.200", 20, 3600, 50, True,
+        {'department': "User Department", 'server_ip': "192.168.1.200"},
+        Scenario('normal', start=0, fields={
+            'url': "work.example.com/email", 'app_name': "Work Email", 'app_class': "Email", 'risk_score': "15",
+            'request_size': "256", 'response_size': "512", 'total_size': "768", 'url_class': "Email",
+            'url_super_category': "Email", 'url_category': "Email",
+        }, slots={'rule_label': "Email_Allow_{i}"}),
+        [
+            Scenario('ransomware_download', start=3600, interval=120, count=25, fields={
+                'url': "malicious.example.com/encrypt.exe", 'app_name': "Encrypt Tool", 'app_class': "Malware",
+                'risk_score': "95", 'request_size': "64", 'response_size': "10240", 'total_size': "10304",
+                'url_class': "Malware", 'url_super_category': "Malware", 'url_category': "File Download",
+            }, slots={'rule_label': "Malware_Download_{i}"}),
+            Scenario('ransomware_encryption', start=7200, interval=60, count=30, fields={
+                'url': "local.example.com/encrypt", 'app_name': "Local Encryption", 'app_class': "Local",
+                'risk_score': "98", 'request_size': "128", 'response_size': "256", 'total_size': "384",
+                'url_class': "Local", 'url_super_category': "Local", 'url_category': "Encryption", 'method': "POST",
+            }, slots={'rule_label': "Encryption_{i}"}),
+        ],
+    ),
+    'insider': Dataset(
+        'insider', datetime(2024, 1, 20, 9, 0, 0), "emp-{}", 1000, "172.17.4.100", 30, 9000, 50, True,
+        {'department': "Employee Department", 'server_ip': "192.168.1.100"},
+        Scenario('normal', start=0, fields={
+            'url': "work.example.com/dashboard", 'app_name': "Work Dashboard", 'app_class': "Productivity",
+            'risk_score': "10", 'request_size': "512", 'response_size': "1024", 'total_size': "1536",
+            'url_class': "Dashboard", 'url_super_category': "Productivity", 'url_category': "Productivity",
+        }, slots={'rule_label': "Work_Allow_{i}"}),
+        [
+            Scenario('insider_hr_access', start=64800, interval=600, count=15, fields={
+                'url': "hr.example.com/salary-data", 'app_name': "HR Salary Data", 'app_class': "HR",
+                'risk_score': "85", 'request_size': "2048", 'response_size': "4096", 'total_size': "6144",
+                'url_class': "HR Data", 'url_super_category': "HR", 'url_category': "Sensitive Data",
+            }, slots={'rule_label': "HR_Access_{i}"}),
+            Scenario('insider_exfiltration', start=72000, interval=300, count=20, fields={
+                'url': "cloud.example.com/upload", 'app_name': "Cloud Upload", 'app_class': "Cloud Storage",
+                'risk_score': "90", 'request_size': "1024", 'response_size': "51200", 'total_size': "52224",
+                'url_class': "Cloud", 'url_super_category': "Cloud Storage", 'url_category': "File Upload",
+                'method': "POST",
+            }, slots={'rule_label': "Cloud_Upload_{i}"}),
+        ],
+    ),
+    'iot': Dataset(
+        'iot', datetime(2024, 1, 30, 10, 0, 0), "iot-device-{}", 3000, "172.17.6.100", 25, 6000, 50, False,
+        # 192.168.1.300 is not a valid address; it is kept verbatim from iot_attack_logs.csv
+        {'department': "IoT Department", 'server_ip': "192.168.1.300", 'user_agent': "IoT-Device/1.0"},
+        Scenario('normal', start=0, fields={
+            'url': "iot.example.com/status", 'app_name': "IoT Status", 'app_class': "IoT", 'risk_score': "20",
+            'request_size': "64", 'response_size': "128", 'total_size': "192", 'url_class': "IoT",
+            'url_super_category': "IoT", 'url_category': "IoT",
+        }, slots={'rule_label': "IoT_Status_{i}"}),
+        [
+            Scenario('botnet_registration', start=6000, interval=120, count=35, fields={
+                'url': "botnet.example.com/register", 'app_name': "Botnet Registration", 'app_class': "Botnet",
+                'risk_score': "99", 'request_size': "32", 'response_size': "64", 'total_size': "96",
+                'url_class': "Botnet", 'url_super_category': "Botnet", 'url_category': "Botnet", 'method': "POST",
+            }, slots={'rule_label': "Botnet_Register_{i}"}),
+            Scenario('botnet_ddos', start=10200, interval=60, count=40, fields={
+                'url': "target.example.com/", 'app_name': "Target Website", 'app_class': "DDoS", 'risk_score': "100",
+                'request_size': "16", 'response_size': "32", 'total_size': "48", 'url_class': "DDoS",
+                'url_super_category': "DDoS", 'url_category': "DDoS",
+            }, slots={'rule_label': "DDoS_Attack_{i}"}),
+        ],
+    ),
+}
+
+
+def _pack(ip):
+    """Packed 32-bit value of a dotted quad"""
+    a, b, c, d = map(int, ip.split('.'))
+    return a << 24 | b << 16 | c << 8 | d
+
+
+def host_login(dataset, host):
+    """Login of population host index host"""
+    return dataset.login.format(dataset.first_id + host)
+
+
+def host_ip(dataset, host):
+    """Client IP of population host index host"""
+    return render_ipv4(_pack(dataset.first_ip) + host)
+
+
+def attacker_hosts(dataset, users, attackers):
+    """Host indices of the attackers, spread across the population (attacker 0 is always first_attacker)"""
+    stride = max(1, users // attackers)
+    return [dataset.first_attacker + a * stride for a in range(attackers)]
+
+
+def population_stream(dataset, users, period, rounds):
+    """Yield rounds of normal traffic, each host reporting once per period, forever if rounds is None"""
+    scenario = dataset.population._replace(
+        count=users,
+        interval=Fraction(period, users),
+        fields={**dataset.fields, **dataset.population.fields},
+        slots={
+            **dataset.population.slots,
+            'login': lambda k: host_login(dataset, k),
+            'client_ip': lambda k: host_ip(dataset, k),
+        },
+    )
+    compiled = compile_scenario(scenario)
+    for r in count() if rounds is None else range(rounds):
+        yield from generate_scenario(compiled, dataset.base_time + timedelta(seconds=r * period))
+
+
+def campaign_streams(dataset, host, start):
+    """One time-sorted stream per attack phase of the campaign run by host, start seconds after base_time"""
+    identity = {'login': host_login(dataset, host), 'client_ip': host_ip(dataset, host)}
+    base_time = dataset.base_time + timedelta(seconds=start)
+    streams = []
+    for phase in dataset.campaign:
+        compiled = compile_scenario(phase._replace(fields={**dataset.fields, **phase.fields, **identity}))
+        streams.append((phase.name, generate_scenario(compiled, base_time)))
+    return streams
+
+
+def stream_dataset(name, rows=None, users=None, attackers=1, period=None, duration=None, labelled=False):
+    """
+    Yield a scaled attack dataset in timestamp order.
+
+    duration (seconds) defaults to one period, i.e. every host reports once as in the committed
+    files; None rows stops when the duration is covered. With labelled, yield (scenario id, row) pairs.
+    """
+    dataset = DATASETS[name]
+    users = users or dataset.users
+    period = period or dataset.period
+    duration = duration or period
+    streams = [('normal', population_stream(dataset, users, period, max(1, duration // period)))]
+    for a, host in enumerate(attacker_hosts(dataset, users, attackers)):
+        start = a * duration // attackers if dataset.spread else 0
+        streams.extend(campaign_streams(dataset, host, start))
+    if labelled:
+        merged = heapq.merge(*[zip(repeat(label), stream) for label, stream in streams],
+                             key=lambda pair: timestamp_key(pair[1]))
+    else:
+        merged = heapq.merge(*[stream for _, stream in streams], key=timestamp_key)
+    return islice(merged, rows)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Generate scaled ransomware, insider-threat and IoT attack datasets")
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('--output', help="output CSV path (default: <dataset>_scaled_logs.csv)")
+    parser.add_argument('--rows', type=int, help="stop after this many rows")
+    parser.add_argument('--users', type=int, help="hosts in the population (users, employees or devices)")
+    parser.add_argument('--attackers', type=int, default=1, help="hosts running the attack campaign")
+    parser.add_argument('--period', type=int, help="seconds between one host's normal requests")
+    parser.add_argument('--days', type=float, help="duration of the population traffic (default: one period)")
+    parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the output (implied by a .gz/.bz2/.xz --output)")
+    parser.add_argument('--labels', action='store_true', help="write ground-truth scenario labels to <output>.labels.csv")
+    args = parser.parse_args()
+
+    output = args.output or f"{args.dataset}_scaled_logs.csv"
+    duration = int(args.days * 86400) if args.days else None
+    logs = stream_dataset(args.dataset, args.rows, args.users, args.attackers, args.period, duration, args.labels)
+    if args.labels:
+        sidecar = LabelSidecar(sidecar_path(output))
+        logs = sidecar.tag(chunk_labels(logs))
+    total = write_csv(logs, output, compression=args.compress)
+    if args.labels:
+        sidecar.close(total)
+        print(f"Wrote anomaly labels for {total} rows to {sidecar.path}")
+
+
+if __name__ == "__main__":
+    main()
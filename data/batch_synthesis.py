@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Columnar batch synthesis of background traffic in the 34-field layout.
+
+Instead of drawing every field row by row, whole columns (timestamps, server
+IPs and the user/company/URL/user-agent combination) are drawn at once and the
+rows are assembled from precomputed per-combination field tuples. NumPy is used
+for the draws when it is installed; otherwise the stdlib random.Random batch
+APIs are used with the same column layout.
+"""
+
+import random
+from datetime import timedelta
+from itertools import islice, repeat
+
+from generate_correct_logs import BASE_TIME, companies, departments, normal_urls, normal_user_agents
+from render_tables import DOTTED_OCTETS, HMS, OCTETS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; fall back to stdlib batch draws
+    np = None
+
+# Seconds between consecutive background rows (matches the normal traffic block)
+INTERVAL = 2
+
+# Rows drawn per column batch; small batches keep the column lists cache-resident
+BATCH_SIZE = 4096
+
+USER_IDS = range(1, 9)
+
+
+def _build_columns():
+    """Precompute every field for each (user, company, url, user agent) combination, column by column"""
+    rows = []
+    for user_id in USER_IDS:
+        dept = departments[user_id % len(departments)]
+        for company in companies:
+            login = f"{dept.lower()}-{company.lower().replace(' ', '-')}"
+            for url, url_name, url_cat, risk_score, req_size, resp_size, total_size, category, super_cat, url_class in normal_urls:
+                for user_agent in normal_user_agents:
+                    rows.append((
+                        None, login, "HTTP", url, "Allowed", url_name, url_cat, risk_score, req_size,
+                        resp_size, total_size, url_class, super_cat, category, "None", "None", "0",
+                        "None", "None", login, f"{dept} Department", f"172.17.3.{100 + user_id}",
+                        None, "GET", "200", user_agent, "None", "URLFilter", f"URL_Allow_{user_id}",
+                        "Other", "None", "NA", "NA", "N/A",
+                    ))
+    # A column is either one constant string or a table indexed by combination;
+    # identical columns (login appears twice) share one table
+    tables = {}
+    columns = []
+    for values in zip(*rows):
+        if len(set(values)) == 1:
+            columns.append(values[0])
+        else:
+            columns.append(tables.setdefault(values, list(values)))
+    return columns, len(rows)
+
+
+# Fields 0 (timestamp) and 22 (server IP) are drawn per row and filled in separately
+_COLUMNS, _COMBINATIONS = _build_columns()
+
+# Octet strings for the four server IP positions, with the dots already attached
+_OCTET_TABLES = [DOTTED_OCTETS] * 3 + [OCTETS]
+
+if np is not None:
+    _OCTET_ARRAYS = [np.array(table, dtype=object) for table in _OCTET_TABLES]
+
+
+def _timestamp_column(base_time, start, count):
+    """Render timestamps for rows [start, start + count) spaced INTERVAL seconds apart"""
+    column = []
+    offset = start * INTERVAL
+    end = (start + count) * INTERVAL
+    hms = HMS
+    while offset < end:
+        day_start = base_time + timedelta(seconds=offset)
+        prefix = day_start.strftime("%a %b %d ")
+        suffix = day_start.strftime(" %Y")
+        second = day_start.hour * 3600 + day_start.minute * 60 + day_start.second
+        day_rows = min((86400 - second + INTERVAL - 1) // INTERVAL, (end - offset) // INTERVAL)
+        column.extend([prefix + hms[s] + suffix for s in range(second, second + day_rows * INTERVAL, INTERVAL)])
+        offset += day_rows * INTERVAL
+    return column
+
+
+def _draw_columns(rng, count):
+    """Draw the combination index column and the four server IP octet string columns for count rows"""
+    if np is not None:
+        combos = rng.integers(0, _COMBINATIONS, count).tolist()
+        octets = rng.integers(1, 256, (4, count))
+        return combos, [table.take(column).tolist() for table, column in zip(_OCTET_ARRAYS, octets)]
+    combos = rng.choices(range(_COMBINATIONS), k=count)
+    octets = [rng.choices(table[1:], k=count) for table in _OCTET_TABLES]
+    return combos, octets
+
+
+def make_rng(seed):
+    """Create the column draw generator used by synthesize_background()"""
+    if np is not None:
+        return np.random.default_rng(seed)
+    return random.Random(seed)
+
+
+def synthesize_background(rng, count, start=0, base_time=BASE_TIME):
+    """Synthesize background rows [start, start + count) by zipping whole columns"""
+    combos, octets = _draw_columns(rng, count)
+    drawn = {}
+    columns = []
+    for column in _COLUMNS:
+        if isinstance(column, list):
+            key = id(column)
+            if key not in drawn:
+                drawn[key] = [column[k] for k in combos]
+            columns.append(drawn[key])
+        else:
+            columns.append(repeat(column, count))
+    columns[0] = _timestamp_column(base_time, start, count)
+    columns[22] = list(map(''.join, zip(*octets)))
+    return zip(*columns)
+
+
+def stream_background(rows=None, seed=0, start=0, base_time=BASE_TIME, batch_size=BATCH_SIZE):
+    """Yield background rows lazily, batch_size rows at a time, forever if rows is None"""
+    rng = make_rng(seed)
+
+    def batches():
+        position = start
+        while True:
+            yield from synthesize_background(rng, batch_size, position, base_time)
+            position += batch_size
+
+    return islice(batches(), rows)
+
+
+def shard_background(start, stop, rng):
+    """Yield background rows [start, stop), used as the sharded row source"""
+    return stream_background(stop - start, seed=rng.getrandbits(64), start=start)
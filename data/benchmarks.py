@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the corpus generators and writers, with regression tracking.
+
+Each benchmark writes a corpus of a given row count and is timed end to end.
+Each case runs in a fresh interpreter, so its peak RSS (resource.getrusage)
+is its own. The suite records:
+- rows/sec
+- output MB/sec
+- peak RSS
+- with --tracemalloc, the peak of Python allocations, measured in a
+  separate traced run because tracing slows the generators down several
+  times
+
+New writers register with the @benchmark decorator. The results go to JSON,
+and `compare` flags any case whose rows/sec dropped, or whose peak memory
+grew, by more than --threshold against a stored baseline. It exits non-zero
+when it finds a regression:
+
+    python benchmarks.py run --sizes 1K,100K --output baseline.json
+    python benchmarks.py run --sizes 1K,100K --output current.json
+    python benchmarks.py compare baseline.json current.json --threshold 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from batch_synthesis import np, stream_background
+from columnar_corpus import write_columnar
+from generate_comprehensive_test import generate_comprehensive_test_logs
+from generate_correct_logs import stream_correct_logs, write_csv
+from scenario_merge import merged_logs
+
+DEFAULT_SIZES = '1K,100K,10M'
+
+DEFAULT_THRESHOLD = 0.2
+
+_SUFFIXES = {'K': 1000, 'M': 1000000}
+
+# name -> (function(rows, output path), output file suffix)
+BENCHMARKS = {}
+
+
+def benchmark(name, suffix='.csv'):
+    """Register function(rows, path) as a benchmark case writing rows rows to path"""
+    def register(function):
+        BENCHMARKS[name] = (function, suffix)
+        return function
+    return register
+
+
+@benchmark('correct_logs')
+def bench_correct_logs(rows, path):
+    write_csv(stream_correct_logs(rows, rng=random.Random(0)), path)
+
+
+@benchmark('comprehensive_test_logs')
+def bench_comprehensive_test_logs(rows, path):
+    generate_comprehensive_test_logs(path, rows=rows)
+
+
+@benchmark('background_batch')
+def bench_background_batch(rows, path):
+    write_csv(stream_background(rows), path)
+
+
+@benchmark('merged_scenarios')
+def bench_merged_scenarios(rows, path):
+    write_csv(merged_logs(rows), path)
+
+
+@benchmark('write_csv_quote_all')
+def bench_write_csv_quote_all(rows, path):
+    write_csv(stream_background(rows), path, quote_all=True)
+
+
+@benchmark('write_csv_gzip', suffix='.csv.gz')
+def bench_write_csv_gzip(rows, path):
+    write_csv(stream_background(rows), path)
+
+
+@benchmark('write_columnar', suffix='')
+def bench_write_columnar(rows, path):
+    write_columnar(stream_background(rows), path)
+
+
+def parse_count(text):
+    """Row count of a size such as 1K, 100K, 10M or 2500"""
+    text = text.strip().upper()
+    if text[-1:] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def _output_bytes(path):
+    """Bytes on disk of a file or a columnar corpus directory"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes, or None where resource is unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(name, rows, directory, trace=False):
+    """Run one case in this process and return its measurements"""
+    function, suffix = BENCHMARKS[name]
+    path = os.path.join(directory, f"{name}_{rows}{suffix or '.col'}")
+    if trace:
+        import tracemalloc
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function(rows, path)
+    seconds = time.perf_counter() - start
+    result = {'rows': rows, 'seconds': round(seconds, 4), 'output_bytes': _output_bytes(path)}
+    if trace:
+        result['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    else:
+        result['rows_per_sec'] = round(rows / seconds, 1)
+        result['mb_per_sec'] = round(result['output_bytes'] / seconds / 1e6, 3)
+        result['peak_rss_bytes'] = _peak_rss()
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+    return result
+
+
+def measure_isolated(name, rows, directory, trace=False):
+    """Run one case in a fresh interpreter so its peak RSS is its own"""
+    command = [sys.executable, os.path.abspath(__file__), '_measure', name, str(rows), directory]
+    if trace:
+        command.append('--trace')
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def run_suite(names, sizes, directory, repeat=1, trace=False):
+    """Measure every case at every size (best of repeat runs); return the results document"""
+    results = {}
+    for name in names:
+        for rows in sizes:
+            runs = [measure_isolated(name, rows, directory) for _ in range(repeat)]
+            best = max(runs, key=lambda run: run['rows_per_sec'])
+            best['peak_rss_bytes'] = min(run['peak_rss_bytes'] or 0 for run in runs) or None
+            if trace:
+                best['traced_peak_bytes'] = measure_isolated(name, rows, directory, trace=True)['traced_peak_bytes']
+            results[f"{name}@{rows}"] = best
+            rss = best['peak_rss_bytes']
+            print(f"{name:>24} {rows:>10} rows  {best['rows_per_sec']:>12,.0f} rows/s  "
+                  f"{best['mb_per_sec']:>8.2f} MB/s  peak RSS {rss / 1e6 if rss else 0:>8.1f} MB", file=sys.stderr)
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__ if np is not None else None,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """(case, metric, baseline value, current value, relative change) for every regression beyond threshold"""
+    regressions = []
+    for case, base in baseline['results'].items():
+        now = current['results'].get(case)
+        if now is None:
+            continue
+        # Lower throughput or higher memory is worse
+        for metric, worse in (('rows_per_sec', -1), ('peak_rss_bytes', 1), ('traced_peak_bytes', 1)):
+            if not base.get(metric) or not now.get(metric):
+                continue
+            change = (now[metric] - base[metric]) / base[metric]
+            if change * worse > threshold:
+                regressions.append((case, metric, base[metric], now[metric], change))
+    return regressions
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the corpus generators and writers")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmark suite")
+    run_parser.add_argument('--cases', help=f"comma-separated cases (default: all of {', '.join(BENCHMARKS)})")
+    run_parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"comma-separated row counts (default: {DEFAULT_SIZES})")
+    run_parser.add_argument('--repeat', type=int, default=1, help="runs per case, keeping the fastest")
+    run_parser.add_argument('--tracemalloc', action='store_true', help="also measure peak Python allocations")
+    run_parser.add_argument('--dir', help="where the corpora are written (default: a temp dir)")
+    run_parser.add_argument('--output', default='benchmark_results.json', help="results JSON path")
+
+    compare_parser = commands.add_parser('compare', help="flag regressions against a baseline")
+    compare_parser.add_argument('baseline', help="baseline results JSON")
+    compare_parser.add_argument('current', help="current results JSON")
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help=f"relative change that counts as a regression (default: {DEFAULT_THRESHOLD})")
+
+    measure_parser = commands.add_parser('_measure', help=argparse.SUPPRESS)
+    measure_parser.add_argument('name')
+    measure_parser.add_argument('rows', type=int)
+    measure_parser.add_argument('directory')
+    measure_parser.add_argument('--trace', action='store_true')
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    if args.command == '_measure':
+        print(json.dumps(measure(args.name, args.rows, args.directory, args.trace)))
+    elif args.command == 'run':
+        names = args.cases.split(',') if args.cases else list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            sys.exit(f"Unknown cases: {', '.join(unknown)}")
+        sizes = [parse_count(size) for size in args.sizes.split(',')]
+        directory = args.dir or tempfile.mkdtemp(prefix='benchmarks_')
+        try:
+            document = run_suite(names, sizes, directory, args.repeat, args.tracemalloc)
+        finally:
+            if not args.dir:
+                shutil.rmtree(directory, ignore_errors=True)
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"Wrote results for {len(document['results'])} cases to {args.output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for case, metric, before, after, change in regressions:
+            print(f"REGRESSION {case} {metric}: {before:,} -> {after:,} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} across {len(current['results'])} cases")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Configurable key cardinality with Zipf popularity for background traffic.
+
+The stock generators draw from a handful of users, URLs and 172.17.3.x client
+IPs, so the per-key grouping in AnomalyDetectionService never sees realistic
+key counts. Here every keyed column (users, client IPs, server IPs, URLs) has
+its own number of distinct keys and a Zipf skew, sampled through a
+precomputed Walker/Vose alias table so a draw stays O(1) with millions of
+keys. Keys are rendered on the fly from their index, so no per-key strings
+are stored.
+"""
+
+from array import array
+from collections import namedtuple
+from itertools import islice, repeat
+
+from batch_synthesis import BATCH_SIZE, _timestamp_column, make_rng
+from generate_correct_logs import BASE_TIME, departments, normal_urls, normal_user_agents
+from render_tables import render_ipv4_column
+
+try:
+    import numpy as np
+    from batch_synthesis import _OCTET_ARRAYS
+except ImportError:  # NumPy is optional; fall back to per-draw alias sampling
+    np = None
+
+# Distinct keys per keyed column and the Zipf exponent of their popularity (0 = uniform)
+Cardinality = namedtuple('Cardinality', 'users client_ips server_ips urls skew')
+
+DEFAULT_CARDINALITY = Cardinality(users=1000, client_ips=1000, server_ips=10000, urls=10000, skew=1.0)
+
+# Server IP indices are scattered over 255**4 addresses by a multiplier coprime to it
+_SERVER_SPACE = 255 ** 4
+_SERVER_SCATTER = 2654435761
+
+# Client IPs are allocated sequentially from 10.0.0.1
+_CLIENT_BASE = (10 << 24) + 1
+
+_DEPARTMENT_LABELS = [f"{dept} Department" for dept in departments]
+
+
+def zipf_weights(n, skew):
+    """Popularity weight of each of n keys ranked by index, proportional to 1 / rank**skew"""
+    return [1.0 / (rank ** skew) for rank in range(1, n + 1)]
+
+
+class AliasTable:
+    """Walker/Vose alias table for O(1) sampling from a fixed discrete distribution"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        prob = array('d', [1.0]) * n
+        alias = array('l', range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        self.size = n
+        self.prob = prob
+        self.alias = alias
+        if np is not None:
+            self._prob = np.frombuffer(prob, dtype=np.float64)
+            self._alias = np.frombuffer(alias, dtype=np.int64 if alias.itemsize == 8 else np.int32)
+
+    def sample(self, rng, count):
+        """Draw count key indices as a list"""
+        if np is not None:
+            slots = rng.integers(0, self.size, count)
+            keep = rng.random(count) < self._prob.take(slots)
+            return np.where(keep, slots, self._alias.take(slots)).tolist()
+        prob = self.prob
+        alias = self.alias
+        draw = rng.random
+        n = self.size
+        out = []
+        for _ in range(count):
+            slot = int(draw() * n)
+            out.append(slot if draw() < prob[slot] else alias[slot])
+        return out
+
+
+def build_samplers(cardinality):
+    """Build one alias table per keyed column"""
+    return {
+        column: AliasTable(zipf_weights(getattr(cardinality, column), cardinality.skew))
+        for column in ('users', 'client_ips', 'server_ips', 'urls')
+    }
+
+
+def _client_ips(indices):
+    """Render client IP indices as 10.x.y.z addresses"""
+    if np is not None:
+        return _render_packed(np.asarray(indices, dtype=np.int64) + _CLIENT_BASE)
+    return _render_packed([_CLIENT_BASE + i for i in indices])
+
+
+def _server_ips(indices):
+    """Render server IP indices as scattered addresses with every octet in 1-255"""
+    if np is not None:
+        s = np.asarray(indices, dtype=np.uint64) * np.uint64(_SERVER_SCATTER) % np.uint64(_SERVER_SPACE)
+        s = s.astype(np.int64)
+        packed = ((s // 16581375 + 1) << 24) | ((s // 65025 % 255 + 1) << 16) | ((s // 255 % 255 + 1) << 8) | (s % 255 + 1)
+        return _render_packed(packed)
+    packed = []
+    for i in indices:
+        s = i * _SERVER_SCATTER % _SERVER_SPACE
+        packed.append(((s // 16581375 + 1) << 24) | ((s // 65025 % 255 + 1) << 16) | ((s // 255 % 255 + 1) << 8) | (s % 255 + 1))
+    return _render_packed(packed)
+
+
+def _render_packed(packed):
+    """Render packed 32-bit addresses as dotted quads"""
+    if np is not None:
+        packed = np.asarray(packed, dtype=np.int64)
+        octets = (packed >> 24, packed >> 16 & 255, packed >> 8 & 255, packed & 255)
+        return list(map(''.join, zip(*[table.take(o).tolist() for table, o in zip(_OCTET_ARRAYS, octets)])))
+    return render_ipv4_column(packed)
+
+
+def synthesize_skewed(rng, samplers, count, start=0, base_time=BASE_TIME):
+    """Synthesize background rows [start, start + count) with keyed columns drawn from the alias tables"""
+    users = samplers['users'].sample(rng, count)
+    urls = samplers['urls'].sample(rng, count)
+    logins = list(map("user-{}".format, users))
+    depts = [_DEPARTMENT_LABELS[u % len(departments)] for u in users]
+    url_rows = [normal_urls[u % len(normal_urls)] for u in urls]
+    url, url_name, url_cat, risk_score, req_size, resp_size, total_size, category, super_cat, url_class = zip(*url_rows)
+    if np is not None:
+        agents = rng.integers(0, len(normal_user_agents), count).tolist()
+    else:
+        agents = rng.choices(range(len(normal_user_agents)), k=count)
+    return zip(
+        _timestamp_column(base_time, start, count),
+        logins,
+        repeat("HTTP"),
+        list(map("site{}.{}".format, urls, url)),
+        repeat("Allowed"),
+        url_name,
+        url_cat,
+        risk_score,
+        req_size,
+        resp_size,
+        total_size,
+        url_class,
+        super_cat,
+        category,
+        repeat("None"),
+        repeat("None"),
+        repeat("0"),
+        repeat("None"),
+        repeat("None"),
+        logins,
+        depts,
+        _client_ips(samplers['client_ips'].sample(rng, count)),
+        _server_ips(samplers['server_ips'].sample(rng, count)),
+        repeat("GET"),
+        repeat("200"),
+        [normal_user_agents[k] for k in agents],
+        repeat("None"),
+        repeat("URLFilter"),
+        list(map("URL_Allow_{}".format, users)),
+        repeat("Other"),
+        repeat("None"),
+        repeat("NA"),
+        repeat("NA"),
+        repeat("N/A"),
+    )
+
+
+def stream_skewed_background(rows=None, seed=0, start=0, base_time=BASE_TIME,
+                             cardinality=DEFAULT_CARDINALITY, batch_size=BATCH_SIZE):
+    """Yield high-cardinality background rows lazily, forever if rows is None"""
+    rng = make_rng(seed)
+    samplers = build_samplers(cardinality)
+
+    def batches():
+        position = start
+        while True:
+            yield from synthesize_skewed(rng, samplers, batch_size, position, base_time)
+            position += batch_size
+
+    return islice(batches(), rows)
+
+
+def shard_skewed_background(start, stop, rng, cardinality=DEFAULT_CARDINALITY):
+    """Yield high-cardinality background rows [start, stop); bind cardinality with functools.partial for sharding"""
+    return stream_skewed_background(stop - start, seed=rng.getrandbits(64), start=start, cardinality=cardinality)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Dictionary-encoded columnar binary corpus format with a memory-mapped reader.
+
+A corpus is a directory holding one fixed-width code file per column plus a
+meta.json. Categorical columns store per-column dictionaries and the smallest
+unsigned code width that fits them (1, 2 or 4 bytes). The timestamp column
+stores int64 epoch seconds. IP columns store packed IPv4 addresses as int64;
+values that are not canonical dotted quads go to a small exception dictionary
+(stored as 2**32 + code). The reader memory-maps every code file and
+casts it to a typed memoryview without copying. Any row range can be rendered
+back into the exact CSV text that was encoded.
+
+    python columnar_corpus.py encode corpus.csv corpus.zcol
+    python columnar_corpus.py render corpus.zcol --start 1000 --stop 1010
+"""
+
+import argparse
+import io
+import json
+import mmap
+import os
+import sys
+from array import array
+from itertools import islice
+
+from compressed_output import iter_rows, sniff_format
+from fast_csv import FastCSVWriter, unsafe_columns
+from render_tables import DayCache, pack_ipv4, render_ipv4
+
+FORMAT_VERSION = 1
+
+# Column kinds of the 34-field layout; every other column is dictionary encoded
+DEFAULT_KINDS = {0: 'time', 21: 'ipv4', 22: 'ipv4'}
+
+# Rows buffered per column before codes are appended to disk
+BATCH_ROWS = 65536
+
+_IPV4_EXCEPTION = 1 << 32
+
+
+class _Dictionary(dict):
+    """Value -> code mapping that assigns the next code to unseen values"""
+
+    def __missing__(self, value):
+        code = self[value] = len(self)
+        return code
+
+
+class ColumnarCorpusWriter:
+    """Encode rows into a columnar corpus directory"""
+
+    def __init__(self, path, columns=34, kinds=None, quote_all=False, lineterminator='\r\n', header=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.columns = columns
+        self.header = header
+        self.kinds = [(DEFAULT_KINDS if kinds is None else kinds).get(i, 'dict') for i in range(columns)]
+        self.quote_all = quote_all
+        self.lineterminator = lineterminator
+        self.rows = 0
+        self._days = DayCache()
+        self._dictionaries = [_Dictionary() for _ in range(columns)]
+        self._files = [open(os.path.join(path, f"col{i:02d}.codes"), 'wb') for i in range(columns)]
+
+    def writerows(self, rows):
+        """Encode rows, returning how many were written"""
+        it = iter(rows)
+        written = 0
+        while True:
+            batch = list(islice(it, BATCH_ROWS))
+            if not batch:
+                return written
+            if any(len(row) != self.columns for row in batch):
+                raise ValueError(f"Every row must have {self.columns} fields")
+            for index, values in enumerate(zip(*batch)):
+                self._encode_column(index, values)
+            self.rows += len(batch)
+            written += len(batch)
+
+    def _encode_column(self, index, values):
+        """Append the codes of one column batch"""
+        kind = self.kinds[index]
+        dictionary = self._dictionaries[index]
+        if kind == 'time':
+            codes = array('q', map(self._days.epoch, values))
+        elif kind == 'ipv4':
+            codes = array('q')
+            for value in values:
+                packed = pack_ipv4(value)
+                if packed is None:
+                    packed = _IPV4_EXCEPTION + dictionary[value]
+                codes.append(packed)
+        else:
+            codes = array('I', map(dictionary.__getitem__, values))
+        codes.tofile(self._files[index])
+
+    def close(self):
+        """Narrow dictionary code files to the smallest width and write the metadata"""
+        meta_columns = []
+        for index, f in enumerate(self._files):
+            f.close()
+            name = f"col{index:02d}.codes"
+            kind = self.kinds[index]
+            dictionary = list(self._dictionaries[index])
+            typecode = 'q'
+            if kind == 'dict':
+                typecode = 'B' if len(dictionary) <= 1 << 8 else 'H' if len(dictionary) <= 1 << 16 else 'I'
+                if typecode != 'I':
+                    self._narrow(os.path.join(self.path, name), typecode)
+            meta_columns.append({'kind': kind, 'file': name, 'typecode': typecode, 'itemsize': array(typecode).itemsize})
+            with open(os.path.join(self.path, f"col{index:02d}.dict.json"), 'w', encoding='utf-8') as out:
+                json.dump(dictionary, out)
+        meta = {
+            'version': FORMAT_VERSION,
+            'rows': self.rows,
+            'byteorder': sys.byteorder,
+            'quote_all': self.quote_all,
+            'lineterminator': self.lineterminator,
+            'header': self.header,
+            'columns': meta_columns,
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w', encoding='utf-8') as out:
+            json.dump(meta, out, indent=2)
+
+    @staticmethod
+    def _narrow(path, typecode):
+        """Rewrite a uint32 code file with a narrower element type, chunk by chunk"""
+        narrowed = path + '.tmp'
+        with open(path, 'rb') as src, open(narrowed, 'wb') as dst:
+            while True:
+                chunk = array('I')
+                chunk.frombytes(src.read(BATCH_ROWS * chunk.itemsize))
+                if not chunk:
+                    break
+                array(typecode, chunk).tofile(dst)
+        os.replace(narrowed, path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in self._files:
+                f.close()
+
+
+class ColumnarCorpus:
+    """Memory-mapped, zero-copy reader for a columnar corpus directory"""
+
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar corpus version: {meta['version']}")
+        if meta['byteorder'] != sys.byteorder:
+            raise ValueError(f"Corpus was written on a {meta['byteorder']}-endian machine")
+        self.path = path
+        self.rows = meta['rows']
+        self.quote_all = meta['quote_all']
+        self.lineterminator = meta['lineterminator']
+        self.header = meta['header']
+        self.kinds = [column['kind'] for column in meta['columns']]
+        self._days = DayCache()
+        self._maps = []
+        self.codes = []
+        self.dictionaries = []
+        for index, column in enumerate(meta['columns']):
+            with open(os.path.join(path, f"col{index:02d}.dict.json"), encoding='utf-8') as f:
+                self.dictionaries.append(json.load(f))
+            if self.rows == 0:
+                self.codes.append(memoryview(array(column['typecode'])))
+                continue
+            with open(os.path.join(path, column['file']), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.append(mapped)
+            self.codes.append(memoryview(mapped).cast(column['typecode']))
+
+    def __len__(self):
+        return self.rows
+
+    def _decoders(self):
+        """One code -> text function per column"""
+        decoders = []
+        for kind, dictionary in zip(self.kinds, self.dictionaries):
+            if kind == 'time':
+                decoders.append(self._days.render)
+            elif kind == 'ipv4':
+                decoders.append(lambda code, d=dictionary: render_ipv4(code) if code < _IPV4_EXCEPTION else d[code - _IPV4_EXCEPTION])
+            else:
+                decoders.append(dictionary.__getitem__)
+        return decoders
+
+    def iter_rows(self, start=0, stop=None):
+        """Decode rows [start, stop) as lists of strings"""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        decoders = self._decoders()
+        for begin in range(start, stop, BATCH_ROWS):
+            end = min(begin + BATCH_ROWS, stop)
+            columns = [list(map(decode, codes[begin:end])) for decode, codes in zip(decoders, self.codes)]
+            yield from map(list, zip(*columns))
+
+    def write_csv(self, target, start=0, stop=None, header=False):
+        """Stream the exact CSV of rows [start, stop) to target (path or binary file); return the rows written"""
+        # Timestamps and packed IPs never need quoting, so only dictionary values are inspected
+        with FastCSVWriter(target, self.quote_all, unsafe_columns(self.dictionaries),
+                           lineterminator=self.lineterminator) as writer:
+            if header and self.header is not None:
+                writer.writerow(self.header)
+            return writer.writerows(self.iter_rows(start, stop))
+
+    def render_csv(self, start=0, stop=None, header=False):
+        """Exact CSV text of rows [start, stop), preceded by the header row if asked for and one was stored"""
+        buffer = io.BytesIO()
+        self.write_csv(buffer, start, stop, header)
+        return buffer.getvalue().decode('utf-8')
+
+    def close(self):
+        """Release the memory maps"""
+        for codes in self.codes:
+            codes.release()
+        for mapped in self._maps:
+            mapped.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_columnar(logs, path, columns=34, header=None):
+    """Encode logs (any iterable of rows) into a columnar corpus, returning the row count"""
+    with ColumnarCorpusWriter(path, columns, header=header) as writer:
+        count = writer.writerows(logs)
+    print(f"Encoded {count} log entries into {path}")
+    return count
+
+
+def main():
+    """Encode a CSV corpus or render rows from a columnar one"""
+    parser = argparse.ArgumentParser(description="Dictionary-encoded columnar corpus tools")
+    commands = parser.add_subparsers(dest='command', required=True)
+    encode = commands.add_parser('encode', help="encode a (possibly compressed) CSV corpus")
+    encode.add_argument('source')
+    encode.add_argument('target')
+    encode.add_argument('--header', action='store_true', help="the first source row is a header (detected when it has no timestamp)")
+    render = commands.add_parser('render', help="print rows [start, stop) as CSV")
+    render.add_argument('corpus')
+    render.add_argument('--start', type=int, default=0)
+    render.add_argument('--stop', type=int)
+    render.add_argument('--header', action='store_true', help="print the stored header row first")
+    args = parser.parse_args()
+
+    if args.command == 'encode':
+        # Quoting and line terminator are read from the source, so rendering gives back its exact text
+        quote_all, lineterminator, has_header = sniff_format(args.source)
+        rows = iter_rows(args.source)
+        header = next(rows, None) if args.header or has_header else None
+        first = next(rows, None)
+        columns = len(first) if first is not None else len(header) if header else 34
+        with ColumnarCorpusWriter(args.target, columns, quote_all=quote_all, lineterminator=lineterminator,
+                                  header=header) as writer:
+            if first is not None:
+                writer.writerows([first])
+            writer.writerows(rows)
+        print(f"Encoded {writer.rows} rows into {args.target}")
+    else:
+        with ColumnarCorpus(args.corpus) as corpus:
+            sys.stdout.flush()
+            corpus.write_csv(sys.stdout.buffer, args.start, args.stop, args.header)
+            sys.stdout.buffer.flush()
+
+
+if __name__ == "__main__":
+    main()
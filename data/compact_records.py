@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory rows for sorting, merging and slicing corpora in process.
+
+A generated row is a list of 34 str objects, about 0.7 KB each, and a row
+read back from CSV takes over 2 KB. RowBatch keeps rows column-wise in typed
+arrays instead, at well under a tenth of that:
+- the timestamp as int64 epoch seconds
+- client and server IPs as packed uint32 addresses
+- request, response and total size as uint32 integers
+- every other column as a code into a per-column vocabulary, 1 byte wide
+  until the column has more than 256 distinct values (then 2, then 4)
+
+A value that does not fit its column's kind (a non-canonical IP or number,
+an out-of-range size) widens that column to int64 and is stored as 2**32 plus
+a code into the column's vocabulary; a timestamp that does not parse is kept
+verbatim in a small exception map. Every row renders back to exactly the
+text it came from; text is only rendered again when rows are written.
+
+A Vocabulary can be shared between batches, so batches built with the same
+one concatenate and merge without re-encoding. CompactRecord is a two-slot
+view of one row of a batch.
+
+    python compact_records.py measure corpus.csv
+    python compact_records.py sort shuffled.csv.gz sorted.csv
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from array import array
+from itertools import islice
+
+from batch_synthesis import np
+from compressed_output import COMPRESSORS, iter_rows, open_output
+from fast_csv import FastCSVWriter, unsafe_columns
+from render_tables import DayCache, pack_ipv4, render_ipv4
+
+# Column kinds of the 34-field layout; every other column is vocabulary coded
+DEFAULT_KINDS = {0: 'time', 8: 'int', 9: 'int', 10: 'int', 21: 'ipv4', 22: 'ipv4'}
+
+# Array typecode per kind; vocabulary codes start at 'B' and widen as the vocabulary grows
+TYPECODES = {'time': 'q', 'int': 'I', 'ipv4': 'I'}
+
+# Rows encoded per column pass
+BATCH_ROWS = 65536
+
+# Packed IPs and sizes are below 2**32; codes from here on index the column's vocabulary of exceptions
+_EXCEPTION = 1 << 32
+
+_WIDER = {'B': ('H', 1 << 8), 'H': ('I', 1 << 16)}
+
+
+class Vocabulary:
+    """Per-column value <-> code mappings, shareable between batches"""
+
+    def __init__(self, columns=34, kinds=None):
+        self.columns = columns
+        self.kinds = [(DEFAULT_KINDS if kinds is None else kinds).get(i, 'code') for i in range(columns)]
+        self.codes = [{} for _ in range(columns)]
+        self.values = [[] for _ in range(columns)]
+        self.days = DayCache()
+
+    def encoder(self, column):
+        """value -> code for a vocabulary column, assigning the next code to unseen values"""
+        codes = self.codes[column]
+        values = self.values[column]
+
+        def encode(value):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(values)
+                values.append(value)
+            return code
+        return encode
+
+    def nbytes(self):
+        """Approximate bytes held by the vocabularies"""
+        total = 0
+        for codes, values in zip(self.codes, self.values):
+            total += sys.getsizeof(codes) + sys.getsizeof(values) + sum(map(sys.getsizeof, values))
+        return total
+
+
+class CompactRecord:
+    """One row of a RowBatch, rendered field by field on access"""
+
+    __slots__ = ('batch', 'index')
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    def __getitem__(self, column):
+        return self.batch.field(self.index, column)
+
+    def __len__(self):
+        return self.batch.vocabulary.columns
+
+    @property
+    def epoch(self):
+        """Timestamp as epoch seconds"""
+        return self.batch.arrays[0][self.index]
+
+    def fields(self):
+        """The row as a list of strings"""
+        return self.batch.row(self.index)
+
+    def __repr__(self):
+        return f"CompactRecord({self.fields()!r})"
+
+
+class RowBatch:
+    """Rows of the 34-field layout held column-wise in typed arrays"""
+
+    def __init__(self, rows=(), vocabulary=None):
+        self.vocabulary = vocabulary or Vocabulary()
+        kinds = self.vocabulary.kinds
+        self.arrays = [array(TYPECODES.get(kind, 'B')) for kind in kinds]
+        # column -> {row index: verbatim text} for timestamps that do not parse
+        self.exceptions = [{} for _ in kinds]
+        self.rows = 0
+        self._render = None
+        self.extend(rows)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError("row index out of range")
+        return CompactRecord(self, index)
+
+    def __iter__(self):
+        return (CompactRecord(self, index) for index in range(self.rows))
+
+    def extend(self, rows):
+        """Encode and append rows; return how many were added"""
+        vocabulary = self.vocabulary
+        it = iter(rows)
+        added = 0
+        while True:
+            batch = list(islice(it, BATCH_ROWS))
+            if not batch:
+                return added
+            if any(len(row) != vocabulary.columns for row in batch):
+                raise ValueError(f"Every row must have {vocabulary.columns} fields")
+            # Encode every column before appending any, so a failure leaves the batch unchanged
+            encoded = [self._encode(column, values) for column, values in enumerate(zip(*batch))]
+            for column, (typecode, codes, exceptions) in enumerate(encoded):
+                target = self.arrays[column]
+                if target.typecode != typecode:
+                    target = self.arrays[column] = array(typecode, target)
+                target.extend(codes)
+                self.exceptions[column].update(exceptions)
+            self.rows += len(batch)
+            added += len(batch)
+
+    def append(self, row):
+        self.extend([row])
+
+    def _encode(self, column, values):
+        """(typecode, codes, {row index: verbatim text}) of one column's values for the rows starting at self.rows"""
+        kind = self.vocabulary.kinds[column]
+        typecode = self.arrays[column].typecode
+        exceptions = {}
+        if kind == 'code':
+            # Most values are already known: look them all up, then assign codes to the misses
+            encoded = list(map(self.vocabulary.codes[column].get, values))
+            if None in encoded:
+                encode = self.vocabulary.encoder(column)
+                encoded = [encode(value) if code is None else code for code, value in zip(encoded, values)]
+            size = len(self.vocabulary.values[column])
+            while typecode in _WIDER and size > _WIDER[typecode][1]:
+                typecode = _WIDER[typecode][0]
+            return typecode, encoded, exceptions
+        if kind == 'time':
+            epoch = self.vocabulary.days.epoch
+            encoded = []
+            for offset, value in enumerate(values, self.rows):
+                try:
+                    encoded.append(epoch(value))
+                except ValueError:
+                    encoded.append(0)
+                    exceptions[offset] = value
+            return typecode, encoded, exceptions
+        pack = pack_ipv4 if kind == 'ipv4' else _pack_uint32
+        encode = None
+        encoded = []
+        for value in values:
+            packed = pack(value)
+            if packed is None:
+                if encode is None:
+                    typecode = 'q'
+                    encode = self.vocabulary.encoder(column)
+                packed = _EXCEPTION + encode(value)
+            encoded.append(packed)
+        return typecode, encoded, exceptions
+
+    def _renderers(self):
+        """One code -> text function per column (they read the vocabulary lists, so stay valid as it grows)"""
+        if self._render is not None:
+            return self._render
+        renderers = self._render = []
+        for kind, values in zip(self.vocabulary.kinds, self.vocabulary.values):
+            if kind == 'time':
+                renderers.append(self.vocabulary.days.render)
+            elif kind in ('ipv4', 'int'):
+                render = render_ipv4 if kind == 'ipv4' else str
+                renderers.append(lambda code, render=render, values=values:
+                                 render(code) if code < _EXCEPTION else values[code - _EXCEPTION])
+            else:
+                renderers.append(values.__getitem__)
+        return renderers
+
+    def field(self, index, column):
+        """Text of one field"""
+        exception = self.exceptions[column].get(index)
+        if exception is not None:
+            return exception
+        return self._renderers()[column](self.arrays[column][index])
+
+    def row(self, index):
+        """Text of one row"""
+        return [self.field(index, column) for column in range(self.vocabulary.columns)]
+
+    def iter_rows(self, start=0, stop=None):
+        """Render rows [start, stop) as lists of strings, a column batch at a time"""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        renderers = self._renderers()
+        for begin in range(start, stop, BATCH_ROWS):
+            end = min(begin + BATCH_ROWS, stop)
+            columns = []
+            for render, codes, exceptions in zip(renderers, self.arrays, self.exceptions):
+                values = list(map(render, codes[begin:end]))
+                for index, text in exceptions.items():
+                    if begin <= index < end:
+                        values[index - begin] = text
+                columns.append(values)
+            yield from map(list, zip(*columns))
+
+    def take(self, indices):
+        """New batch (sharing this vocabulary) of the rows at indices, in that order"""
+        taken = RowBatch(vocabulary=self.vocabulary)
+        indices = list(indices)
+        positions = np.array(indices, dtype=np.int64) if np is not None else None
+        for column, codes in enumerate(self.arrays):
+            if positions is not None:
+                taken.arrays[column] = array(codes.typecode)
+                taken.arrays[column].frombytes(np.frombuffer(codes, dtype=codes.typecode)[positions].tobytes())
+            else:
+                taken.arrays[column] = array(codes.typecode, map(codes.__getitem__, indices))
+            exceptions = self.exceptions[column]
+            if exceptions:
+                taken.exceptions[column] = {new: exceptions[old] for new, old in enumerate(indices)
+                                            if old in exceptions}
+        taken.rows = len(indices)
+        return taken
+
+    def time_order(self):
+        """Row indices in stable timestamp order"""
+        epochs = self.arrays[0]
+        if np is not None:
+            return np.argsort(np.frombuffer(epochs, dtype=np.int64), kind='stable').tolist()
+        return sorted(range(self.rows), key=epochs.__getitem__)
+
+    def sorted_by_time(self):
+        """New batch of these rows in stable timestamp order"""
+        return self.take(self.time_order())
+
+    @classmethod
+    def concat(cls, batches):
+        """One batch holding the rows of batches, which must share a vocabulary"""
+        batches = list(batches)
+        vocabulary = batches[0].vocabulary if batches else None
+        joined = cls(vocabulary=vocabulary)
+        for batch in batches:
+            if batch.vocabulary is not vocabulary:
+                raise ValueError("Batches must share a Vocabulary to be concatenated")
+            for column, codes in enumerate(batch.arrays):
+                target = joined.arrays[column]
+                if codes.itemsize > target.itemsize:
+                    target = joined.arrays[column] = array(codes.typecode, target)
+                target.extend(codes if codes.typecode == target.typecode else array(target.typecode, codes))
+                joined.exceptions[column].update({joined.rows + index: text
+                                                  for index, text in batch.exceptions[column].items()})
+            joined.rows += batch.rows
+        return joined
+
+    @classmethod
+    def merge(cls, batches):
+        """One batch of the rows of batches (sharing a vocabulary) in stable timestamp order"""
+        return cls.concat(batches).sorted_by_time()
+
+    def unsafe_columns(self):
+        """Columns with a value that needs CSV quoting"""
+        texts = [list(exceptions.values()) if kind == 'time' else values
+                 for kind, values, exceptions in zip(self.vocabulary.kinds, self.vocabulary.values, self.exceptions)]
+        return unsafe_columns(texts)
+
+    def write_csv(self, target, quote_all=False):
+        """Render the rows to target (path or binary file) as CSV; return the rows written"""
+        with FastCSVWriter(target, quote_all=quote_all, unsafe_columns=self.unsafe_columns()) as writer:
+            for begin in range(0, self.rows, BATCH_ROWS):
+                writer.writerows(self.iter_rows(begin, begin + BATCH_ROWS))
+        return writer.rows_written
+
+    def nbytes(self):
+        """Approximate bytes held by the row data, excluding the shared vocabulary"""
+        total = sum(codes.buffer_info()[1] * codes.itemsize for codes in self.arrays)
+        for exceptions in self.exceptions:
+            if exceptions:
+                total += sys.getsizeof(exceptions) + sum(map(sys.getsizeof, exceptions.values()))
+        return total
+
+
+def _pack_uint32(value):
+    """Integer for a canonical unsigned decimal below 2**32, or None"""
+    if not value.isdigit() or (value[0] == '0' and len(value) > 1):
+        return None
+    number = int(value)
+    return number if number < _EXCEPTION else None
+
+
+def traced_bytes(build):
+    """(result of build(), bytes it left allocated) measured with tracemalloc"""
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Compact column-wise in-memory rows")
+    commands = parser.add_subparsers(dest='command', required=True)
+    measure_parser = commands.add_parser('measure', help="compare memory per row of lists and a RowBatch")
+    measure_parser.add_argument('source', help="CSV corpus (may be .gz/.bz2/.xz)")
+    measure_parser.add_argument('--rows', type=int, default=1000000, help="rows to hold (default: 1000000)")
+    sort_parser = commands.add_parser('sort', help="sort a corpus by timestamp in memory")
+    sort_parser.add_argument('source', help="CSV corpus (may be .gz/.bz2/.xz)")
+    sort_parser.add_argument('output', help="output CSV path")
+    sort_parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the output (implied by a .gz/.bz2/.xz output)")
+    args = parser.parse_args()
+
+    if args.command == 'measure':
+        lists, list_bytes = traced_bytes(lambda: list(islice(iter_rows(args.source), args.rows)))
+        rows = len(lists)
+        del lists
+        start = time.perf_counter()
+        batch, batch_bytes = traced_bytes(lambda: RowBatch(islice(iter_rows(args.source), args.rows)))
+        seconds = time.perf_counter() - start
+        print(f"{rows} rows")
+        print(f"  lists of str: {list_bytes / rows:8.1f} bytes/row")
+        print(f"  RowBatch:     {batch_bytes / rows:8.1f} bytes/row ({batch.nbytes() / rows:.1f} row data, "
+              f"{batch.vocabulary.nbytes() / 1e6:.1f} MB vocabulary); {list_bytes / batch_bytes:.1f}x smaller, "
+              f"encoded in {seconds:.1f}s")
+    else:
+        batch = RowBatch(iter_rows(args.source)).sorted_by_time()
+        with open_output(args.output, args.compress) as out:
+            count = batch.write_csv(out)
+        print(f"Sorted {count} rows into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Streaming compressed corpus output (gzip, bz2, xz) with parallel block compression.
+
+Output is cut into fixed-size blocks and each block is compressed on its own in
+a thread pool (zlib, bz2 and lzma release the GIL while compressing), then
+written in order. Every block becomes an independent gzip member / bz2 stream /
+xz stream; the stdlib readers transparently decode concatenated members, so the
+result is an ordinary .gz/.bz2/.xz file whose compression scales with cores.
+gzip members are written with mtime=0, so output is deterministic.
+"""
+
+import bz2
+import csv
+import gzip
+import io
+import lzma
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from fast_csv import format_rows
+from render_tables import TIMESTAMP_FORMAT
+
+# Uncompressed bytes per independently compressed block
+BLOCK_SIZE = 4 << 20
+
+COMPRESSORS = {
+    'gzip': partial(gzip.compress, compresslevel=6, mtime=0),
+    'bz2': partial(bz2.compress, compresslevel=9),
+    'xz': partial(lzma.compress, preset=6),
+}
+
+OPENERS = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+EXTENSIONS = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+}
+
+
+def compression_for(path):
+    """Compression implied by a file extension, or None for plain files"""
+    return EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+
+
+def compress_block(data, compression):
+    """Compress one block as a standalone member/stream (returned unchanged if compression is None)"""
+    return data if compression is None else COMPRESSORS[compression](data)
+
+
+class ParallelCompressedWriter:
+    """Binary file-like writer that compresses BLOCK_SIZE blocks concurrently and writes them in order"""
+
+    def __init__(self, target, compression='gzip', workers=None, block_size=BLOCK_SIZE):
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unsupported compression: {compression}")
+        if isinstance(target, (str, bytes)) or hasattr(target, '__fspath__'):
+            self._file = open(target, 'wb')
+            self._owns_file = True
+        else:
+            self._file = target
+            self._owns_file = False
+        self._compress = COMPRESSORS[compression]
+        self._block_size = block_size
+        self._workers = workers or os.cpu_count()
+        self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        self._in_flight = deque()
+        self._buffer = bytearray()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, data):
+        """Buffer data, submitting every full block for compression"""
+        self._buffer += data
+        self.bytes_in += len(data)
+        while len(self._buffer) >= self._block_size:
+            block = bytes(self._buffer[:self._block_size])
+            del self._buffer[:self._block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block):
+        """Queue a block, keeping at most two blocks per worker in flight"""
+        self._in_flight.append(self._executor.submit(self._compress, block))
+        while len(self._in_flight) > self._workers * 2:
+            self._drain_one()
+
+    def _drain_one(self):
+        """Write the oldest compressed block"""
+        compressed = self._in_flight.popleft().result()
+        self._file.write(compressed)
+        self.bytes_out += len(compressed)
+
+    def flush(self):
+        """Compress and write everything buffered so far"""
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._in_flight:
+            self._drain_one()
+        self._file.flush()
+
+    def close(self):
+        """Flush, stop the pool and close the file if this writer opened it"""
+        self.flush()
+        self._executor.shutdown()
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_output(path, compression=None, workers=None):
+    """Open path for binary writing, compressed if compression (or the file extension) asks for it"""
+    compression = compression or compression_for(path)
+    if compression is None:
+        return open(path, 'wb', buffering=0)
+    return ParallelCompressedWriter(path, compression, workers)
+
+
+def open_corpus(path, compression=None):
+    """Open a possibly compressed corpus for streaming text reads"""
+    compression = compression or compression_for(path)
+    if compression is None:
+        return open(path, 'r', newline='', encoding='utf-8')
+    return io.TextIOWrapper(OPENERS[compression](path, 'rb'), encoding='utf-8', newline='')
+
+
+def iter_rows(path, compression=None):
+    """Stream parsed CSV rows from a possibly compressed corpus without decompressing it to disk"""
+    with open_corpus(path, compression) as f:
+        yield from csv.reader(f)
+
+
+def sniff_format(path, compression=None):
+    """(quote_all, lineterminator, has_header) of a CSV corpus, judged from its first line"""
+    with open_corpus(path, compression) as f:
+        line = f.readline()
+    lineterminator = '\r\n' if line.endswith('\r\n') else '\n'
+    first = next(iter_rows(path, compression), [''])
+    quote_all = line.rstrip('\r\n') == format_rows([first], quote_all=True).rstrip('\r\n') and line.startswith('"')
+    try:
+        # A data row starts with its timestamp
+        datetime.strptime(first[0], TIMESTAMP_FORMAT)
+        has_header = False
+    except ValueError:
+        has_header = True
+    return quote_all, lineterminator, has_header
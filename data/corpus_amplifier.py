@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Amplify a hand-checked sample CSV N-fold while keeping its anomaly mix.
+
+The source (sample_zscaler_logs.csv, comprehensive_test_logs.csv, any
+generated corpus) is read once. Each row is formatted once with placeholders
+in its varying columns (timestamp, login, client IP, server IP) and split
+into constant text segments. Copy 0 is the source itself. Copy k is shifted
+k source-spans later (plus an optional per-copy jitter). Each distinct login
+becomes <login>-<k>, and each distinct client or server IP is remapped into a
+fresh block of 10.0.0.0/8 or 100.64.0.0/10. Within a copy the same source
+key always maps to the same new key, so per-IP and per-user groupings (and
+therefore the anomalies) are preserved; only the varying columns are
+re-rendered per copy.
+
+By default the output fills up to the 100 MB multer upload limit of
+backend/src/routes/logs.ts without crossing it:
+
+    python corpus_amplifier.py sample_zscaler_logs.csv sample_100mb.csv
+    python corpus_amplifier.py comprehensive_test_logs.csv big.csv.gz --copies 50000 --jitter 600
+"""
+
+import argparse
+import io
+import random
+import re
+from datetime import datetime
+
+from compressed_output import COMPRESSORS, iter_rows, open_output, sniff_format
+from fast_csv import FastCSVWriter
+from render_tables import TIMESTAMP_FORMAT, datetime_epoch, render_epoch, render_ipv4
+
+# multer fileSize limit on POST /api/logs/upload
+UPLOAD_LIMIT = 100 * 1024 * 1024
+
+TIMESTAMP_COLUMN = 0
+LOGIN_COLUMNS = (1, 19)
+CLIENT_IP_COLUMN = 21
+SERVER_IP_COLUMN = 22
+
+# Fresh address blocks for remapped IPs (first address, addresses); allocation wraps within the block
+CLIENT_BLOCK = ((10 << 24) + 1, (1 << 24) - 2)
+SERVER_BLOCK = ((100 << 24 | 64 << 16) + 1, (1 << 22) - 2)
+
+# Bytes of text joined before each write
+CHUNK_SIZE = 4 << 20
+
+_PLACEHOLDER = re.compile('"?\x00(\\d+)\x00"?')
+
+
+def _pack(value):
+    """Packed address of a dotted quad, or None for anything that is not a routable IPv4 address"""
+    parts = value.split('.')
+    if len(parts) != 4 or not all(part.isdigit() and int(part) < 256 for part in parts):
+        return None
+    packed = int(parts[0]) << 24 | int(parts[1]) << 16 | int(parts[2]) << 8 | int(parts[3])
+    # 0.0.0.0 marks a blocked request with no server; keep it
+    return packed or None
+
+
+class Amplifier:
+    """Pre-split source rows that render any copy k as CSV text"""
+
+    def __init__(self, path, compression=None):
+        self.quote_all, self.lineterminator, has_header = sniff_format(path, compression)
+        self._writer = FastCSVWriter(io.BytesIO(), self.quote_all, lineterminator=self.lineterminator)
+        rows = iter_rows(path, compression)
+        self.header = next(rows) if has_header else None
+        rows = list(rows)
+        if not rows:
+            raise ValueError(f"{path} has no data rows")
+
+        times = [datetime.strptime(row[TIMESTAMP_COLUMN], TIMESTAMP_FORMAT) for row in rows]
+        self.start = min(times)
+        self.offsets = [int((t - self.start).total_seconds()) for t in times]
+        # Copies follow each other with a one-second gap
+        self.span = max(self.offsets) + 1
+
+        # Intern each varying column's vocabulary once; rows keep indices into it
+        self.logins = sorted({row[column] for row in rows for column in LOGIN_COLUMNS})
+        login_index = {login: i for i, login in enumerate(self.logins)}
+        self.client_ips = sorted({row[CLIENT_IP_COLUMN] for row in rows})
+        self.server_ips = sorted({row[SERVER_IP_COLUMN] for row in rows})
+        client_index = {ip: i for i, ip in enumerate(self.client_ips)}
+        server_index = {ip: i for i, ip in enumerate(self.server_ips)}
+
+        self.templates = []
+        for row in rows:
+            keys = {
+                TIMESTAMP_COLUMN: ('time', None),
+                CLIENT_IP_COLUMN: ('client', client_index[row[CLIENT_IP_COLUMN]]),
+                SERVER_IP_COLUMN: ('server', server_index[row[SERVER_IP_COLUMN]]),
+            }
+            for column in LOGIN_COLUMNS:
+                keys[column] = ('login', login_index[row[column]])
+            marked = list(row)
+            for column in keys:
+                marked[column] = f"\x00{column}\x00"
+            text = self._writer.format_rows([marked])
+            # Segments alternate constant text and the column whose value goes between them
+            parts = _PLACEHOLDER.split(text)
+            self.templates.append((parts[0::2], [keys[int(column)] for column in parts[1::2]]))
+
+    def _field(self, value):
+        """Full CSV field text of value, quoted the way the source is"""
+        return self._writer.format_rows([[value]])[:-len(self.lineterminator)]
+
+    def _remap(self, values, block, copy):
+        """Field texts of an IP vocabulary remapped into a fresh block for copy"""
+        first, size = block
+        out = []
+        for index, value in enumerate(values):
+            packed = _pack(value)
+            if copy and packed is not None:
+                value = render_ipv4(first + ((copy - 1) * len(values) + index) % size)
+            out.append(self._field(value))
+        return out
+
+    def render_copy(self, copy, shift):
+        """CSV lines of copy number copy, its timestamps shifted by shift seconds"""
+        fields = {
+            'login': [self._field(f"{login}-{copy}" if copy else login) for login in self.logins],
+            'client': self._remap(self.client_ips, CLIENT_BLOCK, copy),
+            'server': self._remap(self.server_ips, SERVER_BLOCK, copy),
+        }
+        quote = '"' if self.quote_all else ''
+        base = datetime_epoch(self.start) + shift
+        rendered = {}
+        lines = []
+        for offset, (segments, keys) in zip(self.offsets, self.templates):
+            timestamp = rendered.get(offset)
+            if timestamp is None:
+                timestamp = rendered[offset] = quote + render_epoch(base + offset) + quote
+            parts = [segments[0]]
+            for (kind, index), segment in zip(keys, segments[1:]):
+                parts.append(timestamp if kind == 'time' else fields[kind][index])
+                parts.append(segment)
+            lines.append(''.join(parts))
+        return lines
+
+    def stream(self, copies=None, jitter=0, seed=0):
+        """Yield the lines of copies 0, 1, ... (forever if copies is None)"""
+        rng = random.Random(seed)
+        copy = 0
+        while copies is None or copy < copies:
+            shift = copy * (self.span + jitter) + (rng.randint(0, jitter) if copy and jitter else 0)
+            yield self.render_copy(copy, shift)
+            copy += 1
+
+
+def amplify(source, output, copies=None, max_bytes=UPLOAD_LIMIT, jitter=0, seed=0, compression=None):
+    """
+    Write copies of source to output, returning the rows written.
+
+    Output stops at a row boundary before it would exceed max_bytes (uncompressed); pass
+    max_bytes=None with copies to write exactly that many copies.
+    """
+    amplifier = Amplifier(source)
+    rows = 0
+    written = 0
+    pending = []
+    pending_size = 0
+    with open_output(output, compression) as out:
+        if amplifier.header is not None:
+            header = amplifier._writer.format_rows([amplifier.header]).encode('utf-8')
+            out.write(header)
+            written += len(header)
+        for lines in amplifier.stream(copies, jitter, seed):
+            data = ''.join(lines).encode('utf-8')
+            if max_bytes is not None and written + len(data) > max_bytes:
+                # Finish with the rows of this copy that still fit
+                for line in lines:
+                    line_data = line.encode('utf-8')
+                    if written + len(line_data) > max_bytes:
+                        break
+                    pending.append(line_data)
+                    written += len(line_data)
+                    rows += 1
+                break
+            pending.append(data)
+            pending_size += len(data)
+            written += len(data)
+            rows += len(lines)
+            if pending_size >= CHUNK_SIZE:
+                out.write(b''.join(pending))
+                pending = []
+                pending_size = 0
+        out.write(b''.join(pending))
+    print(f"Amplified {source} to {rows} log entries ({written} bytes) in {output}")
+    return rows
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Replay a sample CSV N-fold with shifted timestamps and fresh IPs/logins")
+    parser.add_argument('source', help="CSV to amplify (may be .gz/.bz2/.xz)")
+    parser.add_argument('output', help="output CSV path")
+    parser.add_argument('--copies', type=int, help="number of copies (default: as many as fit in --bytes)")
+    parser.add_argument('--bytes', type=int, dest='max_bytes', help=f"size cap in bytes (default: {UPLOAD_LIMIT}, the upload limit)")
+    parser.add_argument('--jitter', type=int, default=0, help="random extra seconds (0..jitter) between consecutive copies")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the jitter")
+    parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the output (implied by a .gz/.bz2/.xz output)")
+    args = parser.parse_args()
+
+    max_bytes = args.max_bytes if args.max_bytes is not None or args.copies else UPLOAD_LIMIT
+    amplify(args.source, args.output, args.copies, max_bytes, args.jitter, args.seed, args.compress)
+
+
+if __name__ == "__main__":
+    main()
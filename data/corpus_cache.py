@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Content-addressed, size-bounded cache of generated corpora.
+
+An entry is keyed by a SHA-256 over:
+- the generator version: the source of the generator script and of every
+  data/ module it imports, directly or indirectly
+- the generator arguments (scenario parameters and seed)
+- the output suffix (format and compression)
+
+A miss runs the generator into a private build directory and publishes it
+atomically. Any sidecars the generator writes next to its output
+(labels, manifests) become part of the entry. A hit streams every file of
+the entry through SHA-256 against the digests recorded at build time
+(--no-verify skips this) and rebuilds on a mismatch. Each hit refreshes the
+entry's last use. Past --max-bytes the least recently used entries are
+evicted.
+
+Parallel test workers can share a cache directory. With fcntl available,
+a per-entry lock makes concurrent requests for one corpus build it once,
+and entries checked out by a worker are never evicted under it. The cache
+lives in $CORPUS_CACHE_DIR (default ~/.cache/tenex-corpora), so corpora are
+built once per machine rather than once per checkout or working directory.
+The generator's own arguments follow `--`; the cache supplies --output (or
+fills an `{output}` placeholder). generate_correct_logs.py is only
+reproducible, and so only worth caching, with --seed:
+
+    python corpus_cache.py get generate_correct_logs.py -- --rows 10000000 --seed 1 --batch
+    python corpus_cache.py get --suffix .csv.gz --output big.csv.gz generate_comprehensive_test.py -- --rows 1000000
+    python corpus_cache.py get stress_corpus.py -- generate quote_heavy {output} --size 100M
+    python corpus_cache.py list
+    python corpus_cache.py --max-bytes 5G evict
+"""
+
+import argparse
+import ast
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from stress_corpus import parse_size
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_DIR = os.environ.get('CORPUS_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'tenex-corpora')
+
+DEFAULT_MAX_BYTES = parse_size(os.environ.get('CORPUS_CACHE_MAX_BYTES', '20G'))
+
+# Bytes read per digest update
+DIGEST_CHUNK = 1 << 20
+
+META = 'meta.json'
+
+OUTPUT_PLACEHOLDER = '{output}'
+
+
+def generator_version(script):
+    """SHA-256 over the source of script and every data/ module it imports, transitively"""
+    digest = hashlib.sha256()
+    pending = [os.path.abspath(script)]
+    seen = set()
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(path, 'rb') as f:
+            source = f.read()
+        for node in ast.walk(ast.parse(source)):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module = os.path.join(DATA_DIR, name.split('.')[0] + '.py')
+                if os.path.exists(module):
+                    pending.append(module)
+    for path in sorted(seen):
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode('utf-8') + b'\0' + f.read() + b'\0')
+    return digest.hexdigest()
+
+
+def cache_key(script, args, suffix):
+    """Hex key of the corpus script would write with args, in the format given by suffix"""
+    identity = {
+        'generator': os.path.basename(script),
+        'version': generator_version(script),
+        'args': list(args),
+        'suffix': suffix,
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def file_digest(path):
+    """Streamed SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_files(root):
+    """Relative paths of the files under root, sorted, excluding the entry metadata"""
+    files = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.relpath(os.path.join(directory, name), root)
+            if path != META:
+                files.append(path)
+    return sorted(files)
+
+
+@contextlib.contextmanager
+def _locked(path, shared=False, blocking=True):
+    """Hold an flock on path (yields False if non-blocking and busy); a no-op without fcntl"""
+    if fcntl is None:
+        yield True
+        return
+    with open(path, 'a+b') as f:
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        try:
+            fcntl.flock(f, mode if blocking else mode | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CorpusCache:
+    """A directory of generated corpora keyed by generator version, arguments and format"""
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, verify=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.verify = verify
+        for name in ('objects', 'locks', 'tmp'):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+
+    def _entry(self, key):
+        return os.path.join(self.directory, 'objects', key)
+
+    def _lock(self, key):
+        return os.path.join(self.directory, 'locks', key + '.lock')
+
+    def _meta(self, key):
+        """Metadata of a published entry, or None"""
+        try:
+            with open(os.path.join(self._entry(key), META)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _intact(self, key, meta):
+        """Whether the entry's files still match their recorded sizes (and digests, if verifying)"""
+        entry = self._entry(key)
+        if tree_files(entry) != sorted(meta['files']):
+            return False
+        for path, recorded in meta['files'].items():
+            full = os.path.join(entry, path)
+            if os.path.getsize(full) != recorded['size']:
+                return False
+            if self.verify and file_digest(full) != recorded['sha256']:
+                return False
+        return True
+
+    def _touch(self, key):
+        """Record a use of the entry: its meta.json mtime is its LRU clock"""
+        os.utime(os.path.join(self._entry(key), META))
+
+    def _build(self, key, script, args, suffix):
+        """Run the generator into a private directory and publish it as the entry"""
+        build = os.path.join(self.directory, 'tmp', f"{key}-{os.getpid()}")
+        shutil.rmtree(build, ignore_errors=True)
+        os.makedirs(build)
+        name = 'corpus' + suffix
+        output = os.path.join(build, name)
+        if any(OUTPUT_PLACEHOLDER in arg for arg in args):
+            command_args = [arg.replace(OUTPUT_PLACEHOLDER, output) for arg in args]
+        else:
+            command_args = list(args) + ['--output', output]
+        command = [sys.executable, os.path.abspath(script)] + command_args
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(command, cwd=build, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"{os.path.basename(script)} failed with exit status {result.returncode}:\n"
+                                   f"{result.stderr.strip()}")
+            if not os.path.exists(output):
+                raise RuntimeError(f"{os.path.basename(script)} did not write {name}")
+            files = {path: {'size': os.path.getsize(os.path.join(build, path)),
+                            'sha256': file_digest(os.path.join(build, path))}
+                     for path in tree_files(build)}
+            meta = {
+                'key': key,
+                'generator': os.path.basename(script),
+                'args': list(args),
+                'suffix': suffix,
+                'corpus': name,
+                'files': files,
+                'bytes': sum(entry['size'] for entry in files.values()),
+                'built': datetime.now().isoformat(timespec='seconds'),
+                'build_seconds': round(time.perf_counter() - start, 3),
+            }
+            with open(os.path.join(build, META), 'w') as f:
+                json.dump(meta, f, indent=2)
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            os.rename(build, self._entry(key))
+        finally:
+            shutil.rmtree(build, ignore_errors=True)
+        return meta
+
+    def _ensure(self, key, script, args, suffix):
+        """Metadata of an intact entry for key, building it if needed; call with the key lock held"""
+        meta = self._meta(key)
+        if meta is not None and self._intact(key, meta):
+            self._touch(key)
+            return meta, True
+        if meta is not None:
+            print(f"Cached corpus {key[:12]} failed its integrity check; rebuilding", file=sys.stderr)
+        return self._build(key, script, args, suffix), False
+
+    @contextlib.contextmanager
+    def checkout(self, script, args=(), suffix='.csv'):
+        """Yield the path of the cached corpus, building it on a miss; it is not evicted while checked out"""
+        key = cache_key(script, args, suffix)
+        with _locked(self._lock(key)):
+            meta, hit = self._ensure(key, script, args, suffix)
+        if not hit:
+            self.evict(keep=key)
+        while True:
+            with _locked(self._lock(key), shared=True):
+                meta = self._meta(key)
+                if meta is not None:
+                    yield os.path.join(self._entry(key), meta['corpus'])
+                    return
+            # Evicted by another process between the build and the shared lock
+            with _locked(self._lock(key)):
+                self._ensure(key, script, args, suffix)
+
+    def get(self, script, args=(), suffix='.csv', output=None):
+        """
+        Path of the cached corpus, building it on a miss.
+
+        With output, the corpus and its sidecars are hard-linked (or copied) there and that
+        path is returned; the link stays valid even if the entry is later evicted.
+        """
+        with self.checkout(script, args, suffix) as path:
+            if output is None:
+                return path
+            entry = os.path.dirname(path)
+            name = os.path.basename(path)
+            for relative in tree_files(entry):
+                target = output + relative[len(name):] if relative.startswith(name) else \
+                    os.path.join(os.path.dirname(output) or '.', relative)
+                os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+                if os.path.exists(target):
+                    os.remove(target)
+                try:
+                    os.link(os.path.join(entry, relative), target)
+                except OSError:
+                    shutil.copyfile(os.path.join(entry, relative), target)
+            return output
+
+    def entries(self):
+        """[(last use, key, meta)] of every published entry, least recently used first"""
+        found = []
+        objects = os.path.join(self.directory, 'objects')
+        for key in os.listdir(objects):
+            meta = self._meta(key)
+            if meta is None:
+                continue
+            try:
+                found.append((os.path.getmtime(os.path.join(self._entry(key), META)), key, meta))
+            except OSError:
+                continue
+        return sorted(found)
+
+    def evict(self, max_bytes=None, keep=None):
+        """Delete least recently used entries until the cache fits max_bytes; return the keys deleted"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        deleted = []
+        with _locked(os.path.join(self.directory, 'evict.lock')):
+            entries = self.entries()
+            total = sum(meta['bytes'] for _, _, meta in entries)
+            for _, key, meta in entries:
+                if total <= max_bytes:
+                    break
+                if key == keep:
+                    continue
+                # Skip entries being built or checked out
+                with _locked(self._lock(key), blocking=False) as acquired:
+                    if not acquired:
+                        continue
+                    shutil.rmtree(self._entry(key), ignore_errors=True)
+                total -= meta['bytes']
+                deleted.append(key)
+        return deleted
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Build generated corpora once per machine and reuse them")
+    parser.add_argument('--dir', default=DEFAULT_DIR, help=f"cache directory (default: {DEFAULT_DIR})")
+    parser.add_argument('--max-bytes', default=None,
+                        help="size cap such as 20G (default: $CORPUS_CACHE_MAX_BYTES or 20G)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    get_parser = commands.add_parser('get', help="print the path of a corpus, building it on a miss")
+    get_parser.add_argument('generator', help="generator script, e.g. generate_correct_logs.py")
+    get_parser.add_argument('generator_args', nargs=argparse.REMAINDER, help="-- then the generator's own arguments")
+    get_parser.add_argument('--suffix', default='.csv', help="output suffix: .csv, .csv.gz, ... (default: .csv)")
+    get_parser.add_argument('--output', help="also link or copy the corpus and its sidecars here")
+    get_parser.add_argument('--no-verify', action='store_true', help="check sizes only, not digests, on a hit")
+
+    commands.add_parser('list', help="list entries, least recently used first")
+    commands.add_parser('verify', help="check the digests of every entry")
+
+    evict_parser = commands.add_parser('evict', help="evict least recently used entries")
+    evict_parser.add_argument('--all', action='store_true', help="empty the cache")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    max_bytes = parse_size(args.max_bytes) if args.max_bytes else DEFAULT_MAX_BYTES
+    cache = CorpusCache(args.dir, max_bytes, verify=not getattr(args, 'no_verify', False))
+    if args.command == 'get':
+        generator = args.generator
+        if not os.path.exists(generator):
+            generator = os.path.join(DATA_DIR, generator)
+        generator_args = args.generator_args[1:] if args.generator_args[:1] == ['--'] else args.generator_args
+        if '--output' in generator_args:
+            raise SystemExit("The cache supplies --output; pass --output to `get` instead")
+        print(cache.get(generator, generator_args, args.suffix, args.output))
+    elif args.command == 'list':
+        for last_use, key, meta in cache.entries():
+            used = datetime.fromtimestamp(last_use).isoformat(timespec='seconds')
+            print(f"{key[:12]}  {meta['bytes'] / 1e6:10.1f} MB  used {used}  {meta['generator']} "
+                  f"{' '.join(meta['args'])} ({meta['suffix']})")
+    elif args.command == 'verify':
+        bad = 0
+        for _, key, meta in cache.entries():
+            with _locked(cache._lock(key), shared=True):
+                if not cache._intact(key, meta):
+                    bad += 1
+                    print(f"CORRUPT {key[:12]} {meta['generator']} {' '.join(meta['args'])}")
+        if bad:
+            sys.exit(1)
+        print("All entries intact")
+    else:
+        deleted = cache.evict(0 if args.all else max_bytes)
+        print(f"Evicted {len(deleted)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite store of a corpus, for pulling focused repro files out of big ones.
+
+`load` bulk-inserts rows (from a CSV corpus or a generator source) into a
+`logs` table. The load runs executemany in large transactions with
+journaling and syncing off, and builds the indexes once at the end. Each of
+the 34 fields is kept verbatim in f00..f33, next to `ts`, the row's
+timestamp in epoch seconds (NULL if it does not parse), so rows round-trip
+exactly. The indexes cover:
+- ts (time ranges)
+- f21 (client IP)
+- f01 (login)
+- f03 (url)
+- f24 (response code)
+
+`export` streams the rows matching filters (or any WHERE clause over the
+`logs` columns or the named `entries` view) back out, in corpus order, as
+CSV in the original layout:
+
+    python corpus_store.py load big.csv.gz big.db
+    python corpus_store.py load --source merged --rows 10000000 merged.db
+    python corpus_store.py export big.db repro.csv --client-ip 172.17.3.200 --since "2024-01-15 10:00"
+    python corpus_store.py export big.db - --where "response_code = '404' AND login LIKE 'hr-%'"
+
+generate_correct_logs.py --format sqlite writes a store directly.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from calendar import timegm
+from datetime import datetime
+from itertools import chain, islice
+
+from compressed_output import COMPRESSORS, iter_rows, open_output
+from fast_csv import FastCSVWriter
+from render_tables import TIMESTAMP_FORMAT
+from scenario_registry import FIELDS
+
+COLUMNS = 34
+
+# Rows per executemany call and transaction
+BATCH_ROWS = 100000
+
+FIELD_COLUMNS = [f"f{index:02d}" for index in range(COLUMNS)]
+
+# Index name -> indexed column
+INDEXES = {'ts': 'ts', 'client_ip': 'f21', 'login': 'f01', 'url': 'f03', 'response_code': 'f24'}
+
+# Accepted --since/--until formats besides the corpus timestamp format
+_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", TIMESTAMP_FORMAT)
+
+
+def _needs_quoting(text):
+    """fast_csv.needs_quoting() for long texts: substring tests beat the regex scan"""
+    return ',' in text or '"' in text or '\r' in text or '\n' in text
+
+
+def _entries_view():
+    """CREATE VIEW adding the scenario_registry field names (first column of each) to logs"""
+    names = ', '.join(f"{FIELD_COLUMNS[columns[0]]} AS {name}" for name, columns in FIELDS.items())
+    return (f"CREATE VIEW IF NOT EXISTS entries AS SELECT rowid AS rowid, ts, {', '.join(FIELD_COLUMNS)}, "
+            f"f00 AS timestamp, {names} FROM logs")
+
+
+class _EpochParser:
+    """Epoch seconds of corpus timestamps, parsing each minute once"""
+
+    def __init__(self):
+        self._minutes = {}
+
+    def __call__(self, text):
+        # "Mon Jan 15 08:00:00 2024" -> key "Jan 15 08:00 2024"
+        key = text[4:16] + text[19:]
+        minute = self._minutes.get(key)
+        if minute is None:
+            if len(text) != 24:
+                return self._slow(text)
+            try:
+                minute = self._minutes[key] = timegm(datetime.strptime(key, "%b %d %H:%M %Y").timetuple())
+            except ValueError:
+                return self._slow(text)
+        seconds = text[17:19]
+        if not seconds.isdigit() or text[16] != ':':
+            return self._slow(text)
+        return minute + int(seconds)
+
+    @staticmethod
+    def _slow(text):
+        try:
+            return timegm(datetime.strptime(text.strip(), TIMESTAMP_FORMAT).timetuple())
+        except ValueError:
+            return None
+
+
+def parse_time(text):
+    """Epoch seconds of a --since/--until value"""
+    for time_format in _TIME_FORMATS:
+        try:
+            return timegm(datetime.strptime(text, time_format).timetuple())
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised time: {text!r} (use YYYY-MM-DD[ HH:MM[:SS]] or the corpus format)")
+
+
+def total_rows(connection):
+    """Rows in the logs table"""
+    return connection.execute("SELECT count(*) FROM logs").fetchone()[0]
+
+
+class CorpusStore:
+    """A corpus in an indexed SQLite database"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        columns = ', '.join(f"{column} TEXT" for column in FIELD_COLUMNS)
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS logs (ts INTEGER, {columns})")
+        self.connection.execute(_entries_view())
+        self.connection.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def unsafe_columns(self):
+        """Columns that hold a value needing CSV quoting, as recorded by load(); None if unknown"""
+        row = self.connection.execute("SELECT value FROM store_meta WHERE key = 'unsafe_columns'").fetchone()
+        return None if row is None else frozenset(json.loads(row[0]))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def load(self, rows):
+        """Append rows (iterables of 34 strings) and (re)build the indexes; return the rows added"""
+        connection = self.connection
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("PRAGMA cache_size = -262144")
+        # Maintaining the indexes row by row is far slower than building them once
+        for name in INDEXES:
+            connection.execute(f"DROP INDEX IF EXISTS idx_logs_{name}")
+        insert = f"INSERT INTO logs VALUES ({', '.join('?' * (COLUMNS + 1))})"
+        epoch = _EpochParser()
+        padding = ('',) * COLUMNS
+        # Tracked so export() only escapes the columns that can need it
+        unsafe = set(self.unsafe_columns() or ()) if total_rows(connection) else set()
+        total = 0
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, BATCH_ROWS))
+            if not batch:
+                break
+            records = [(epoch(row[0]), *row) if len(row) == COLUMNS
+                       else (epoch(row[0]) if row else None, *(tuple(row) + padding)[:COLUMNS])
+                       for row in batch]
+            if _needs_quoting('\x00'.join(chain.from_iterable(batch))):
+                unsafe.update(index for index, values in enumerate(zip(*records), -1)
+                              if index >= 0 and index not in unsafe and _needs_quoting('\x00'.join(values)))
+            with connection:
+                connection.executemany(insert, records)
+            total += len(batch)
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO store_meta VALUES ('unsafe_columns', ?)",
+                               (json.dumps(sorted(unsafe)),))
+            for name, column in INDEXES.items():
+                connection.execute(f"CREATE INDEX idx_logs_{name} ON logs ({column})")
+        connection.execute("ANALYZE")
+        return total
+
+    def select(self, where=None, parameters=(), limit=None):
+        """Cursor over the 34 fields of the matching rows, in corpus order"""
+        query = f"SELECT {', '.join(FIELD_COLUMNS)} FROM entries"
+        if where:
+            query += f" WHERE {where}"
+        query += " ORDER BY rowid"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return self.connection.execute(query, parameters)
+
+    def export(self, target, where=None, parameters=(), limit=None, quote_all=False):
+        """Stream the matching rows to target (path or binary file) as CSV; return the rows written"""
+        cursor = self.select(where, parameters, limit)
+        with FastCSVWriter(target, quote_all=quote_all, unsafe_columns=self.unsafe_columns()) as writer:
+            while True:
+                batch = cursor.fetchmany(BATCH_ROWS)
+                if not batch:
+                    break
+                writer.writerows(batch)
+        return writer.rows_written
+
+
+def filter_clause(client_ip=None, login=None, url=None, response_code=None, since=None, until=None, where=None):
+    """(WHERE clause, parameters) for the export filters, each served by an index"""
+    clauses = []
+    parameters = []
+    for column, value in (('f21', client_ip), ('f01', login), ('f03', url), ('f24', response_code)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            parameters.append(value)
+    if since is not None:
+        clauses.append("ts >= ?")
+        parameters.append(parse_time(since))
+    if until is not None:
+        clauses.append("ts < ?")
+        parameters.append(parse_time(until))
+    if where:
+        clauses.append(f"({where})")
+    return ' AND '.join(clauses) or None, parameters
+
+
+def write_sqlite(logs, path):
+    """Load logs (any iterable of rows) into a corpus store at path, returning the row count"""
+    with CorpusStore(path) as store:
+        count = store.load(logs)
+    print(f"Loaded {count} log entries into {path}")
+    return count
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Indexed SQLite corpus store for slicing big corpora")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = commands.add_parser('load', help="bulk-load a corpus into a store")
+    load_parser.add_argument('source', nargs='?', help="CSV corpus (may be .gz/.bz2/.xz)")
+    load_parser.add_argument('database', help="SQLite database path (appended to if it exists)")
+    load_parser.add_argument('--source', dest='generator', help="load rows from a live_feed generator source instead")
+    load_parser.add_argument('--rows', type=int, help="rows to load (required with --source)")
+    load_parser.add_argument('--seed', type=int, default=0, help="seed for --source")
+    load_parser.add_argument('--header', action='store_true', help="the first source row is a header")
+
+    export_parser = commands.add_parser('export', help="stream matching rows out as CSV")
+    export_parser.add_argument('database', help="SQLite database path")
+    export_parser.add_argument('output', help="output CSV path (may end in .gz/.bz2/.xz), or - for stdout")
+    export_parser.add_argument('--client-ip', help="rows from this client IP (field 21)")
+    export_parser.add_argument('--login', help="rows of this login (field 1)")
+    export_parser.add_argument('--url', help="rows for this url (field 3)")
+    export_parser.add_argument('--response-code', help="rows with this response code (field 24)")
+    export_parser.add_argument('--since', help="rows at or after this time (YYYY-MM-DD[ HH:MM[:SS]])")
+    export_parser.add_argument('--until', help="rows before this time")
+    export_parser.add_argument('--where', help="extra SQL condition over fNN, ts or the entries view's field names")
+    export_parser.add_argument('--limit', type=int, help="stop after this many rows")
+    export_parser.add_argument('--quote-all', action='store_true', help="quote every field (sample_zscaler_logs.csv style)")
+    export_parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the output (implied by a .gz/.bz2/.xz output)")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    start = time.perf_counter()
+    if args.command == 'load':
+        if args.generator:
+            if args.rows is None:
+                raise SystemExit("--source requires --rows")
+            # Imported lazily: live_feed imports the generators, and generate_correct_logs imports this module
+            from live_feed import SOURCES
+            rows = islice(SOURCES[args.generator](args.seed), args.rows)
+        elif args.source:
+            rows = iter_rows(args.source)
+            if args.header:
+                next(rows, None)
+        else:
+            raise SystemExit("Give a source corpus or --source")
+        count = write_sqlite(rows, args.database)
+        print(f"{count / (time.perf_counter() - start):,.0f} rows/sec", file=sys.stderr)
+    else:
+        where, parameters = filter_clause(args.client_ip, args.login, args.url, args.response_code, args.since,
+                                          args.until, args.where)
+        with CorpusStore(args.database) as store:
+            if args.output == '-':
+                count = store.export(sys.stdout.buffer, where, parameters, args.limit, args.quote_all)
+            else:
+                with open_output(args.output, args.compress) as out:
+                    count = store.export(out, where, parameters, args.limit, args.quote_all)
+        print(f"Exported {count} rows in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,412 +3,195 @@
 Generate comprehensive test logs that trigger all 8 anomaly detection scenarios
 """
 
-import csv
+import argparse
 from datetime import datetime, timedelta
+from itertools import islice
 
-def generate_comprehensive_test_logs():
-    """Generate logs that trigger all anomaly detection scenarios"""
-    
-    # Base timestamp
-    base_time = datetime(2024, 1, 15, 8, 0, 0)
-    
-    logs = []
-    
+from anomaly_labels import periodic_runs, sidecar_path, write_labels
+from columnar_corpus import write_columnar
+from compressed_output import COMPRESSORS, open_output
+from fast_csv import FastCSVWriter
+from scenario_registry import Scenario, compile_scenarios, generate_scenario, registry_labels, scenario_rows
+from sharding import generate_sharded
+
+# Base timestamp
+BASE_TIME = datetime(2024, 1, 15, 8, 0, 0)
+
+# One pass runs from 08:00 to the 10:04 burst; streamed cycles start this far apart
+CYCLE_SPAN = timedelta(hours=3)
+
+HEADER = [
+    'timestamp', 'login', 'department', 'company', 'cloudName', 'clientIP', 'clientInternalIP',
+    'clientPublicIP', 'serverIP', 'location', 'url', 'host', 'requestMethod', 'responseCode',
+    'userAgent', 'referer', 'contentType', 'action', 'reason', 'ruleType', 'ruleLabel',
+    'threatName', 'threatSeverity', 'riskScore', 'malwareCategory', 'malwareClass',
+    'urlCategory', 'urlSuperCategory', 'urlClass', 'appName', 'appClass', 'appRiskScore',
+    'fileName', 'fileType'
+]
+
+SUSPICIOUS_FILES = ["download.exe", "script.bat", "payload.dll", "archive.zip", "script.ps1"]
+
+# One pass of the comprehensive test corpus, emitted in this order
+SCENARIOS = [
     # Normal traffic patterns (first 10 entries)
-    for i in range(10):
-        timestamp = base_time + timedelta(seconds=i*60)
-        user_id = i + 1
-        client_ip = f"172.17.1.{100 + i}"
-        
-        # Normal user behavior
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
-            f"user{user_id}",  # 1. login
-            "HTTP",  # 2. department
-            ["google.com", "github.com", "stackoverflow.com", "linkedin.com", "office365.com"][i % 5],  # 3. company
-            "Allowed",  # 4. cloudName
-            ["Google", "GitHub", "Stack Overflow", "LinkedIn", "Office 365"][i % 5],  # 5. clientIP
-            ["Search Engines", "Development", "Development", "Social Networking", "Productivity"][i % 5],  # 6. clientInternalIP
-            ["15", "30", "25", "20", "25"][i % 5],  # 7. clientPublicIP
-            ["1024", "2048", "1536", "1024", "512"][i % 5],  # 8. serverIP
-            ["2048", "4096", "3072", "2048", "1024"][i % 5],  # 9. location
-            ["3072", "6144", "4608", "3072", "1536"][i % 5],  # 10. url
-            ["General Surfing", "Technology", "Technology", "Social Networking", "Office Apps"][i % 5],  # 11. host
-            ["Search Engines", "Development", "Development", "Social Networking", "Productivity"][i % 5],  # 12. requestMethod
-            ["Search", "Code Repositories", "Technical Q&A", "Professional Networking", "Office Applications"][i % 5],  # 13. responseCode
-            "None",  # 14. userAgent
-            "None",  # 15. referer
-            "0",  # 16. contentType
-            "None",  # 17. action
-            "None",  # 18. reason
-            f"user{user_id}",  # 19. ruleType
-            ["IT Department", "Engineering Department", "Engineering Department", "Sales Department", "HR Department"][i % 5],  # 20. ruleLabel
-            client_ip,  # 21. threatName - CLIENT IP (internal)
-            ["8.8.8.8", "140.82.112.3", "151.101.1.69", "13.107.42.14", "13.107.136.9"][i % 5],  # 22. threatSeverity - SERVER IP (external)
-            "GET",  # 23. riskScore - REQUEST METHOD
-            "200",  # 24. malwareCategory - RESPONSE CODE
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",  # 25. malwareClass - USER AGENT
-            "None",  # 26. urlCategory
-            "URLFilter",  # 27. urlSuperCategory
-            f"URL_Allow_{user_id}",  # 28. urlClass
-            "Other",  # 29. appName
-            "None",  # 30. appClass
-            "NA",  # 31. appRiskScore
-            "NA",  # 32. fileName
-            "N/A"  # 33. fileType
-        ]
-        logs.append(log)
-    
+    Scenario('normal', start=0, interval=60, count=10, slots={
+        'login': "user{n}",
+        'url': ["google.com", "github.com", "stackoverflow.com", "linkedin.com", "office365.com"],
+        'app_name': ["Google", "GitHub", "Stack Overflow", "LinkedIn", "Office 365"],
+        'app_class': ["Search Engines", "Development", "Development", "Social Networking", "Productivity"],
+        'risk_score': ["15", "30", "25", "20", "25"],
+        'request_size': ["1024", "2048", "1536", "1024", "512"],
+        'response_size': ["2048", "4096", "3072", "2048", "1024"],
+        'total_size': ["3072", "6144", "4608", "3072", "1536"],
+        'url_class': ["General Surfing", "Technology", "Technology", "Social Networking", "Office Apps"],
+        'url_super_category': ["Search Engines", "Development", "Development", "Social Networking", "Productivity"],
+        'url_category': ["Search", "Code Repositories", "Technical Q&A", "Professional Networking", "Office Applications"],
+        'department': ["IT Department", "Engineering Department", "Engineering Department", "Sales Department",
+                       "HR Department"],
+        'client_ip': lambda i: f"172.17.1.{100 + i}",
+        'server_ip': ["8.8.8.8", "140.82.112.3", "151.101.1.69", "13.107.42.14", "13.107.136.9"],
+        'rule_label': "URL_Allow_{n}",
+    }),
     # ANOMALY 1: URL Pattern Analysis - Same URL accessed many times
-    for i in range(5):
-        timestamp = base_time + timedelta(seconds=600 + i)
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),
-            "attacker1",
-            "HTTP",
-            "api.example.com/endpoint1",
-            "Allowed",
-            "API Endpoint",
-            "Technology",
-            "45",
-            "64",
-            "128",
-            "192",
-            "Technology",
-            "Technology",
-            "API",
-            "None",
-            "None",
-            "0",
-            "None",
-            "None",
-            "attacker1",
-            "IT Department",
-            "172.17.6.150",
-            "192.168.1.1",
-            "GET",
-            "200",
-            "curl/7.68.0",
-            "None",
-            "URLFilter",
-            "API_Allow_1",
-            "Other",
-            "None",
-            "NA",
-            "NA",
-            "N/A"
-        ]
-        logs.append(log)
-    
+    Scenario('url_patterns', start=600, count=5, fields={
+        'login': "attacker1", 'url': "api.example.com/endpoint1", 'app_name': "API Endpoint",
+        'app_class': "Technology", 'risk_score': "45", 'request_size': "64", 'response_size': "128",
+        'total_size': "192", 'url_class': "Technology", 'url_super_category': "Technology", 'url_category': "API",
+        'department': "IT Department", 'client_ip': "172.17.6.150", 'server_ip': "192.168.1.1",
+        'user_agent': "curl/7.68.0", 'rule_label': "API_Allow_1",
+    }),
     # ANOMALY 2: User Agent Analysis - Suspicious scanning tools
-    suspicious_agents = ["sqlmap/1.0", "nikto/2.1.6", "nmap/7.80", "metasploit/6.0.0", "wget/1.20.3"]
-    for i in range(5):
-        timestamp = base_time + timedelta(seconds=660 + i)
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),
-            "attacker2",
-            "HTTP",
-            "admin.example.com/panel",
-            "Blocked",
-            "Admin Panel",
-            "Technology",
-            "75",
-            "0",
-            "0",
-            "0",
-            "Technology",
-            "Security Risk",
-            "Admin Access",
-            "None",
-            "None",
-            "0",
-            "None",
-            "None",
-            "attacker2",
-            "Engineering Department",
-            "172.17.6.151",
-            "192.168.1.2",
-            "POST",
-            "403",
-            suspicious_agents[i],
-            "None",
-            "ThreatProtection",
-            f"Suspicious_UA_Block_{i+1}",
-            "Other",
-            "None",
-            "NA",
-            "NA",
-            "N/A"
-        ]
-        logs.append(log)
-    
+    Scenario('suspicious_agents', start=660, count=5, fields={
+        'login': "attacker2", 'url': "admin.example.com/panel", 'action': "Blocked", 'app_name': "Admin Panel",
+        'app_class': "Technology", 'risk_score': "75", 'request_size': "0", 'response_size': "0", 'total_size': "0",
+        'url_class': "Technology", 'url_super_category': "Security Risk", 'url_category': "Admin Access",
+        'department': "Engineering Department", 'client_ip': "172.17.6.151", 'server_ip': "192.168.1.2",
+        'method': "POST", 'response_code': "403", 'rule_type': "ThreatProtection",
+    }, slots={
+        'user_agent': ["sqlmap/1.0", "nikto/2.1.6", "nmap/7.80", "metasploit/6.0.0", "wget/1.20.3"],
+        'rule_label': "Suspicious_UA_Block_{n}",
+    }),
     # ANOMALY 3: Geographic Access - Multiple IPs from same country
-    for i in range(5):
-        timestamp = base_time + timedelta(seconds=720 + i)
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),
-            "attacker3",
-            "HTTP",
-            "malware-site.com",
-            "Blocked",
-            "Malware Site",
-            "Malware",
-            "95",
-            "0",
-            "0",
-            "0",
-            "Security Risk",
-            "Malware",
-            "Malware Distribution",
-            "None",
-            "None",
-            "0",
-            "None",
-            "None",
-            "attacker3",
-            "Security Department",
-            f"172.17.6.{152 + i}",
-            f"203.208.60.{i + 1}",
-            "GET",
-            "403",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "None",
-            "ThreatProtection",
-            f"Malware_Block_{i+1}",
-            "Other",
-            "None",
-            "NA",
-            "NA",
-            "N/A"
-        ]
-        logs.append(log)
-    
+    Scenario('geographic', start=720, count=5, fields={
+        'login': "attacker3", 'url': "malware-site.com", 'action': "Blocked", 'app_name': "Malware Site",
+        'app_class': "Malware", 'risk_score': "95", 'request_size': "0", 'response_size': "0", 'total_size': "0",
+        'url_class': "Security Risk", 'url_super_category': "Malware", 'url_category': "Malware Distribution",
+        'department': "Security Department", 'response_code': "403", 'rule_type': "ThreatProtection",
+    }, slots={
+        'client_ip': lambda i: f"172.17.6.{152 + i}",
+        'server_ip': "203.208.60.{n}",
+        'rule_label': "Malware_Block_{n}",
+    }),
     # ANOMALY 4: Time Pattern Analysis - Traffic spike at 10:00
-    for i in range(15):
-        timestamp = datetime(2024, 1, 15, 10, 0, i)
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),
-            "attacker4",
-            "HTTP",
-            "api.example.com/endpoint2",
-            "Allowed",
-            "API Endpoint",
-            "Technology",
-            "45",
-            "64",
-            "128",
-            "192",
-            "Technology",
-            "Technology",
-            "API",
-            "None",
-            "None",
-            "0",
-            "None",
-            "None",
-            "attacker4",
-            "IT Department",
-            "172.17.6.157",
-            "192.168.1.3",
-            "GET",
-            "200",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "None",
-            "URLFilter",
-            "API_Allow_2",
-            "Other",
-            "None",
-            "NA",
-            "NA",
-            "N/A"
-        ]
-        logs.append(log)
-    
+    Scenario('traffic_spike', start=7200, count=15, fields={
+        'login': "attacker4", 'url': "api.example.com/endpoint2", 'app_name': "API Endpoint",
+        'app_class': "Technology", 'risk_score': "45", 'request_size': "64", 'response_size': "128",
+        'total_size': "192", 'url_class': "Technology", 'url_super_category': "Technology", 'url_category': "API",
+        'department': "IT Department", 'client_ip': "172.17.6.157", 'server_ip': "192.168.1.3",
+        'rule_label': "API_Allow_2",
+    }),
     # ANOMALY 5: Response Code Analysis - High 4xx error rate
-    for i in range(10):
-        timestamp = datetime(2024, 1, 15, 10, 1, i)
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),
-            "attacker5",
-            "HTTP",
-            f"broken-site.com/page{i+1}",
-            "Blocked",
-            "Broken Site",
-            "Technology",
-            "75",
-            "0",
-            "0",
-            "0",
-            "Technology",
-            "Security Risk",
-            "Broken Page",
-            "None",
-            "None",
-            "0",
-            "None",
-            "None",
-            "attacker5",
-            "IT Department",
-            "172.17.6.158",
-            "192.168.1.4",
-            "GET",
-            "404",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "None",
-            "ThreatProtection",
-            f"404_Block_{i+1}",
-            "Other",
-            "None",
-            "NA",
-            "NA",
-            "N/A"
-        ]
-        logs.append(log)
-    
+    Scenario('response_codes', start=7260, count=10, fields={
+        'login': "attacker5", 'action': "Blocked", 'app_name': "Broken Site", 'app_class': "Technology",
+        'risk_score': "75", 'request_size': "0", 'response_size': "0", 'total_size': "0", 'url_class': "Technology",
+        'url_super_category': "Security Risk", 'url_category': "Broken Page", 'department': "IT Department",
+        'client_ip': "172.17.6.158", 'server_ip': "192.168.1.4", 'response_code': "404",
+        'rule_type': "ThreatProtection",
+    }, slots={
+        'url': "broken-site.com/page{n}",
+        'rule_label': "404_Block_{n}",
+    }),
     # ANOMALY 6: File Access Monitoring - Suspicious file types
-    suspicious_files = ["download.exe", "script.bat", "payload.dll", "archive.zip", "script.ps1"]
-    for i in range(5):
-        timestamp = datetime(2024, 1, 15, 10, 2, i)
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),
-            "attacker6",
-            "HTTP",
-            f"malicious-site.com/{suspicious_files[i]}",
-            "Blocked",
-            "Malicious Download",
-            "Malware",
-            "95",
-            "0",
-            "0",
-            "0",
-            "Security Risk",
-            "Malware",
-            "Malware Downloads",
-            "None",
-            "None",
-            "0",
-            "None",
-            "None",
-            "attacker6",
-            "Security Department",
-            "172.17.6.159",
-            "192.168.1.5",
-            "GET",
-            "403",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "None",
-            "ThreatProtection",
-            f"Malware_Block_{i+1}",
-            "Other",
-            "None",
-            "NA",
-            suspicious_files[i],
-            suspicious_files[i].split('.')[-1]
-        ]
-        logs.append(log)
-    
+    Scenario('file_access', start=7320, count=5, fields={
+        'login': "attacker6", 'action': "Blocked", 'app_name': "Malicious Download", 'app_class': "Malware",
+        'risk_score': "95", 'request_size': "0", 'response_size': "0", 'total_size': "0",
+        'url_class': "Security Risk", 'url_super_category': "Malware", 'url_category': "Malware Downloads",
+        'department': "Security Department", 'client_ip': "172.17.6.159", 'server_ip': "192.168.1.5",
+        'response_code': "403", 'rule_type': "ThreatProtection",
+    }, slots={
+        'url': [f"malicious-site.com/{name}" for name in SUSPICIOUS_FILES],
+        'rule_label': "Malware_Block_{n}",
+        'file_name': SUSPICIOUS_FILES,
+        'file_type': [name.split('.')[-1] for name in SUSPICIOUS_FILES],
+    }),
     # ANOMALY 7: SSL/TLS Behavior - Old TLS versions
-    for i in range(6):
-        timestamp = datetime(2024, 1, 15, 10, 3, i)
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),
-            "attacker7",
-            "HTTP",
-            "old-site.com",
-            "Allowed",
-            "Old Site",
-            "Technology",
-            "45",
-            "64",
-            "128",
-            "192",
-            "Technology",
-            "Technology",
-            "Old Site",
-            "None",
-            "None",
-            "0",
-            "None",
-            "None",
-            "attacker7",
-            "IT Department",
-            "172.17.6.160",
-            "192.168.1.6",
-            "GET",
-            "200",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "None",
-            "URLFilter",
-            f"Old_Site_{i+1}",
-            "Other",
-            "None",
-            "NA",
-            "NA",
-            "N/A"
-        ]
-        logs.append(log)
-    
+    Scenario('tls', start=7380, count=6, fields={
+        'login': "attacker7", 'url': "old-site.com", 'app_name': "Old Site", 'app_class': "Technology",
+        'risk_score': "45", 'request_size': "64", 'response_size': "128", 'total_size': "192",
+        'url_class': "Technology", 'url_super_category': "Technology", 'url_category': "Old Site",
+        'department': "IT Department", 'client_ip': "172.17.6.160", 'server_ip': "192.168.1.6",
+    }, slots={
+        'rule_label': "Old_Site_{n}",
+    }),
     # ANOMALY 8: Bandwidth Usage - High bandwidth from single IP
-    for i in range(5):
-        timestamp = datetime(2024, 1, 15, 10, 4, i)
-        log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),
-            "attacker8",
-            "HTTP",
-            f"large-file.com/video{i+1}.mp4",
-            "Allowed",
-            "Large File",
-            "Technology",
-            "45",
-            "10240",
-            "20480",
-            "30720",
-            "Technology",
-            "Technology",
-            "Large File",
-            "None",
-            "None",
-            "0",
-            "None",
-            "None",
-            "attacker8",
-            "IT Department",
-            "172.17.6.161",
-            "192.168.1.7",
-            "GET",
-            "200",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "None",
-            "URLFilter",
-            f"Large_File_{i+1}",
-            "Other",
-            "None",
-            "NA",
-            f"video{i+1}.mp4",
-            "mp4"
-        ]
-        logs.append(log)
+    Scenario('bandwidth', start=7440, count=5, fields={
+        'login': "attacker8", 'app_name': "Large File", 'app_class': "Technology", 'risk_score': "45",
+        'request_size': "10240", 'response_size': "20480", 'total_size': "30720", 'url_class': "Technology",
+        'url_super_category': "Technology", 'url_category': "Large File", 'department': "IT Department",
+        'client_ip': "172.17.6.161", 'server_ip': "192.168.1.7", 'file_type': "mp4",
+    }, slots={
+        'url': "large-file.com/video{n}.mp4",
+        'rule_label': "Large_File_{n}",
+        'file_name': "video{n}.mp4",
+    }),
+]
+
+COMPILED_SCENARIOS = compile_scenarios(SCENARIOS)
+
+# Rows yielded by one pass of iter_comprehensive_test_logs()
+CYCLE_ROWS = sum(map(scenario_rows, SCENARIOS))
+
+# Every scenario field is a fixed literal without delimiters, so no column needs CSV quoting
+UNSAFE_COLUMNS = frozenset()
+
+def iter_comprehensive_test_logs(base_time=BASE_TIME):
+    """Lazily yield one pass of logs that trigger all anomaly detection scenarios, starting at base_time"""
+    for compiled in COMPILED_SCENARIOS:
+        yield from generate_scenario(compiled, base_time)
+
+def stream_comprehensive_test_logs(rows=None, base_time=BASE_TIME):
+    """Yield rows lazily, repeating the scenario mix every CYCLE_SPAN until rows is reached (forever if None)"""
+    def cycles():
+        cycle_start = base_time
+        while True:
+            yield from iter_comprehensive_test_logs(cycle_start)
+            cycle_start += CYCLE_SPAN
     
-    # Write to CSV file
-    with open('comprehensive_test_logs.csv', 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        
-        # Write header
-        header = [
-            'timestamp', 'login', 'department', 'company', 'cloudName', 'clientIP', 'clientInternalIP',
-            'clientPublicIP', 'serverIP', 'location', 'url', 'host', 'requestMethod', 'responseCode',
-            'userAgent', 'referer', 'contentType', 'action', 'reason', 'ruleType', 'ruleLabel',
-            'threatName', 'threatSeverity', 'riskScore', 'malwareCategory', 'malwareClass',
-            'urlCategory', 'urlSuperCategory', 'urlClass', 'appName', 'appClass', 'appRiskScore',
-            'fileName', 'fileType'
-        ]
-        writer.writerow(header)
+    return islice(cycles(), rows)
+
+def shard_comprehensive_test_logs(start, stop, _rng=None):
+    """Sharded row source of the streamed rows [start, stop); they are fixed, so the shard rng goes unused"""
+    cycle, offset = divmod(start, CYCLE_ROWS)
+    rows = stream_comprehensive_test_logs(None, BASE_TIME + cycle * CYCLE_SPAN)
+    return islice(rows, offset, offset + stop - start)
+
+def generate_comprehensive_test_logs(output='comprehensive_test_logs.csv', rows=None, shards=None, workers=None,
+                                     compression=None, columnar=False, labels=False):
+    """Generate logs that trigger all anomaly detection scenarios"""
+    if columnar:
+        if shards or compression:
+            raise ValueError("columnar output cannot be sharded or compressed")
+        logs = stream_comprehensive_test_logs(rows or CYCLE_ROWS)
+        count = write_columnar(logs, output, header=HEADER)
+    elif shards:
+        count = generate_sharded(shard_comprehensive_test_logs, rows or CYCLE_ROWS, output, shards,
+                                 workers=workers, header=HEADER, unsafe_columns=UNSAFE_COLUMNS,
+                                 compression=compression)
+    else:
+        logs = stream_comprehensive_test_logs(rows or CYCLE_ROWS)
         
-        # Write data
-        for log in logs:
-            writer.writerow(log)
+        # Write to CSV file
+        with open_output(output, compression) as out, FastCSVWriter(out, unsafe_columns=UNSAFE_COLUMNS) as writer:
+            
+            # Write header
+            writer.writerow(HEADER)
+            
+            # Write data
+            count = writer.writerows(logs)
     
-    print(f"Generated comprehensive test log file with {len(logs)} entries")
+    print(f"Generated comprehensive test log file with {count} entries")
+    if labels:
+        write_labels(sidecar_path(output), periodic_runs(registry_labels(SCENARIOS), CYCLE_ROWS), count)
     print("This file will trigger all 8 anomaly detection scenarios:")
     print("1. URL Pattern Analysis")
     print("2. User Agent Analysis") 
@@ -419,5 +202,20 @@ def generate_comprehensive_test_logs():
     print("7. SSL/TLS Behavior")
     print("8. Bandwidth Usage")
 
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Generate logs that trigger all 8 anomaly detection scenarios")
+    parser.add_argument('--output', default='comprehensive_test_logs.csv', help="output CSV path")
+    parser.add_argument('--rows', type=int, help="repeat the scenario mix up to this many rows")
+    parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the output (implied by a .gz/.bz2/.xz --output)")
+    parser.add_argument('--labels', action='store_true', help="write ground-truth scenario labels to <output>.labels.csv")
+    parser.add_argument('--format', choices=['csv', 'columnar'], default='csv', help="write CSV or a dictionary-encoded columnar corpus directory")
+    parser.add_argument('--shards', type=int, help="split --rows across this many shards")
+    parser.add_argument('--workers', type=int, help="worker processes for --shards (default: CPU count)")
+    args = parser.parse_args()
+    
+    generate_comprehensive_test_logs(args.output, args.rows, args.shards, args.workers, args.compress,
+                                     args.format == 'columnar', args.labels)
+
 if __name__ == "__main__":
-    generate_comprehensive_test_logs()
+    main()
@@ -4,73 +4,96 @@ Generate logs with EXACT same field structure as sample_zscaler_logs.csv
 This is a CUSTOM, SIMPLIFIED format, NOT the official Zscaler NSS feed format.
 """
 
-import csv
+import argparse
 import random
 from datetime import datetime, timedelta
+from functools import partial
+from itertools import islice
+
+from anomaly_labels import NORMAL, LabelSidecar, chunk_labels, periodic_runs, sidecar_path, write_labels
+from columnar_corpus import write_columnar
+from compressed_output import COMPRESSORS, open_output
+from corpus_store import write_sqlite
+from fast_csv import FastCSVWriter, needs_quoting
+from instrumentation import PROFILE_MODES, RunStats
+from render_tables import random_ipv4, render_timestamp
+from sharding import generate_sharded
+
+# Base timestamp
+BASE_TIME = datetime(2024, 1, 15, 8, 0, 0)
+
+# One pass of iter_correct_logs() covers 340 seconds; streamed cycles start this far apart
+CYCLE_SPAN = timedelta(seconds=360)
+
+# Rows yielded by one pass of iter_correct_logs()
+CYCLE_ROWS = 220
+
+# Sample data for realistic logs
+departments = ['IT', 'HR', 'Finance', 'Marketing', 'Engineering', 'Sales', 'Legal', 'Operations']
+companies = ['ACME Corp', 'TechStart Inc', 'Global Solutions Ltd']
+
+# URLs and categories for different anomaly types
+normal_urls = [
+    ('google.com/', 'Google', 'Search Engines', '15', '1024', '2048', '3072', 'General Surfing', 'Search Engines', 'Search'),
+    ('github.com/', 'GitHub', 'Development', '30', '2048', '4096', '6144', 'Technology', 'Development', 'Code Repositories'),
+    ('stackoverflow.com/', 'Stack Overflow', 'Development', '25', '1536', '3072', '4608', 'Technology', 'Development', 'Technical Q&A'),
+    ('linkedin.com/', 'LinkedIn', 'Social Networking', '20', '1024', '2048', '3072', 'Social Networking', 'Social Networking', 'Professional Networking'),
+    ('office365.com/', 'Office 365', 'Productivity', '25', '512', '1024', '1536', 'Office Apps', 'Productivity', 'Office Applications')
+]
+
+suspicious_urls = [
+    ('malware-site.com/', 'Malware Site', 'Malware', '95', '0', '0', '0', 'Security Risk', 'Malware', 'Malware Distribution'),
+    ('phishing-attempt.net/', 'Phishing Site', 'Phishing', '88', '0', '0', '0', 'Security Risk', 'Phishing', 'Phishing'),
+    ('command-control.com/', 'Command & Control', 'C2', '100', '0', '0', '0', 'Security Risk', 'Command & Control', 'C2 Server'),
+    ('malicious-download.com/', 'Malicious Download', 'Malware', '98', '0', '0', '0', 'Security Risk', 'Malware', 'Malware Downloads'),
+    ('ransomware-site.net/', 'Ransomware Site', 'Ransomware', '99', '0', '0', '0', 'Security Risk', 'Ransomware', 'Ransomware')
+]
+
+# User agents for different anomaly types
+normal_user_agents = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'
+]
+
+suspicious_user_agents = [
+    'sqlmap/1.0',
+    'nikto/2.1.6',
+    'curl/7.68.0',
+    'wget/1.20.3',
+    'python-requests/2.25.1',
+    'nmap/7.80',
+    'metasploit/6.0.0'
+]
+
+# Generated fields are vocabulary entries, digits and IPs; if no vocabulary entry needs CSV quoting,
+# no column does and the writer can skip escaping entirely
+UNSAFE_COLUMNS = None if any(
+    needs_quoting(value)
+    for value in departments + companies + normal_user_agents + suspicious_user_agents
+    + [field for url in normal_urls + suspicious_urls for field in url]
+) else frozenset()
 
 def generate_correct_logs():
     """Generate logs with exact same field structure as the working sample_zscaler_logs.csv"""
-    
-    # Base timestamp
-    base_time = datetime(2024, 1, 15, 8, 0, 0)
-    
-    # Sample data for realistic logs
-    departments = ['IT', 'HR', 'Finance', 'Marketing', 'Engineering', 'Sales', 'Legal', 'Operations']
-    companies = ['ACME Corp', 'TechStart Inc', 'Global Solutions Ltd']
-    
-    # URLs and categories for different anomaly types
-    normal_urls = [
-        ('google.com/', 'Google', 'Search Engines', '15', '1024', '2048', '3072', 'General Surfing', 'Search Engines', 'Search'),
-        ('github.com/', 'GitHub', 'Development', '30', '2048', '4096', '6144', 'Technology', 'Development', 'Code Repositories'),
-        ('stackoverflow.com/', 'Stack Overflow', 'Development', '25', '1536', '3072', '4608', 'Technology', 'Development', 'Technical Q&A'),
-        ('linkedin.com/', 'LinkedIn', 'Social Networking', '20', '1024', '2048', '3072', 'Social Networking', 'Social Networking', 'Professional Networking'),
-        ('office365.com/', 'Office 365', 'Productivity', '25', '512', '1024', '1536', 'Office Apps', 'Productivity', 'Office Applications')
-    ]
-    
-    suspicious_urls = [
-        ('malware-site.com/', 'Malware Site', 'Malware', '95', '0', '0', '0', 'Security Risk', 'Malware', 'Malware Distribution'),
-        ('phishing-attempt.net/', 'Phishing Site', 'Phishing', '88', '0', '0', '0', 'Security Risk', 'Phishing', 'Phishing'),
-        ('command-control.com/', 'Command & Control', 'C2', '100', '0', '0', '0', 'Security Risk', 'Command & Control', 'C2 Server'),
-        ('malicious-download.com/', 'Malicious Download', 'Malware', '98', '0', '0', '0', 'Security Risk', 'Malware', 'Malware Downloads'),
-        ('ransomware-site.net/', 'Ransomware Site', 'Ransomware', '99', '0', '0', '0', 'Security Risk', 'Ransomware', 'Ransomware')
-    ]
-    
-    # User agents for different anomaly types
-    normal_user_agents = [
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'
-    ]
-    
-    suspicious_user_agents = [
-        'sqlmap/1.0',
-        'nikto/2.1.6',
-        'curl/7.68.0',
-        'wget/1.20.3',
-        'python-requests/2.25.1',
-        'nmap/7.80',
-        'metasploit/6.0.0'
-    ]
-    
-    # Generate logs
-    logs = []
-    log_id = 1
-    
-    # Normal traffic patterns (first 50 entries)
+    return list(iter_correct_logs(BASE_TIME))
+
+def normal_traffic(base_time, rng=random):
+    """Normal traffic patterns (50 entries, one every 2 seconds from base_time)"""
     for i in range(50):
         timestamp = base_time + timedelta(seconds=i*2)
-        user_id = random.randint(1, 8)
+        user_id = rng.randint(1, 8)
         dept = departments[user_id % len(departments)]
-        company = random.choice(companies)
+        company = rng.choice(companies)
         
         # Normal user behavior
         client_ip = f"172.17.3.{100 + user_id}"
-        user_agent = random.choice(normal_user_agents)
-        url, url_name, url_cat, risk_score, req_size, resp_size, total_size, category, super_cat, url_class = random.choice(normal_urls)
+        user_agent = rng.choice(normal_user_agents)
+        url, url_name, url_cat, risk_score, req_size, resp_size, total_size, category, super_cat, url_class = rng.choice(normal_urls)
         
         # EXACT field structure as working sample_zscaler_logs.csv (34 fields)
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             f"{dept.lower()}-{company.lower().replace(' ', '-')}",  # 1. login
             "HTTP",  # 2. department
             url,  # 3. company
@@ -92,7 +115,7 @@ def generate_correct_logs():
             f"{dept.lower()}-{company.lower().replace(' ', '-')}",  # 19. ruleType
             f"{dept} Department",  # 20. ruleLabel
             client_ip,  # 21. threatName - CLIENT IP (internal)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity - SERVER IP (external)
+            random_ipv4(rng),  # 22. threatSeverity - SERVER IP (external)
             "GET",  # 23. riskScore - REQUEST METHOD
             "200",  # 24. malwareCategory - RESPONSE CODE
             user_agent,  # 25. malwareClass - USER AGENT
@@ -105,14 +128,14 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    # High-frequency requests from single IP (anomaly 1)
+        yield log
+
+def anomaly_high_frequency(start, rng=random):
+    """High-frequency requests from a single client IP (anomaly 1), one per second from start"""
     for i in range(20):
-        timestamp = base_time + timedelta(seconds=100 + i)
+        timestamp = start + timedelta(seconds=i)
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             "it-acme-corp",  # 1. login
             "HTTP",  # 2. department
             f"api.example.com/endpoint{i}",  # 3. company
@@ -134,7 +157,7 @@ def generate_correct_logs():
             "it-acme-corp",  # 19. ruleType
             "IT Department",  # 20. ruleLabel
             "172.17.3.200",  # 21. threatName - Same IP making many requests (CLIENT IP)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity (SERVER IP)
+            random_ipv4(rng),  # 22. threatSeverity (SERVER IP)
             "GET",  # 23. riskScore (REQUEST METHOD)
             "200",  # 24. malwareCategory (RESPONSE CODE)
             "curl/7.68.0",  # 25. malwareClass (USER AGENT) - Suspicious user agent
@@ -147,15 +170,15 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    # Suspicious user agents and blocked requests (anomaly 2)
+        yield log
+
+def anomaly_suspicious_agents(start, rng=random):
+    """Scanner user agents with blocked admin requests (anomaly 2), one per second from start"""
     for i in range(15):
-        timestamp = base_time + timedelta(seconds=120 + i)
-        suspicious_ua = random.choice(suspicious_user_agents)
+        timestamp = start + timedelta(seconds=i)
+        suspicious_ua = rng.choice(suspicious_user_agents)
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             "eng-acme-corp",  # 1. login
             "HTTP",  # 2. department
             f"admin.example.com/panel{i}",  # 3. company
@@ -177,7 +200,7 @@ def generate_correct_logs():
             "eng-acme-corp",  # 19. ruleType
             "Engineering Department",  # 20. ruleLabel
             "172.17.3.201",  # 21. threatName (CLIENT IP)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity (SERVER IP)
+            random_ipv4(rng),  # 22. threatSeverity (SERVER IP)
             "POST",  # 23. riskScore (REQUEST METHOD)
             "403",  # 24. malwareCategory (RESPONSE CODE)
             suspicious_ua,  # 25. malwareClass (USER AGENT)
@@ -190,15 +213,15 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    # Geographic anomalies - multiple IPs from same country (anomaly 3)
+        yield log
+
+def anomaly_geographic(start, rng=random):
+    """Many client IPs from the same unusual countries (anomaly 3), one per second from start"""
     for i in range(25):
-        timestamp = base_time + timedelta(seconds=140 + i)
-        country = random.choice(['CN', 'RU', 'NG'])  # Countries with unusual access patterns
+        timestamp = start + timedelta(seconds=i)
+        country = rng.choice(['CN', 'RU', 'NG'])  # Countries with unusual access patterns
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             "ext-unknown",  # 1. login
             "HTTP",  # 2. department
             f"www.example.com/page{i}",  # 3. company
@@ -219,11 +242,11 @@ def generate_correct_logs():
             "None",  # 18. reason
             "ext-unknown",  # 19. ruleType
             "External Department",  # 20. ruleLabel
-            f"172.17.{random.randint(100, 200)}.{random.randint(1, 255)}",  # 21. threatName (CLIENT IP)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity (SERVER IP)
+            f"172.17.{rng.randint(100, 200)}.{rng.randint(1, 255)}",  # 21. threatName (CLIENT IP)
+            random_ipv4(rng),  # 22. threatSeverity (SERVER IP)
             "GET",  # 23. riskScore (REQUEST METHOD)
             "200",  # 24. malwareCategory (RESPONSE CODE)
-            random.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
+            rng.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
             "None",  # 26. urlCategory
             "URLFilter",  # 27. urlSuperCategory
             f"EXT_Allow_{country}_{i}",  # 28. urlClass
@@ -233,14 +256,14 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    # Time-based anomalies - traffic spikes (anomaly 4)
+        yield log
+
+def anomaly_traffic_spike(start, rng=random):
+    """Traffic spike from consecutive client IPs (anomaly 4), one per second from start"""
     for i in range(30):
-        timestamp = base_time + timedelta(seconds=180 + i)
+        timestamp = start + timedelta(seconds=i)
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             "it-acme-corp",  # 1. login
             "HTTP",  # 2. department
             f"www.example.com/api/v1/data{i}",  # 3. company
@@ -262,10 +285,10 @@ def generate_correct_logs():
             "it-acme-corp",  # 19. ruleType
             "IT Department",  # 20. ruleLabel
             f"172.17.3.{220 + i}",  # 21. threatName (CLIENT IP)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity (SERVER IP)
+            random_ipv4(rng),  # 22. threatSeverity (SERVER IP)
             "GET",  # 23. riskScore (REQUEST METHOD)
             "200",  # 24. malwareCategory (RESPONSE CODE)
-            random.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
+            rng.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
             "None",  # 26. urlCategory
             "URLFilter",  # 27. urlSuperCategory
             f"API_Allow_{220 + i}",  # 28. urlClass
@@ -275,14 +298,14 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    # SSL/TLS anomalies (anomaly 5)
+        yield log
+
+def anomaly_tls(start, rng=random):
+    """HTTPS banking requests (anomaly 5), one per second from start"""
     for i in range(20):
-        timestamp = base_time + timedelta(seconds=220 + i)
+        timestamp = start + timedelta(seconds=i)
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             "fin-acme-corp",  # 1. login
             "HTTPS",  # 2. department
             f"secure.example.com/banking{i}",  # 3. company
@@ -304,10 +327,10 @@ def generate_correct_logs():
             "fin-acme-corp",  # 19. ruleType
             "Finance Department",  # 20. ruleLabel
             f"172.17.3.{250 + i}",  # 21. threatName (CLIENT IP)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity (SERVER IP)
+            random_ipv4(rng),  # 22. threatSeverity (SERVER IP)
             "POST",  # 23. riskScore (REQUEST METHOD)
             "200",  # 24. malwareCategory (RESPONSE CODE)
-            random.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
+            rng.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
             "None",  # 26. urlCategory
             "URLFilter",  # 27. urlSuperCategory
             f"Finance_Allow_{250 + i}",  # 28. urlClass
@@ -317,16 +340,16 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    # File access anomalies (anomaly 6)
+        yield log
+
+def anomaly_file_access(start, rng=random):
+    """Downloads of suspicious file types (anomaly 6), one per second from start"""
     for i in range(15):
-        timestamp = base_time + timedelta(seconds=250 + i)
+        timestamp = start + timedelta(seconds=i)
         suspicious_extensions = ['exe', 'dll', 'bat', 'cmd', 'ps1', 'vbs', 'js', 'jar', 'zip', 'rar']
-        ext = random.choice(suspicious_extensions)
+        ext = rng.choice(suspicious_extensions)
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             "eng-acme-corp",  # 1. login
             "HTTP",  # 2. department
             f"download.example.com/files/update.{ext}",  # 3. company
@@ -348,10 +371,10 @@ def generate_correct_logs():
             "eng-acme-corp",  # 19. ruleType
             "Engineering Department",  # 20. ruleLabel
             f"172.17.3.{270 + i}",  # 21. threatName (CLIENT IP)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity (SERVER IP)
+            random_ipv4(rng),  # 22. threatSeverity (SERVER IP)
             "GET",  # 23. riskScore (REQUEST METHOD)
             "200",  # 24. malwareCategory (RESPONSE CODE)
-            random.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
+            rng.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
             "None",  # 26. urlCategory
             "URLFilter",  # 27. urlSuperCategory
             f"Download_Allow_{270 + i}",  # 28. urlClass
@@ -361,14 +384,14 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    # Response code anomalies (anomaly 7)
+        yield log
+
+def anomaly_response_codes(start, rng=random):
+    """High rate of 404 responses (anomaly 7), one per second from start"""
     for i in range(25):
-        timestamp = base_time + timedelta(seconds=280 + i)
+        timestamp = start + timedelta(seconds=i)
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             "mkt-acme-corp",  # 1. login
             "HTTP",  # 2. department
             f"www.example.com/nonexistent{i}",  # 3. company
@@ -390,10 +413,10 @@ def generate_correct_logs():
             "mkt-acme-corp",  # 19. ruleType
             "Marketing Department",  # 20. ruleLabel
             f"172.17.3.{290 + i}",  # 21. threatName (CLIENT IP)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity (SERVER IP)
+            random_ipv4(rng),  # 22. threatSeverity (SERVER IP)
             "GET",  # 23. riskScore (REQUEST METHOD)
             "404",  # 24. malwareCategory (RESPONSE CODE) - High rate of 404 errors
-            random.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
+            rng.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
             "None",  # 26. urlCategory
             "URLFilter",  # 27. urlSuperCategory
             f"Web_Allow_{290 + i}",  # 28. urlClass
@@ -403,14 +426,14 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    # Bandwidth anomalies (anomaly 8)
+        yield log
+
+def anomaly_bandwidth(start, rng=random):
+    """Large file downloads (anomaly 8), one per second from start"""
     for i in range(20):
-        timestamp = base_time + timedelta(seconds=320 + i)
+        timestamp = start + timedelta(seconds=i)
         log = [
-            timestamp.strftime("%a %b %d %H:%M:%S %Y"),  # 0. timestamp
+            render_timestamp(timestamp),  # 0. timestamp
             "it-acme-corp",  # 1. login
             "HTTP",  # 2. department
             f"cdn.example.com/large-file{i}.zip",  # 3. company
@@ -432,10 +455,10 @@ def generate_correct_logs():
             "it-acme-corp",  # 19. ruleType
             "IT Department",  # 20. ruleLabel
             f"172.17.3.{320 + i}",  # 21. threatName (CLIENT IP)
-            f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",  # 22. threatSeverity (SERVER IP)
+            random_ipv4(rng),  # 22. threatSeverity (SERVER IP)
             "GET",  # 23. riskScore (REQUEST METHOD)
             "200",  # 24. malwareCategory (RESPONSE CODE)
-            random.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
+            rng.choice(normal_user_agents),  # 25. malwareClass (USER AGENT)
             "None",  # 26. urlCategory
             "URLFilter",  # 27. urlSuperCategory
             f"CDN_Allow_{320 + i}",  # 28. urlClass
@@ -445,37 +468,195 @@ def generate_correct_logs():
             "NA",  # 32. fileName
             "N/A"  # 33. fileType
         ]
-        logs.append(log)
-        log_id += 1
-    
-    return logs
+        yield log
+
+# Anomaly blocks of one pass: (scenario name, block generator, offset in seconds from the pass start)
+ANOMALY_BLOCKS = [
+    ('high_frequency', anomaly_high_frequency, 100),
+    ('suspicious_agents', anomaly_suspicious_agents, 120),
+    ('geographic', anomaly_geographic, 140),
+    ('traffic_spike', anomaly_traffic_spike, 180),
+    ('tls', anomaly_tls, 220),
+    ('file_access', anomaly_file_access, 250),
+    ('response_codes', anomaly_response_codes, 280),
+    ('bandwidth', anomaly_bandwidth, 320),
+]
+
+def iter_correct_logs(base_time, rng=random):
+    """Lazily yield one pass of the normal traffic and anomaly blocks starting at base_time, drawing from rng"""
+    yield from normal_traffic(base_time, rng)
+    for _, block, offset in ANOMALY_BLOCKS:
+        yield from block(base_time + timedelta(seconds=offset), rng)
+
+def cycle_labels():
+    """(row offset, scenario id) runs of one pass of iter_correct_logs()"""
+    runs = [(0, NORMAL)]
+    offset = sum(1 for _ in normal_traffic(BASE_TIME, random.Random()))
+    for name, block, _ in ANOMALY_BLOCKS:
+        runs.append((offset, name))
+        offset += sum(1 for _ in block(BASE_TIME, random.Random()))
+    return runs
 
-def write_csv(logs, filename):
-    """Write logs to CSV file"""
-    if not logs:
-        return
+def stream_correct_logs(rows=None, base_time=BASE_TIME, rng=random):
+    """Yield rows lazily, repeating the traffic/anomaly mix every CYCLE_SPAN until rows is reached (forever if None)"""
+    def cycles():
+        cycle_start = base_time
+        while True:
+            yield from iter_correct_logs(cycle_start, rng)
+            cycle_start += CYCLE_SPAN
     
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        for log in logs:
-            writer.writerow(log)
+    return islice(cycles(), rows)
+
+def shard_correct_logs(start, stop, rng):
+    """Yield the streamed rows with global indices [start, stop), used as the sharded row source"""
+    cycle, offset = divmod(start, CYCLE_ROWS)
+    rows = stream_correct_logs(None, BASE_TIME + cycle * CYCLE_SPAN, rng)
+    return islice(rows, offset, offset + stop - start)
+
+def write_csv(logs, filename, max_bytes=None, quote_all=False, unsafe_columns=UNSAFE_COLUMNS, compression=None,
+              stats=None):
+    """
+    Write logs (any iterable of rows) to a CSV file in buffered chunks, stopping once max_bytes
+    of uncompressed CSV is reached. compression (or a .gz/.bz2/.xz filename) compresses the output.
+    stats (an instrumentation.RunStats) times the run's phases and reports progress.
+    """
+    with open_output(filename, compression) as out, \
+            FastCSVWriter(out, quote_all=quote_all, unsafe_columns=unsafe_columns) as writer:
+        if stats is not None:
+            stats.instrument_writer(writer)
+            logs = stats.rows(logs)
+        count = writer.writerows(logs, max_bytes=max_bytes)
     
-    print(f"Generated {len(logs)} log entries in {filename}")
+    if count:
+        print(f"Generated {count} log entries in {filename}")
+    return count
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Generate logs in the sample_zscaler_logs.csv field structure")
+    parser.add_argument('--output', default='data/correct_format_logs.csv', help="output CSV path")
+    parser.add_argument('--rows', type=int, help=f"stream this many rows instead of the fixed {CYCLE_ROWS}-row sample")
+    parser.add_argument('--bytes', type=int, dest='max_bytes', help="stop streaming once the file reaches this many bytes")
+    parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the output (implied by a .gz/.bz2/.xz --output)")
+    parser.add_argument('--seed', type=int, help="seed for reproducible output")
+    parser.add_argument('--labels', action='store_true', help="write ground-truth scenario labels to <output>.labels.csv")
+    parser.add_argument('--format', choices=['csv', 'columnar', 'sqlite'], default='csv', help="write CSV, a dictionary-encoded columnar corpus directory or an indexed SQLite store")
+    parser.add_argument('--batch', action='store_true', help="stream background traffic from the columnar batch engine")
+    parser.add_argument('--density', type=float, help="merge every anomaly scenario into batch background traffic at this fraction of rows")
+    parser.add_argument('--users', type=int, help="distinct users in batch background traffic")
+    parser.add_argument('--client-ips', type=int, help="distinct client IPs in batch background traffic")
+    parser.add_argument('--server-ips', type=int, help="distinct server IPs in batch background traffic")
+    parser.add_argument('--urls', type=int, help="distinct URLs in batch background traffic")
+    parser.add_argument('--skew', type=float, help="Zipf exponent of key popularity (0 = uniform)")
+    parser.add_argument('--shards', type=int, help="split --rows across this many deterministically seeded shards")
+    parser.add_argument('--workers', type=int, help="worker processes for --shards (default: CPU count)")
+    parser.add_argument('--progress', action='store_true', help="report progress and a per-phase time breakdown on stderr")
+    parser.add_argument('--stats-file', help="append progress records as JSON lines to this file (implies --progress)")
+    parser.add_argument('--report-every', type=float, default=5.0, help="seconds between progress reports (default: 5)")
+    parser.add_argument('--profile', choices=PROFILE_MODES, help="attribute time or allocations to each scenario block (implies --progress)")
+    return parser.parse_args()
 
 def main():
     """Main function"""
+    args = parse_args()
     print("Generating logs with EXACT same field structure as working sample_zscaler_logs.csv...")
     print("Note: This is a CUSTOM, SIMPLIFIED format, NOT the official Zscaler NSS feed format.")
     
-    # Generate logs
-    logs = generate_correct_logs()
+    if args.seed is not None:
+        random.seed(args.seed)
+    
+    knobs = {name: getattr(args, name) for name in ('users', 'client_ips', 'server_ips', 'urls', 'skew')}
+    skewed = any(value is not None for value in knobs.values())
+    
+    seed = args.seed
+    if seed is None and (args.shards or args.batch or args.density is not None or skewed):
+        # These modes seed their own generators; draw a seed and print it so the run can be reproduced
+        seed = random.SystemRandom().randrange(1 << 32)
+        print(f"Using --seed {seed}")
+    
+    if args.batch or args.density is not None or skewed:
+        # Imported lazily: these modules build their column tables from this module's vocabularies
+        import batch_synthesis
+        import cardinality
+        import scenario_merge
+        
+        config = cardinality.DEFAULT_CARDINALITY._replace(**{k: v for k, v in knobs.items() if v is not None})
+        if args.rows is None and args.max_bytes is None:
+            # These sources never end; without a limit, write one sample's worth of rows like the plain path
+            args.rows = CYCLE_ROWS
+    
+    if args.shards and args.density is not None:
+        raise SystemExit("--density cannot be combined with --shards")
+    if args.format != 'csv' and (args.shards or args.compress or args.max_bytes is not None):
+        raise SystemExit(f"--format {args.format} cannot be combined with --shards, --compress or --bytes")
+    
+    stats = None
+    if args.progress or args.stats_file or args.profile:
+        if args.shards:
+            raise SystemExit("--progress, --stats-file and --profile cannot be combined with --shards")
+        blocks = {NORMAL: normal_traffic, **{name: block for name, block, _ in ANOMALY_BLOCKS}}
+        stats = RunStats(args.rows, args.max_bytes, args.report_every, args.stats_file, args.profile, blocks)
     
-    # Write to CSV
-    write_csv(logs, 'data/correct_format_logs.csv')
+    if args.shards:
+        if args.rows is None:
+            raise SystemExit("--shards requires --rows")
+        # Output depends only on (seed, shards, rows), never on the worker count
+        if skewed:
+            row_source = partial(cardinality.shard_skewed_background, cardinality=config)
+        elif args.batch:
+            row_source = batch_synthesis.shard_background
+        else:
+            row_source = shard_correct_logs
+        total = generate_sharded(row_source, args.rows, args.output, args.shards,
+                                 seed=seed, workers=args.workers, unsafe_columns=UNSAFE_COLUMNS,
+                                 compression=args.compress)
+        print(f"Generated {total} log entries in {args.output} from {args.shards} shards")
+        if args.labels:
+            runs = [(0, NORMAL)] if args.batch or skewed else periodic_runs(cycle_labels(), CYCLE_ROWS)
+            write_labels(sidecar_path(args.output), runs, total)
+    else:
+        # Generate logs; streaming mode never holds more than one write chunk in memory
+        if skewed:
+            background = cardinality.stream_skewed_background(seed=seed, cardinality=config)
+        elif args.batch or args.density is not None:
+            background = batch_synthesis.stream_background(seed=seed)
+        
+        if args.density is not None and args.labels:
+            # Merged rows carry their scenario id, so labels are streamed as the rows are written
+            sidecar = LabelSidecar(sidecar_path(args.output))
+            pairs = scenario_merge.merged_logs(args.rows, args.density, seed=seed, background=background,
+                                               labelled=True)
+            logs = sidecar.tag(chunk_labels(pairs))
+        elif args.density is not None:
+            logs = scenario_merge.merged_logs(args.rows, args.density, seed=seed, background=background)
+        elif args.batch or skewed:
+            logs = islice(background, args.rows)
+        elif args.rows is not None or args.max_bytes is not None:
+            logs = stream_correct_logs(args.rows)
+        else:
+            logs = generate_correct_logs()
+        
+        # Write to CSV
+        if args.format == 'columnar':
+            total = write_columnar(stats.rows(logs) if stats else logs, args.output)
+        elif args.format == 'sqlite':
+            total = write_sqlite(stats.rows(logs) if stats else logs, args.output)
+        else:
+            total = write_csv(logs, args.output, max_bytes=args.max_bytes, compression=args.compress, stats=stats)
+        if stats is not None:
+            stats.finish()
+        
+        if args.labels and args.density is not None:
+            sidecar.close(total)
+            print(f"Wrote anomaly labels for {total} rows to {sidecar.path}")
+        elif args.labels:
+            # Every other mode has a fixed label layout, written once the row count is known
+            runs = [(0, NORMAL)] if args.batch or skewed else periodic_runs(cycle_labels(), CYCLE_ROWS)
+            write_labels(sidecar_path(args.output), runs, total)
     
     # Generate summary
     print("\nLog Summary:")
-    print(f"Total entries: {len(logs)}")
+    print(f"Total entries: {total}")
     
     print("\nField mapping (EXACTLY matches your working sample):")
     print("  Field 21: clientIP (internal IP)")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Fixed-memory log-bucketed latency histogram.
+
+Latencies are counted in buckets that grow by GROWTH per step from
+MIN_LATENCY. Any number of samples costs a few hundred counters, and
+percentiles are accurate to within one bucket (about 5%). Histograms
+merge by adding counts, so per-worker histograms combine exactly.
+"""
+
+import math
+
+# Smallest latency resolved (seconds); anything below lands in bucket 0
+MIN_LATENCY = 1e-6
+
+# Ratio between consecutive bucket bounds
+GROWTH = 1.05
+
+
+class LatencyHistogram:
+    """Counts of latencies (seconds) in logarithmic buckets"""
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, latency, count=1):
+        """Add count samples of latency seconds"""
+        bucket = 0 if latency <= MIN_LATENCY else int(math.log(latency / MIN_LATENCY, GROWTH)) + 1
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+        self.sum += latency * count
+        if latency > self.max:
+            self.max = latency
+
+    def merge(self, other):
+        """Add another histogram's samples to this one"""
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (0-100), or 0.0 when empty"""
+        if not self.total:
+            return 0.0
+        rank = p / 100 * self.total
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(MIN_LATENCY * GROWTH ** bucket, self.max)
+        return self.max
+
+    def mean(self):
+        """Mean latency, or 0.0 when empty"""
+        return self.sum / self.total if self.total else 0.0
+
+    def summary(self, percentiles=(50, 90, 99)):
+        """Dict of count, mean, the given percentiles and max, in milliseconds"""
+        summary = {'count': self.total, 'mean_ms': round(self.mean() * 1000, 3)}
+        for p in percentiles:
+            summary[f"p{p}_ms"] = round(self.percentile(p) * 1000, 3)
+        summary['max_ms'] = round(self.max * 1000, 3)
+        return summary
+
+    def render(self, width=40):
+        """Text bar chart of the samples, in power-of-two millisecond buckets"""
+        coarse = {}
+        for bucket, count in self.counts.items():
+            ms = MIN_LATENCY * GROWTH ** bucket * 1000
+            bound = 2.0 ** math.ceil(math.log2(ms)) if ms > 0 else 0.0
+            coarse[bound] = coarse.get(bound, 0) + count
+        if not coarse:
+            return "(no samples)"
+        peak = max(coarse.values())
+        lines = []
+        for bound in sorted(coarse):
+            count = coarse[bound]
+            bar = '#' * max(1, round(count / peak * width))
+            lines.append(f"  <= {bound:>10g} ms  {count:>8}  {bar}")
+        return '\n'.join(lines)
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-phase timing, progress reporting and profiling for generator runs.
+
+RunStats wraps the pipeline of a streaming run without touching its hot loops:
+- rows(): pulls the row source a batch at a time and times it as `generate`
+  (random sampling, timestamp formatting and row assembly together)
+- instrument_writer(): times a FastCSVWriter's CSV formatting and UTF-8
+  encoding as `encode`, the time spent blocked on a parallel compressor as
+  `compress`, and raw writes to the file as `io`
+
+Nested phases are timed exclusively, so the phases add up to the run time,
+less small bookkeeping overhead (reported as `other`). Every --report-every
+seconds a progress line goes to stderr (rows/sec, MB/sec and ETA when the
+target size is known). It can instead go, as JSON, to a stats file that
+dashboards can scrape.
+
+The profile modes split `generate` further by scenario block:
+- cprofile: times each block function and attributes what it calls to
+  sampling (the random module), timestamps (strftime and the timestamp
+  helpers) or assembly (everything else, including the block's own row
+  building)
+- tracemalloc: snapshots the rows of every few source batches while they
+  are held for writing, and attributes their memory to the block that
+  allocated them
+"""
+
+import cProfile
+import json
+import pstats
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+from compressed_output import ParallelCompressedWriter
+
+# Rows pulled from the source per timed batch
+BATCH_ROWS = 8192
+
+# Source batches between tracemalloc snapshots
+SNAPSHOT_EVERY = 16
+
+# Frames kept per traced allocation; row lists and their strings are built in the block's own frame
+TRACE_DEPTH = 1
+
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+PHASES = ('generate', 'encode', 'compress', 'io')
+
+_TIMESTAMP_FUNCTIONS = ('strftime', 'render_timestamp', '_timestamp_column')
+
+
+def _profile_phase(filename, function):
+    """Phase a profiled callee of a block belongs to"""
+    if filename.endswith('random.py') or 'random' in function:
+        return 'sampling'
+    if any(name in function for name in _TIMESTAMP_FUNCTIONS):
+        return 'timestamps'
+    return 'assembly'
+
+
+class _TimedFile:
+    """File proxy whose writes are timed as a phase"""
+
+    def __init__(self, file, write):
+        self._file = file
+        self.write = write
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class RunStats:
+    """Phase timings, progress and optional profile of one generator run"""
+
+    def __init__(self, total_rows=None, total_bytes=None, report_every=5.0, stats_file=None, profile=None,
+                 blocks=None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Unsupported profile mode: {profile}")
+        self.total_rows = total_rows
+        self.total_bytes = total_bytes
+        self.report_every = report_every
+        self.profile = profile
+        # Scenario block name -> generator function, for profile attribution
+        self.blocks = blocks or {}
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.rows_pulled = 0
+        self.writer = None
+        self._stack = []
+        self._stats_file = open(stats_file, 'a', encoding='utf-8') if stats_file else None
+        self._profiler = None
+        self._block_memory = {}
+        self._snapshots = 0
+        self._batches = 0
+        self._start = self._last_report = None
+
+    def timed(self, function, phase):
+        """Wrap function so its calls count as phase, excluding time in nested timed calls"""
+        stack = self._stack
+        phases = self.phases
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            stack.append(0.0)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                phases[phase] += elapsed - stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+        return wrapper
+
+    def instrument_writer(self, writer):
+        """Time a FastCSVWriter's encoding, compression and file writes; return the writer"""
+        self.writer = writer
+        writer.format_rows = self.timed(writer.format_rows, 'encode')
+        writer._write_text = self.timed(writer._write_text, 'encode')
+        out = writer._file
+        if isinstance(out, ParallelCompressedWriter):
+            out._file = _TimedFile(out._file, self.timed(out._file.write, 'io'))
+            out.write = self.timed(out.write, 'compress')
+            out.flush = self.timed(out.flush, 'compress')
+        else:
+            writer._file = _TimedFile(out, self.timed(out.write, 'io'))
+        return writer
+
+    def start(self):
+        """Start the clock (and the profiler)"""
+        self._start = self._last_report = time.perf_counter()
+        if self.profile == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == 'tracemalloc':
+            import tracemalloc
+            tracemalloc.start(TRACE_DEPTH)
+
+    def rows(self, rows):
+        """Yield the rows of a source, timing its production as `generate` and reporting progress"""
+        if self._start is None:
+            self.start()
+        rows = iter(rows)
+        clock = time.perf_counter
+        while True:
+            # Checked before each pull, once the writer has written the previous batch
+            start = clock()
+            if self.report_every and start - self._last_report >= self.report_every:
+                self._last_report = start
+                self.report()
+                start = clock()
+            batch = list(islice(rows, BATCH_ROWS))
+            self.phases['generate'] += clock() - start
+            if not batch:
+                return
+            self.rows_pulled += len(batch)
+            self._batches += 1
+            if self.profile == 'tracemalloc' and self._batches % SNAPSHOT_EVERY == 1:
+                self._snapshot_blocks()
+            yield from batch
+
+    def _code_blocks(self):
+        """{(filename, first line, name) of a block function's code: block name}"""
+        return {(f.__code__.co_filename, f.__code__.co_firstlineno, f.__code__.co_name): name
+                for name, f in self.blocks.items()}
+
+    def _snapshot_blocks(self):
+        """Attribute the memory of the rows currently held to the block function that allocated them"""
+        import tracemalloc
+        ranges = [(f.__code__.co_filename, f.__code__.co_firstlineno,
+                   max(line for _, _, line in f.__code__.co_lines() if line is not None), name)
+                  for name, f in self.blocks.items()]
+        filters = [tracemalloc.Filter(True, filename) for filename in {filename for filename, _, _, _ in ranges}]
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+        self._snapshots += 1
+        for stat in snapshot.statistics('lineno'):
+            frame = stat.traceback[0]
+            block = next((name for filename, first, last, name in ranges
+                          if frame.filename == filename and first <= frame.lineno <= last), None)
+            if block is not None:
+                memory = self._block_memory.setdefault(block, [0, 0])
+                memory[0] += stat.size
+                memory[1] += stat.count
+
+    def elapsed(self):
+        return time.perf_counter() - self._start if self._start is not None else 0.0
+
+    def progress(self):
+        """Dict of the current progress and phase seconds"""
+        elapsed = self.elapsed() or 1e-9
+        rows = self.writer.rows_written if self.writer is not None else self.rows_pulled
+        data = self.writer.bytes_written if self.writer is not None else None
+        record = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'elapsed': round(elapsed, 3),
+            'rows': rows,
+            'rows_per_sec': round(rows / elapsed, 1),
+        }
+        if data is not None:
+            record['bytes'] = data
+            record['mb_per_sec'] = round(data / elapsed / 1e6, 3)
+        eta = None
+        if self.total_rows and rows:
+            eta = (self.total_rows - rows) * elapsed / rows
+        elif self.total_bytes and data:
+            eta = (self.total_bytes - data) * elapsed / data
+        if eta is not None:
+            record['eta_seconds'] = round(max(0.0, eta), 1)
+        record['phases'] = {phase: round(seconds, 3) for phase, seconds in self.phases.items()}
+        return record
+
+    def _emit(self, record):
+        if self._stats_file is not None:
+            self._stats_file.write(json.dumps(record) + '\n')
+            self._stats_file.flush()
+
+    def report(self):
+        """Write a progress line to stderr or a record to the stats file"""
+        record = self.progress()
+        if self._stats_file is not None:
+            self._emit(record)
+            return
+        line = f"{record['elapsed']:8.1f}s  {record['rows']:>12,} rows  {record['rows_per_sec']:>12,.0f} rows/s"
+        if 'mb_per_sec' in record:
+            line += f"  {record['mb_per_sec']:8.2f} MB/s"
+        if 'eta_seconds' in record:
+            line += f"  ETA {record['eta_seconds']:.0f}s"
+        print(line, file=sys.stderr)
+
+    def block_profile(self):
+        """{block: {phase: seconds}} from the cProfile run, with each block's total"""
+        stats = pstats.Stats(self._profiler).stats
+        codes = self._code_blocks()
+        blocks = {}
+        for key, (_, _, own, total, callers) in stats.items():
+            if key in codes:
+                entry = blocks.setdefault(codes[key], {'sampling': 0.0, 'timestamps': 0.0, 'assembly': 0.0})
+                entry['total'] = total
+                entry['assembly'] += own
+            for caller, (_, _, _, caller_total) in callers.items():
+                if caller in codes and caller != key:
+                    entry = blocks.setdefault(codes[caller], {'sampling': 0.0, 'timestamps': 0.0, 'assembly': 0.0})
+                    entry[_profile_phase(key[0], key[2])] += caller_total
+        return {name: {phase: round(seconds, 4) for phase, seconds in entry.items()} for name, entry in blocks.items()}
+
+    def finish(self):
+        """Stop profiling and report the final phase breakdown (and per-block profile)"""
+        if self._profiler is not None:
+            self._profiler.disable()
+        record = self.progress()
+        record['final'] = True
+        elapsed = record['elapsed']
+        record['phases']['other'] = round(max(0.0, elapsed - sum(self.phases.values())), 3)
+        if self.profile == 'cprofile':
+            record['blocks'] = self.block_profile()
+        elif self.profile == 'tracemalloc':
+            import tracemalloc
+            record['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            snapshots = max(1, self._snapshots)
+            record['blocks'] = {name: {'held_bytes': size // snapshots, 'held_allocations': count // snapshots}
+                                for name, (size, count) in self._block_memory.items()}
+        self._emit(record)
+        if self._stats_file is not None:
+            self._stats_file.close()
+
+        print(f"Phase breakdown over {elapsed:.2f}s:", file=sys.stderr)
+        for phase, seconds in record['phases'].items():
+            print(f"  {phase:>10} {seconds:10.3f}s  {seconds / (elapsed or 1e-9):6.1%}", file=sys.stderr)
+        if self.profile == 'cprofile':
+            print("  block                    total   sampling  timestamps   assembly", file=sys.stderr)
+            for name, entry in sorted(record['blocks'].items(), key=lambda item: -item[1].get('total', 0)):
+                print(f"  {name:<20} {entry.get('total', 0):9.3f}s {entry['sampling']:9.3f}s "
+                      f"{entry['timestamps']:10.3f}s {entry['assembly']:9.3f}s", file=sys.stderr)
+        elif self.profile == 'tracemalloc':
+            print(f"  traced peak {record['traced_peak_bytes'] / 1e6:.1f} MB; rows held per write batch, by block:",
+                  file=sys.stderr)
+            for name, entry in sorted(record['blocks'].items(), key=lambda item: -item[1]['held_bytes']):
+                print(f"  {name:<20} {entry['held_bytes'] / 1e6:9.2f} MB in {entry['held_allocations']:,} allocations",
+                      file=sys.stderr)
+        return record
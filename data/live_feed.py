@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Rate-controlled live feed of generated rows, for NSS-style streaming ingest tests.
+
+A Zscaler NSS feed pushes one CSV line per event to a TCP or UDP listener.
+The emitter pulls rows from any generator row source, paces them on a send
+schedule, and writes them over TCP (newline-framed) or UDP (one datagram per
+event). There are two schedules:
+- rate: a steady --rate events/sec, multiplied by --burst-factor for the
+  first --burst-length seconds of every --burst-every seconds
+- replay: the rows' own timestamps, compressed --replay times, so the
+  corpus's bursts come through as they were generated. An example is the
+  15-request 10:00 spike of the comprehensive scenario. Rows older than
+  their predecessor are sent straight away.
+
+Every send records the latency from each event's scheduled time to the
+moment the write completed (after drain for TCP). Backlog is the number of
+events already due when a send starts. Progress is reported to stderr each
+--report-every seconds, and a JSON summary goes to stdout. The bundled sink
+counts received events; --with-sink runs one in the same process on a free
+port, so the whole path can be tested end to end:
+
+    python live_feed.py emit --source merged --rate 20000 --duration 10 --with-sink
+    python live_feed.py emit --source comprehensive --replay 600 --protocol udp --with-sink
+    python live_feed.py sink --port 5514 &
+    python live_feed.py emit --port 5514 --rate 5000 --burst-factor 10 --burst-every 60 --burst-length 5
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import sys
+from datetime import datetime
+from itertools import islice
+
+from attack_datasets import DATASETS, stream_dataset
+from batch_synthesis import stream_background
+from fast_csv import FastCSVWriter
+from generate_comprehensive_test import stream_comprehensive_test_logs
+from generate_correct_logs import UNSAFE_COLUMNS, stream_correct_logs
+from histograms import LatencyHistogram
+from render_tables import TIMESTAMP_FORMAT
+from scenario_merge import merged_logs
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5514
+
+# Endless row sources by name; attack datasets run for a week of traffic
+SOURCES = {
+    'correct': lambda seed: stream_correct_logs(rng=random.Random(seed)),
+    'comprehensive': lambda seed: stream_comprehensive_test_logs(),
+    'background': lambda seed: stream_background(seed=seed),
+    'merged': lambda seed: merged_logs(seed=seed),
+}
+SOURCES.update({name: (lambda seed, name=name: stream_dataset(name, duration=7 * 86400)) for name in DATASETS})
+
+# Rows formatted per join
+FORMAT_ROWS = 1024
+
+# Most events handed to one send
+MAX_BATCH = 4096
+
+# Longest sleep while waiting for the next event to fall due (seconds)
+TICK = 0.01
+
+# Fields per row; the sink counts lines with fewer as malformed
+COLUMNS = 34
+
+
+def rate_schedule(rows, rate, burst_factor=1.0, burst_every=None, burst_length=0.0):
+    """Yield (send time, row) pairs at rate events/sec, burst_factor times faster for burst_length of every burst_every seconds"""
+    t = 0.0
+    steady = 1 / rate
+    burst = 1 / (rate * burst_factor)
+    for row in rows:
+        yield t, row
+        t += burst if burst_every and t % burst_every < burst_length else steady
+
+
+def replay_schedule(rows, speedup=1.0):
+    """Yield (send time, row) pairs following the rows' timestamps, speedup times faster than real time"""
+    first = None
+    last_text = None
+    t = 0.0
+    for row in rows:
+        text = row[0]
+        if text != last_text:
+            seconds = datetime.strptime(text, TIMESTAMP_FORMAT).timestamp()
+            if first is None:
+                first = seconds
+            # Out-of-order rows go out with their predecessor
+            t = max(t, (seconds - first) / speedup)
+            last_text = text
+        yield t, row
+
+
+def encode_schedule(pairs, unsafe_columns=UNSAFE_COLUMNS):
+    """Turn (send time, row) pairs into (send time, newline-terminated CSV bytes) pairs"""
+    writer = FastCSVWriter(io.BytesIO(), unsafe_columns=unsafe_columns, lineterminator='\n')
+    pairs = iter(pairs)
+    while True:
+        chunk = list(islice(pairs, FORMAT_ROWS))
+        if not chunk:
+            return
+        text = writer.format_rows([row for _, row in chunk])
+        lines = text.encode('utf-8').split(b'\n')[:-1]
+        if len(lines) != len(chunk):
+            # A field holds a newline; format row by row
+            lines = [writer.format_rows([row]).encode('utf-8')[:-1] for _, row in chunk]
+        for (t, _), line in zip(chunk, lines):
+            yield t, line + b'\n'
+
+
+class TCPSender:
+    """Newline-framed events over one TCP connection"""
+
+    async def open(self, host, port):
+        _, self._writer = await asyncio.open_connection(host, port)
+
+    async def send(self, lines):
+        self._writer.write(b''.join(lines))
+        await self._writer.drain()
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+class UDPSender:
+    """One datagram per event"""
+
+    async def open(self, host, port):
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+
+    async def send(self, lines):
+        sendto = self._transport.sendto
+        for line in lines:
+            sendto(line)
+        # Let the sink (and anything else on the loop) run between sends
+        await asyncio.sleep(0)
+
+    async def close(self):
+        self._transport.close()
+
+
+SENDERS = {'tcp': TCPSender, 'udp': UDPSender}
+
+
+class FeedStats:
+    """Sent counts, send latencies and backlog of an emitter run"""
+
+    def __init__(self):
+        self.events = 0
+        self.bytes = 0
+        self.latency = LatencyHistogram()
+        self.sends = 0
+        self.backlog_sum = 0
+        self.backlog_max = 0
+        self.lag_max = 0.0
+        self.elapsed = 0.0
+
+    def record(self, batch, due, done):
+        """Account for a send of batch ((send time, line) pairs) that started with due events due and finished at done"""
+        self.events += len(batch)
+        self.bytes += sum(len(line) for _, line in batch)
+        for t, _ in batch:
+            self.latency.record(done - t)
+        self.sends += 1
+        self.backlog_sum += due
+        self.backlog_max = max(self.backlog_max, due)
+        self.lag_max = max(self.lag_max, done - batch[0][0])
+
+    def summary(self):
+        """Dict of totals, achieved rate, backlog and latency percentiles"""
+        elapsed = self.elapsed or 1e-9
+        return {
+            'events': self.events,
+            'bytes': self.bytes,
+            'seconds': round(self.elapsed, 3),
+            'events_per_sec': round(self.events / elapsed, 1),
+            'mb_per_sec': round(self.bytes / elapsed / 1e6, 3),
+            'backlog_mean': round(self.backlog_sum / self.sends, 1) if self.sends else 0,
+            'backlog_max': self.backlog_max,
+            'lag_max_ms': round(self.lag_max * 1000, 3),
+            'latency': self.latency.summary(),
+        }
+
+
+async def emit(pairs, sender, duration=None, stats=None, report_every=None):
+    """Send (send time, line) pairs through an open sender on schedule, stopping at duration seconds; return the FeedStats"""
+    loop = asyncio.get_running_loop()
+    stats = stats or FeedStats()
+    pairs = iter(pairs)
+    pending = next(pairs, None)
+    start = loop.time()
+    next_report = report_every
+    reported = 0
+    while pending is not None and (duration is None or pending[0] < duration):
+        now = loop.time() - start
+        if report_every and now >= next_report:
+            print(f"{now:7.1f}s  sent {stats.events}  {(stats.events - reported) / report_every:.0f}/s  "
+                  f"backlog max {stats.backlog_max}  p99 {stats.latency.percentile(99) * 1000:.2f} ms",
+                  file=sys.stderr)
+            reported = stats.events
+            next_report += report_every
+        if pending[0] > now:
+            await asyncio.sleep(min(pending[0] - now, TICK))
+            continue
+        batch = []
+        while pending is not None and pending[0] <= now and len(batch) < MAX_BATCH:
+            batch.append(pending)
+            pending = next(pairs, None)
+        due = len(batch) + (pending is not None and pending[0] <= now)
+        await sender.send([line for _, line in batch])
+        stats.record(batch, due, loop.time() - start)
+    if pending is not None:
+        # Stopped on duration: the run lasts to the deadline, even when the schedule's tail is sparse
+        await asyncio.sleep(max(0.0, duration - (loop.time() - start)))
+    stats.elapsed = loop.time() - start
+    return stats
+
+
+class FeedSink:
+    """Counts newline-framed events received over TCP or UDP"""
+
+    def __init__(self, columns=COLUMNS):
+        self.separators = columns - 1
+        self.events = 0
+        self.bytes = 0
+        self.malformed = 0
+        self.connections = 0
+        self._tails = {}
+
+    def feed(self, data, key=None):
+        """Count the complete lines of data, keeping a trailing partial line per key (connection)"""
+        self.bytes += len(data)
+        lines = (self._tails.pop(key, b'') + data).split(b'\n')
+        tail = lines.pop()
+        if tail:
+            self._tails[key] = tail
+        self.events += len(lines)
+        # Quoted fields may hold commas, so only too few separators is wrong
+        self.malformed += sum(1 for line in lines if line.count(b',') < self.separators)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        key = id(writer)
+        while True:
+            data = await reader.read(1 << 16)
+            if not data:
+                break
+            self.feed(data, key)
+        # An unterminated last line still counts
+        tail = self._tails.pop(key, None)
+        if tail:
+            self.events += 1
+            self.malformed += tail.count(b',') < self.separators
+        writer.close()
+
+    async def start(self, protocol='tcp', host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start listening; return (closeable server or transport, bound port)"""
+        if protocol == 'tcp':
+            server = await asyncio.start_server(self._handle, host, port)
+            return server, server.sockets[0].getsockname()[1]
+        sink = self
+
+        class _Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                sink.feed(data, addr)
+
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(_Protocol, local_addr=(host, port))
+        return transport, transport.get_extra_info('sockname')[1]
+
+    def summary(self):
+        """Dict of received counts"""
+        return {'events': self.events, 'bytes': self.bytes, 'malformed': self.malformed,
+                'connections': self.connections}
+
+
+async def run_emitter(args):
+    """Emit per the command-line args, optionally against an in-process sink; return the summary dict"""
+    rows = SOURCES[args.source](args.seed)
+    if args.events is not None:
+        rows = islice(rows, args.events)
+    if args.replay:
+        pairs = replay_schedule(rows, args.replay)
+    else:
+        pairs = rate_schedule(rows, args.rate, args.burst_factor, args.burst_every, args.burst_length)
+
+    sink = server = None
+    port = args.port
+    if args.with_sink:
+        sink = FeedSink()
+        server, port = await sink.start(args.protocol, args.host, 0)
+    sender = SENDERS[args.protocol]()
+    await sender.open(args.host, port)
+    stats = await emit(encode_schedule(pairs), sender, args.duration, report_every=args.report_every)
+    await sender.close()
+
+    summary = {'protocol': args.protocol, 'source': args.source, 'sent': stats.summary()}
+    if sink is not None:
+        # Give the sink a moment to read what is still in flight
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 2.0
+        while sink.events < stats.events and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        server.close()
+        summary['received'] = sink.summary()
+        summary['received']['lost'] = stats.events - sink.events
+    return summary
+
+
+async def run_sink(args):
+    """Run a sink until interrupted or --duration elapses, reporting counts every --report-every seconds"""
+    sink = FeedSink()
+    server, port = await sink.start(args.protocol, args.host, args.port)
+    print(f"Listening on {args.protocol}://{args.host}:{port}", file=sys.stderr)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    seen = 0
+    try:
+        while args.duration is None or loop.time() - start < args.duration:
+            await asyncio.sleep(args.report_every)
+            print(f"{loop.time() - start:7.1f}s  received {sink.events}  "
+                  f"{(sink.events - seen) / args.report_every:.0f}/s  malformed {sink.malformed}", file=sys.stderr)
+            seen = sink.events
+    finally:
+        server.close()
+    return sink.summary()
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Stream generated rows to a TCP/UDP listener at a controlled rate")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    emit_parser = commands.add_parser('emit', help="send rows on a rate or replay schedule")
+    emit_parser.add_argument('--source', choices=sorted(SOURCES), default='merged', help="row source (default: merged)")
+    emit_parser.add_argument('--seed', type=int, default=0, help="seed for the row source")
+    emit_parser.add_argument('--rate', type=float, default=1000.0, help="steady events per second (default: 1000)")
+    emit_parser.add_argument('--burst-factor', type=float, default=1.0, help="rate multiplier during bursts")
+    emit_parser.add_argument('--burst-every', type=float, help="seconds between burst starts")
+    emit_parser.add_argument('--burst-length', type=float, default=0.0, help="seconds each burst lasts")
+    emit_parser.add_argument('--replay', type=float, metavar='SPEEDUP',
+                             help="pace by the rows' timestamps, SPEEDUP times faster than real time (ignores --rate)")
+    emit_parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    emit_parser.add_argument('--events', type=int, help="stop after this many events")
+    emit_parser.add_argument('--with-sink', action='store_true', help="send to an in-process sink on a free port")
+
+    sink_parser = commands.add_parser('sink', help="count events received from an emitter")
+    sink_parser.add_argument('--duration', type=float, help="stop after this many seconds")
+
+    for sub in (emit_parser, sink_parser):
+        sub.add_argument('--protocol', choices=sorted(SENDERS), default='tcp', help="transport (default: tcp)")
+        sub.add_argument('--host', default=DEFAULT_HOST, help=f"listener address (default: {DEFAULT_HOST})")
+        sub.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"listener port (default: {DEFAULT_PORT})")
+        sub.add_argument('--report-every', type=float, default=1.0, help="seconds between progress lines on stderr")
+
+    args = parser.parse_args()
+    if args.command == 'emit':
+        if args.duration is None and args.events is None:
+            parser.error("emit needs --duration or --events")
+        if args.burst_factor <= 0 or (args.rate <= 0 and not args.replay):
+            parser.error("--rate and --burst-factor must be positive")
+    return args
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    runner = run_emitter if args.command == 'emit' else run_sink
+    try:
+        summary = asyncio.run(runner(args))
+    except KeyboardInterrupt:
+        return
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Stream generated logs as a psql script of COPY ... FROM STDIN blocks for bulk DB seeding.
+
+The script fills the Prisma tables of backend/prisma/schema.prisma the way
+processLogFile() in backend/src/routes/logs.ts does, without going through
+the upload:
+- an optional `users` row to own the file (or --user-id for an existing user)
+- a `log_files` row, inserted as 'processing'
+- one `log_entries` row per log line, with the field mapping of
+  LogParser.parseLogLine(). Rows the parser would drop (fewer than 20
+  fields, a bad timestamp, no clientIP or url) are skipped. riskScore and
+  the sizes follow parseNumber(). Every entry gets a cuid-style id.
+- a final UPDATE marking the file 'completed' with its entry count and size
+
+Rows are formatted and written in chunks, so memory stays flat and a 50M-row
+seed runs as fast as the rows can be generated and written. Timestamps are
+stored as the backend stores them on a UTC server: the log's wall-clock time
+as a timestamp(3). --defer-indexes drops the log_entries indexes during the
+COPY and rebuilds them afterwards, which is much faster for large seeds:
+
+    python pg_copy.py seed.sql --rows 1000000
+    python pg_copy.py seed.sql.gz --source merged --rows 50000000 --defer-indexes
+    gunzip -c seed.sql.gz | psql "$DATABASE_URL" -v ON_ERROR_STOP=1
+"""
+
+import argparse
+import random
+import re
+import string
+import time
+from datetime import datetime
+from itertools import count, islice, product
+from operator import itemgetter
+
+from compressed_output import COMPRESSORS, iter_rows, open_output
+from fast_csv import needs_quoting
+from live_feed import SOURCES
+from validate_corpus import CLIENT_IP_COLUMN, MIN_FIELDS, NUMBER_SENTINELS, URL_COLUMN, parse_csv_line
+
+# (LogEntry column, CSV field) string columns as parseLogLine() maps them; cloudName is never set
+TEXT_COLUMNS = (
+    ('login', 1), ('department', 20), ('company', 1),
+    ('clientIP', 21), ('clientInternalIP', 21), ('clientPublicIP', 21), ('serverIP', 22), ('location', 1),
+    ('url', 3), ('host', 3), ('requestMethod', 23), ('responseCode', 24), ('userAgent', 25), ('referer', 25),
+    ('contentType', 32),
+    ('action', 4), ('reason', 11), ('ruleType', 27), ('ruleLabel', 28),
+    ('threatName', 5), ('threatSeverity', 4), ('malwareCategory', 6), ('malwareClass', 6),
+    ('urlCategory', 13), ('urlSuperCategory', 12), ('urlClass', 11),
+    ('appName', 5), ('appClass', 6), ('appRiskScore', 7),
+    ('fileName', 32), ('fileType', 32), ('fileClass', 32),
+    ('sslDecrypted', 32), ('clientTLSVersion', 32), ('serverTLSVersion', 32),
+    ('sourceIPCountry', 32), ('destinationIPCountry', 32),
+    ('deviceHostname', 32), ('deviceType', 32), ('deviceOSType', 32),
+    ('dlpDictionary', 32), ('dlpEngine', 32), ('dlpRuleName', 32),
+)
+
+# (LogEntry column, CSV field) integer columns parsed with parseNumber()
+NUMBER_COLUMNS = (('riskScore', 7), ('requestSize', 8), ('responseSize', 9), ('totalSize', 10))
+
+ENTRY_COLUMNS = ('id', 'logFileId', 'timestamp') + tuple(column for column, _ in TEXT_COLUMNS + NUMBER_COLUMNS)
+
+# The @@index list of LogEntry, under Prisma's default index names
+ENTRY_INDEXES = ('timestamp', 'clientIP', 'action', 'threatSeverity', 'logFileId')
+
+# Rows formatted per write
+CHUNK_ROWS = 8192
+
+# log_files.fileSize is an Int (int4)
+MAX_INT = (1 << 31) - 1
+
+NULL = '\\N'
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+_COPY_SPECIAL = re.compile(r'[\\\t\n\r]')
+
+_LEADING_INT = re.compile(r'\s*([+-]?\d+)')
+
+_BASE36 = string.digits + string.ascii_lowercase
+
+# Every three-character base-36 suffix, so consecutive ids cost one concatenation each
+_SUFFIXES = [''.join(chars) for chars in product(_BASE36, repeat=3)]
+
+_text_fields = itemgetter(*(field for _, field in TEXT_COLUMNS))
+_number_fields = itemgetter(*(field for _, field in NUMBER_COLUMNS))
+
+
+def base36(number, width):
+    """number in base 36, zero-padded to width"""
+    digits = []
+    while number:
+        number, digit = divmod(number, 36)
+        digits.append(_BASE36[digit])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+
+def cuid_ids(rng, moment):
+    """Endless unique 25-character cuid-style ids: c + time + fingerprint + counter"""
+    prefix = 'c' + base36(int(moment.timestamp() * 1000), 8)[-8:] + base36(rng.getrandbits(41), 8)
+    for high in count():
+        head = prefix + base36(high, 5)
+        for suffix in _SUFFIXES:
+            yield head + suffix
+
+
+def copy_value(value):
+    """value as a COPY text-format field"""
+    if value is None:
+        return NULL
+    return _COPY_SPECIAL.sub(lambda match: match.group().translate(_COPY_ESCAPES), str(value))
+
+
+def _column_list(columns):
+    return ', '.join(f'"{column}"' for column in columns)
+
+
+def copy_block(table, columns, rows):
+    """A complete COPY ... FROM STDIN block for rows of Python values"""
+    lines = [f'COPY "{table}" ({_column_list(columns)}) FROM STDIN;\n']
+    lines.extend('\t'.join(map(copy_value, row)) + '\n' for row in rows)
+    lines.append('\\.\n')
+    return ''.join(lines)
+
+
+def parse_number(value):
+    """parseNumber(): the leading integer of value, or None"""
+    if value.isdigit():
+        return value
+    if value in NUMBER_SENTINELS:
+        return None
+    match = _LEADING_INT.match(value)
+    return str(int(match.group(1))) if match else None
+
+
+def _date_value(text):
+    """'Jan 15 2024' as '2024-01-15', or None if it is no calendar date"""
+    try:
+        return datetime.strptime(text, "%b %d %Y").strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def backend_fields(row):
+    """The fields parseCSVLine() returns for row once it has been written as CSV"""
+    if not any(map(needs_quoting, row)):
+        return [value.strip() for value in row]
+    line = ','.join('"' + value.replace('"', '""') + '"' if needs_quoting(value) else value for value in row)
+    return parse_csv_line(line)
+
+
+class CopyEmitter:
+    """Formats log rows as log_entries COPY lines, counting what it keeps"""
+
+    def __init__(self, log_file_id, ids):
+        self.log_file_id = log_file_id
+        self.ids = ids
+        self.entries = 0
+        self.skipped = 0
+        self.csv_bytes = 0
+        self._dates = {}
+        self._separators = len(ENTRY_COLUMNS) - 1
+
+    def timestamp(self, text):
+        """A "%a %b %d %H:%M:%S %Y" log timestamp as a timestamp(3) literal, or None if it is invalid"""
+        if len(text) != 24 or text[3] != ' ' or text[19] != ' ' or text[13] != ':' or text[16] != ':':
+            return None
+        key = text[4:11] + text[20:]
+        date = self._dates.get(key)
+        if date is None:
+            date = self._dates[key] = _date_value(key) or ''
+        clock = text[11:19]
+        if not date or not (clock[:2] + clock[3:5] + clock[6:]).isdigit() \
+                or clock[:2] > '23' or clock[3:5] > '59' or clock[6:] > '59':
+            return None
+        return f"{date} {clock}"
+
+    def line(self, row):
+        """COPY line for row, or None if parseLogLine() would drop it"""
+        text = ','.join(row)
+        self.csv_bytes += len(text) + 1
+        # Generated rows rarely need quoting or trimming, and then parseCSVLine() returns them as they are
+        if text.count(',') == len(row) - 1 and '"' not in text and '\n' not in text and '\r' not in text \
+                and '\t' not in text and ' ,' not in text and ', ' not in text \
+                and not text[:1].isspace() and not text[-1:].isspace():
+            fields = row
+        else:
+            fields = backend_fields(row)
+        if len(fields) < MIN_FIELDS or len(fields) <= CLIENT_IP_COLUMN or not fields[CLIENT_IP_COLUMN] \
+                or not fields[URL_COLUMN]:
+            self.skipped += 1
+            return None
+        timestamp = self.timestamp(fields[0])
+        if timestamp is None:
+            self.skipped += 1
+            return None
+        if len(fields) > 32:
+            texts = _text_fields(fields)
+            numbers = [value if value.isdigit() else parse_number(value) for value in _number_fields(fields)]
+        else:
+            # Missing trailing fields are undefined in parseLogLine(), which Prisma stores as NULL
+            texts = [fields[field] if field < len(fields) else None for _, field in TEXT_COLUMNS]
+            numbers = [parse_number(fields[field]) for _, field in NUMBER_COLUMNS]
+        self.entries += 1
+        values = [next(self.ids), self.log_file_id, timestamp, *texts, *numbers]
+        if None in values:
+            line = '\t'.join([NULL if value is None else value for value in values])
+        else:
+            line = '\t'.join(values)
+        if line.count('\t') != self._separators or '\\' in line or '\n' in line or '\r' in line:
+            line = '\t'.join(map(copy_value, values))
+        return line + '\n'
+
+
+def write_seed(rows, output, user_id=None, username=None, original_name='seed.csv', upload_date=None, seed=0,
+               defer_indexes=False, compression=None):
+    """Write the psql seeding script for rows to output; return (log file id, entries, skipped rows)"""
+    rng = random.Random(seed)
+    upload_date = upload_date or datetime.now().replace(microsecond=0)
+    ids = cuid_ids(rng, upload_date)
+    created = upload_date.strftime("%Y-%m-%d %H:%M:%S")
+    log_file_id = next(ids)
+    emitter = CopyEmitter(log_file_id, ids)
+    start = time.perf_counter()
+    with open_output(output, compression) as out:
+        header = ['BEGIN;\n']
+        if user_id is None:
+            user_id = next(ids)
+            username = username or f"seed_{user_id[-8:]}"
+            # '!' is no bcrypt hash, so the seed user cannot log in until its password is set
+            header.append(copy_block('users', ('id', 'username', 'password', 'email', 'createdAt', 'updatedAt'),
+                                     [(user_id, username, '!', f"{username}@seed.invalid", created, created)]))
+        stored_name = f"logFile-{int(upload_date.timestamp() * 1000)}-{rng.randrange(10 ** 9)}.csv"
+        header.append(copy_block('log_files', ('id', 'filename', 'originalName', 'fileSize', 'uploadDate', 'status',
+                                               'totalEntries', 'userId'),
+                                 [(log_file_id, stored_name, original_name, 0, created, 'processing', 0, user_id)]))
+        if defer_indexes:
+            header.extend(f'DROP INDEX IF EXISTS "log_entries_{column}_idx";\n' for column in ENTRY_INDEXES)
+        header.append(f'COPY "log_entries" ({_column_list(ENTRY_COLUMNS)}) FROM STDIN;\n')
+        out.write(''.join(header).encode('utf-8'))
+
+        rows = iter(rows)
+        line = emitter.line
+        while True:
+            batch = list(islice(rows, CHUNK_ROWS))
+            if not batch:
+                break
+            out.write(''.join(filter(None, map(line, batch))).encode('utf-8'))
+
+        footer = ['\\.\n']
+        if defer_indexes:
+            footer.extend(f'CREATE INDEX "log_entries_{column}_idx" ON "log_entries"("{column}");\n'
+                          for column in ENTRY_INDEXES)
+        footer.append(f'UPDATE "log_files" SET "status" = \'completed\', "totalEntries" = {emitter.entries}, '
+                      f'"fileSize" = {min(emitter.csv_bytes, MAX_INT)} WHERE "id" = \'{log_file_id}\';\n')
+        footer.append('COMMIT;\n')
+        out.write(''.join(footer).encode('utf-8'))
+    seconds = time.perf_counter() - start
+    print(f"Wrote {emitter.entries} log entries for log file {log_file_id} (user {user_id}) to {output} "
+          f"in {seconds:.1f}s; skipped {emitter.skipped} rows the parser would drop")
+    return log_file_id, emitter.entries, emitter.skipped
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Emit logs as a psql COPY script that seeds log_files/log_entries")
+    parser.add_argument('output', help="output .sql path (may end in .gz/.bz2/.xz)")
+    parser.add_argument('--source', choices=sorted(SOURCES), default='correct', help="row generator (default: correct)")
+    parser.add_argument('--input', help="seed from an existing CSV corpus instead of a generator")
+    parser.add_argument('--rows', type=int, help="rows to emit (required for generators)")
+    parser.add_argument('--user-id', help="existing users.id to own the file (default: create a seed user)")
+    parser.add_argument('--username', help="username of the created seed user")
+    parser.add_argument('--original-name', help="log_files.originalName (default: the input name or seed_<rows>.csv)")
+    parser.add_argument('--upload-date', type=datetime.fromisoformat, help="log_files.uploadDate, ISO format (default: now)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for the rows and ids")
+    parser.add_argument('--defer-indexes', action='store_true', help="drop the log_entries indexes during the COPY")
+    parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the output (implied by a .gz/.bz2/.xz output)")
+    args = parser.parse_args()
+
+    if args.input:
+        rows = iter_rows(args.input)
+        if args.rows is not None:
+            rows = islice(rows, args.rows)
+        original_name = args.original_name or args.input.rsplit('/', 1)[-1]
+    else:
+        if args.rows is None:
+            parser.error("--rows is required when seeding from a generator")
+        rows = islice(SOURCES[args.source](args.seed), args.rows)
+        original_name = args.original_name or f"seed_{args.rows}.csv"
+    write_seed(rows, args.output, args.user_id, args.username, original_name, args.upload_date, args.seed,
+               args.defer_indexes, args.compress)
+
+
+if __name__ == "__main__":
+    main()
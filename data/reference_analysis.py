@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Single-pass reference of LogAnalysisService.analyzeLogs() for golden outputs.
+
+Computes the summary fields the upload route stores in AnalysisResult. It
+streams a corpus once, in memory bounded by the number of distinct IPs,
+URLs, applications, categories, hours and days. The fields are:
+- totalRequests, blockedRequests, allowedRequests, highSeverityEvents
+- uniqueIPs, uniqueURLs
+- topThreats, topCategories, topSourceIPs
+- hourlyBreakdown, dailyBreakdown
+- suspiciousIPs
+
+Rows are accepted as the upload route and LogParser.parseLogLine() accept
+them (see validate_corpus.py). Orders and ties follow the service too.
+analyzeLogs() first sorts the entries by timestamp (stably) and every
+count, Map and Set is then filled in that order. So each key keeps its
+count and the (timestamp, file position) of its first entry. Partials of
+file chunks therefore merge by adding counts and taking minimum positions,
+and the chunks are analysed across a process pool.
+
+Timestamps are read the way `new Date(text)` reads them in Node's local
+time zone (--timezone, UTC by default). The weekday is ignored, an
+overflowing day rolls into the next month and 24:00:00 is midnight of the
+next day. Other shapes V8 also accepts, beyond "Www Mmm D H:MM:SS YYYY",
+count as rejected rows here.
+
+The golden JSON holds the stored AnalysisResult columns. The breakdowns
+are JSON strings as in the database, and a `reference` section adds the
+top-list counts. `compare` diffs it against a stored row exported as JSON
+(e.g. `SELECT row_to_json(a) FROM analysis_results a WHERE "logFileId" = ...`):
+
+    python reference_analysis.py analyze big.csv.gz --output golden.json
+    python reference_analysis.py analyze --source merged --rows 10000000 --output golden.json
+    python reference_analysis.py compare golden.json stored.json
+"""
+
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from compressed_output import compression_for
+from fast_csv import format_rows
+from validate_corpus import (CHUNK_SIZE, CLIENT_IP_COLUMN, URL_COLUMN, _bounded_map, newline_ranges, parse_csv_line,
+                             stream_blocks)
+
+# Entries kept by getTopApplications(), getTopCategories() and getTopSourceIPs()
+TOP = 10
+
+# Generated rows formatted per block handed to the pool
+BLOCK_ROWS = 100000
+
+# AnalysisResult columns written by the upload route, in schema order
+RESULT_FIELDS = ('totalRequests', 'blockedRequests', 'allowedRequests', 'uniqueIPs', 'uniqueURLs', 'topThreats',
+                 'topCategories', 'topSourceIPs', 'hourlyBreakdown', 'dailyBreakdown', 'suspiciousIPs',
+                 'highSeverityEvents')
+
+# Stored as JSON.stringify() text rather than as arrays
+JSON_FIELDS = ('hourlyBreakdown', 'dailyBreakdown')
+
+# Columns parseLogLine() maps to the fields the summaries read
+TIMESTAMP_COLUMN = 0
+ACTION_COLUMN = 4       # action and threatSeverity
+APP_COLUMN = 5          # appName and threatName
+APP_CLASS_COLUMN = 6
+URL_CATEGORY_COLUMN = 13
+
+# Distinct minutes remembered per block before the clock cache is reset
+MINUTE_CACHE = 1 << 16
+
+# A row's order key is epoch * _ORDER + its position in the stream (block offset + line index, unique
+# because every line takes at least one byte)
+_ORDER = 1 << 44
+
+_EPOCH = datetime(1970, 1, 1)
+
+_MONTHS = {name: number for number, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+_TIMESTAMP = re.compile(r'^[A-Za-z]+ ([A-Z][a-z]{2}) (\d{1,2}) (\d{1,2}):(\d\d):(\d\d) (\d{4})$')
+
+_SKIPPED_NAMES = frozenset(['None', 'N/A'])
+
+
+class _Clock:
+    """(epoch seconds, hourly key, daily key) of a timestamp as new Date() reads it, or None"""
+
+    def __init__(self, zone='UTC'):
+        self.zone = None if zone == 'UTC' else _zoneinfo(zone)
+        self._minutes = {}
+
+    def __call__(self, text):
+        match = _TIMESTAMP.match(text)
+        if match is None:
+            return None
+        month, day, hour, minute, second, year = match.groups()
+        key = (year, month, day, hour, minute)
+        parts = self._minutes.get(key)
+        if parts is None:
+            if len(self._minutes) >= MINUTE_CACHE:
+                self._minutes.clear()
+            parts = self._minutes[key] = self._minute(year, month, int(day), int(hour), int(minute))
+        second = int(second)
+        if not parts or second > 59 or (parts[3] and second):
+            return None
+        return parts[0] + second, parts[1], parts[2]
+
+    def _minute(self, year, month, day, hour, minute):
+        """(epoch of the minute, hourly key, daily key, is 24:00) or () if Date() would not parse it"""
+        if month not in _MONTHS or not 1 <= day <= 31 or minute > 59 or hour > 24 or (hour == 24 and minute):
+            return ()
+        try:
+            local = datetime(int(year), _MONTHS[month], 1) + timedelta(days=day - 1, hours=hour, minutes=minute)
+        except (ValueError, OverflowError):
+            return ()
+        if self.zone is None:
+            return int((local - _EPOCH).total_seconds()), f"{local.hour:02d}:00", local.date().isoformat(), hour == 24
+        # Local times skipped by a DST change move forward, as in Date; the hour is read back after that
+        utc = local.replace(tzinfo=self.zone).astimezone(timezone.utc)
+        return (int(utc.timestamp()), f"{utc.astimezone(self.zone).hour:02d}:00", utc.date().isoformat(),
+                hour == 24)
+
+
+def _zoneinfo(name):
+    """ZoneInfo for an IANA zone name"""
+    from zoneinfo import ZoneInfo
+    return ZoneInfo(name)
+
+
+def _count(counts, key, order):
+    """Add one to counts[key] = [count, first order key]"""
+    entry = counts.get(key)
+    if entry is None:
+        counts[key] = [1, order]
+    else:
+        entry[0] += 1
+        if order < entry[1]:
+            entry[1] = order
+
+
+class Summary:
+    """Mergeable partial aggregates of analyzeLogs() over some of a corpus's rows"""
+
+    def __init__(self):
+        self.lines = 0
+        self.rejected = 0
+        self.total = 0
+        self.blocked = 0
+        self.allowed = 0
+        self.severe = 0
+        self.urls = set()
+        # key -> [count, first order key]
+        self.apps = {}
+        self.categories = {}
+        # (hourly key, daily key) -> [count, first order key]
+        self.times = {}
+        # client IP -> [count, first order key, first blocked order key, first high/critical order key]
+        self.ips = {}
+
+    def add_block(self, text, offset=0, clock=None):
+        """Analyse the lines of newline-aligned text starting at byte offset of the stream"""
+        clock = clock or _Clock()
+        urls = self.urls
+        apps, categories, times, ips = self.apps, self.categories, self.times, self.ips
+        lines = text.split('\n')
+        if lines and not lines[-1]:
+            lines.pop()
+        self.lines += len(lines)
+        for position, line in enumerate(lines, offset):
+            if '"' in line:
+                fields = parse_csv_line(line)
+            else:
+                fields = line.split(',')
+            # Fewer than MIN_FIELDS fields, or no clientIP; blank lines never reach parseLogLine()
+            if len(fields) <= CLIENT_IP_COLUMN:
+                if line.strip():
+                    self.rejected += 1
+                continue
+            ip = fields[CLIENT_IP_COLUMN].strip()
+            url = fields[URL_COLUMN].strip()
+            parsed = clock(fields[TIMESTAMP_COLUMN].strip())
+            if parsed is None or not ip or not url:
+                self.rejected += 1
+                continue
+            epoch, hour, day = parsed
+            order = epoch * _ORDER + position
+            self.total += 1
+            action = fields[ACTION_COLUMN].strip().lower()
+            entry = ips.get(ip)
+            if entry is None:
+                entry = ips[ip] = [0, order, None, None]
+            entry[0] += 1
+            if order < entry[1]:
+                entry[1] = order
+            if 'block' in action:
+                self.blocked += 1
+                if entry[2] is None or order < entry[2]:
+                    entry[2] = order
+            if 'allow' in action:
+                self.allowed += 1
+            if 'high' in action or 'critical' in action:
+                self.severe += 1
+                if entry[3] is None or order < entry[3]:
+                    entry[3] = order
+            urls.add(url)
+            app = fields[APP_COLUMN].strip()
+            if app and app not in _SKIPPED_NAMES:
+                _count(apps, app, order)
+            category = fields[URL_CATEGORY_COLUMN].strip() or fields[APP_CLASS_COLUMN].strip() or 'Unknown'
+            if category not in _SKIPPED_NAMES:
+                _count(categories, category, order)
+            _count(times, (hour, day), order)
+        return self
+
+    def merge(self, other):
+        """Fold another partial into this one"""
+        for name in ('lines', 'rejected', 'total', 'blocked', 'allowed', 'severe'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.urls |= other.urls
+        for mine, theirs in ((self.apps, other.apps), (self.categories, other.categories), (self.times, other.times)):
+            for key, (count, order) in theirs.items():
+                entry = mine.get(key)
+                if entry is None:
+                    mine[key] = [count, order]
+                else:
+                    entry[0] += count
+                    entry[1] = min(entry[1], order)
+        for ip, (count, order, blocked, severe) in other.ips.items():
+            entry = self.ips.get(ip)
+            if entry is None:
+                self.ips[ip] = [count, order, blocked, severe]
+                continue
+            entry[0] += count
+            entry[1] = min(entry[1], order)
+            entry[2] = blocked if entry[2] is None else entry[2] if blocked is None else min(entry[2], blocked)
+            entry[3] = severe if entry[3] is None else entry[3] if severe is None else min(entry[3], severe)
+        return self
+
+    def breakdown(self, part):
+        """key -> [count, first order key] of the hourly (part 0) or daily (part 1) keys"""
+        counts = {}
+        for key, (count, order) in self.times.items():
+            entry = counts.get(key[part])
+            if entry is None:
+                counts[key[part]] = [count, order]
+            else:
+                entry[0] += count
+                entry[1] = min(entry[1], order)
+        return counts
+
+    def suspicious_ips(self):
+        """identifySuspiciousIPs(): busy IPs, then IPs with a blocked request, then IPs with a high/critical one"""
+        threshold = self.total / len(self.ips) * 3
+        found = {}
+        for ranked in (sorted((entry[1], ip) for ip, entry in self.ips.items() if entry[0] > threshold),
+                       sorted((entry[2], ip) for ip, entry in self.ips.items() if entry[2] is not None),
+                       sorted((entry[3], ip) for ip, entry in self.ips.items() if entry[3] is not None)):
+            for _, ip in ranked:
+                found.setdefault(ip, None)
+        return list(found)
+
+    def result(self):
+        """The AnalysisResult columns, breakdowns as stored (JSON text), plus a reference section"""
+        if not self.total:
+            tops = {'topThreats': [], 'topCategories': [], 'topSourceIPs': []}
+            result = {'totalRequests': 0, 'blockedRequests': 0, 'allowedRequests': 0, 'uniqueIPs': 0,
+                      'uniqueURLs': 0, **{name: [] for name in tops}, 'hourlyBreakdown': '[]',
+                      'dailyBreakdown': '[]', 'suspiciousIPs': [], 'highSeverityEvents': 0}
+        else:
+            tops = {name: top(counts) for name, counts in
+                    (('topThreats', self.apps), ('topCategories', self.categories), ('topSourceIPs', self.ips))}
+            result = {
+                'totalRequests': self.total,
+                'blockedRequests': self.blocked,
+                'allowedRequests': self.allowed,
+                'uniqueIPs': len(self.ips),
+                'uniqueURLs': len(self.urls),
+                **{name: [key for key, _ in ranked] for name, ranked in tops.items()},
+                'hourlyBreakdown': _stringify([{'hour': key, 'count': count}
+                                               for key, count in in_order(self.breakdown(0))]),
+                'dailyBreakdown': _stringify([{'date': key, 'count': count}
+                                              for key, count in in_order(self.breakdown(1))]),
+                'suspiciousIPs': self.suspicious_ips(),
+                'highSeverityEvents': self.severe,
+            }
+        result['reference'] = {
+            'lines': self.lines,
+            'rejectedLines': self.rejected,
+            'counts': {name: [{'name': key, 'count': count} for key, count in ranked] for name, ranked in tops.items()},
+        }
+        return result
+
+
+def top(counts, limit=TOP):
+    """[(key, count)] of the most frequent keys; ties keep first-entry order, as a stable sort does"""
+    return [(key, entry[0]) for key, entry in heapq.nsmallest(limit, counts.items(),
+                                                               key=lambda item: (-item[1][0], item[1][1]))]
+
+
+def in_order(counts):
+    """[(key, count)] in first-entry order, the insertion order of the service's Records"""
+    return [(key, entry[0]) for key, entry in sorted(counts.items(), key=lambda item: item[1][1])]
+
+
+def _stringify(value):
+    """JSON.stringify() text of value"""
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def _analyze_range(task):
+    """Summarise byte range [start, stop) of a plain file (runs in a worker process)"""
+    summary, path, start, stop, zone = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    return summary().add_block(data.decode('utf-8', 'replace'), start, _Clock(zone))
+
+
+def _analyze_chunk(task):
+    """Summarise one newline-aligned block of a decompressed or generated stream (runs in a worker process)"""
+    summary, data, offset, zone = task
+    return summary().add_block(data.decode('utf-8', 'replace'), offset, _Clock(zone))
+
+
+def _row_blocks(rows, block_rows=BLOCK_ROWS):
+    """Yield (CSV bytes, offset) blocks of generated rows, as write_csv() would lay them out"""
+    rows = iter(rows)
+    offset = 0
+    while True:
+        batch = list(islice(rows, block_rows))
+        if not batch:
+            return
+        data = format_rows(batch).encode('utf-8')
+        yield data, offset
+        offset += len(data)
+
+
+def blocks(path=None, rows=None, chunk_size=CHUNK_SIZE, compression=None):
+    """Yield the (newline-aligned bytes, offset) blocks of a corpus at path, or of generated rows, in order"""
+    if rows is not None:
+        yield from _row_blocks(rows)
+    elif (compression or compression_for(path)) is None:
+        with open(path, 'rb') as f:
+            for start, stop in newline_ranges(path, chunk_size):
+                yield f.read(stop - start), start
+    else:
+        yield from stream_blocks(path, compression or compression_for(path), chunk_size)
+
+
+def analyze(path=None, rows=None, workers=None, chunk_size=CHUNK_SIZE, zone='UTC', compression=None,
+            summary=Summary):
+    """
+    Merged summary of a (possibly compressed) corpus at path, or of generated rows, across a process pool.
+
+    summary is the partial aggregate class: Summary for the exact path, or any class with the same
+    add_block() and merge() methods.
+    """
+    workers = workers or os.cpu_count()
+    merged = summary()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if rows is None and (compression or compression_for(path)) is None:
+            tasks = [(summary, path, start, stop, zone) for start, stop in newline_ranges(path, chunk_size)]
+            partials = pool.map(_analyze_range, tasks)
+        else:
+            tasks = ((summary, data, offset, zone) for data, offset in blocks(path, rows, chunk_size, compression))
+            partials = _bounded_map(pool, _analyze_chunk, tasks, workers * 2)
+        for partial in partials:
+            merged.merge(partial)
+    return merged
+
+
+def _stored(value, field):
+    """A stored AnalysisResult value in comparable form"""
+    if field in JSON_FIELDS and isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def compare(golden, stored):
+    """[(field, golden value, stored value)] for every AnalysisResult column that differs"""
+    return [(field, golden.get(field), stored.get(field)) for field in RESULT_FIELDS
+            if _stored(golden.get(field), field) != _stored(stored.get(field), field)]
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Reference LogAnalysisService summaries and golden JSON")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    analyze_parser = commands.add_parser('analyze', help="compute the golden summary of a corpus")
+    analyze_parser.add_argument('path', nargs='?', help="CSV corpus (may be .gz/.bz2/.xz)")
+    analyze_parser.add_argument('--source', help="analyse rows from a live_feed generator source instead")
+    analyze_parser.add_argument('--rows', type=int, help="rows to generate (required with --source)")
+    analyze_parser.add_argument('--seed', type=int, default=0, help="seed for --source")
+    analyze_parser.add_argument('--timezone', default='UTC', help="the backend's TZ, an IANA name (default: UTC)")
+    analyze_parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    analyze_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="bytes per analysed chunk")
+    analyze_parser.add_argument('--output', help="golden JSON path (default: stdout)")
+
+    compare_parser = commands.add_parser('compare', help="diff a golden summary against a stored AnalysisResult")
+    compare_parser.add_argument('golden', help="golden JSON from analyze")
+    compare_parser.add_argument('stored', help="AnalysisResult row exported as JSON")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    if args.command == 'compare':
+        with open(args.golden, encoding='utf-8') as f:
+            golden = json.load(f)
+        with open(args.stored, encoding='utf-8') as f:
+            stored = json.load(f)
+        differences = compare(golden, stored)
+        for field, expected, actual in differences:
+            print(f"{field}:\n  golden: {expected}\n  stored: {actual}")
+        print(f"{len(differences)} of {len(RESULT_FIELDS)} fields differ")
+        sys.exit(1 if differences else 0)
+
+    start = time.perf_counter()
+    if args.source:
+        if args.rows is None:
+            raise SystemExit("--source requires --rows")
+        # Imported lazily: live_feed imports every generator
+        from live_feed import SOURCES
+        summary = analyze(rows=islice(SOURCES[args.source](args.seed), args.rows), workers=args.workers,
+                          zone=args.timezone)
+    elif args.path:
+        summary = analyze(args.path, workers=args.workers, chunk_size=args.chunk_size, zone=args.timezone)
+    else:
+        raise SystemExit("Give a corpus or --source")
+    result = summary.result()
+    seconds = time.perf_counter() - start
+    result['reference'].update(source=args.path or f"{args.source} seed {args.seed}", timezone=args.timezone,
+                               seconds=round(seconds, 3))
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    print(f"{summary.total} entries ({summary.rejected} rejected lines) in {seconds:.1f}s "
+          f"({summary.lines / seconds:,.0f} lines/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Precomputed tables for rendering timestamps and IPv4 addresses in row loops.
+
+strftime() and f-strings of four integers are two of the most expensive
+calls per generated row. This module replaces them with table lookups:
+- HMS holds the 86,400 "HH:MM:SS" strings of a day, indexed by second of day.
+- OCTETS and DOTTED_OCTETS hold the 256 octet strings, without and with a
+  trailing dot.
+- DayCache caches each day's "Mon Jan 15 " prefix and " 2024" suffix, so a
+  timestamp is one dict lookup plus a table index. It also parses timestamps
+  back to epoch seconds the same way.
+
+The generators, columnar and compact storage, the scenario renderers and the
+amplifier all share these tables. The microbenchmark compares them with the
+strftime / f-string code they replace:
+
+    python render_tables.py bench --rows 200000
+"""
+
+import argparse
+import calendar
+import random
+import socket
+import time
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%a %b %d %H:%M:%S %Y"
+
+HMS = [f"{h:02d}:{m:02d}:{s:02d}" for h in range(24) for m in range(60) for s in range(60)]
+
+OCTETS = [str(n) for n in range(256)]
+
+DOTTED_OCTETS = [f"{n}." for n in range(256)]
+
+# datetime.toordinal() of 1970-01-01
+_EPOCH_ORDINAL = 719163
+
+
+class DayCache:
+    """Maps between timestamp day parts ("Mon Jan 15 " + " 2024") and epoch days, both ways"""
+
+    def __init__(self):
+        self._days = {}
+        self._prefixes = {}
+
+    def epoch(self, value):
+        """Epoch seconds of a "%a %b %d %H:%M:%S %Y" timestamp, verified to round-trip"""
+        key = value[:11] + value[19:]
+        day = self._days.get(key)
+        if day is None:
+            try:
+                parsed = datetime.strptime(value, TIMESTAMP_FORMAT)
+            except ValueError:
+                raise ValueError(f"Not a '{TIMESTAMP_FORMAT}' timestamp: {value!r}") from None
+            day = calendar.timegm(parsed.date().timetuple()) // 86400
+            if self.render(day * 86400 + 3600 * parsed.hour + 60 * parsed.minute + parsed.second) != value:
+                raise ValueError(f"Timestamp does not round-trip: {value!r}")
+            self._days[key] = day
+        hms = value[11:19]
+        return day * 86400 + int(hms[0:2]) * 3600 + int(hms[3:5]) * 60 + int(hms[6:8])
+
+    def day_parts(self, day):
+        """(prefix, suffix) of epoch day day"""
+        parts = self._prefixes.get(day)
+        if parts is None:
+            struct = time.gmtime(day * 86400)
+            parts = self._prefixes[day] = (time.strftime("%a %b %d ", struct), time.strftime(" %Y", struct))
+        return parts
+
+    def render(self, epoch):
+        """Timestamp text for epoch seconds"""
+        day, second = divmod(epoch, 86400)
+        parts = self._prefixes.get(day) or self.day_parts(day)
+        return parts[0] + HMS[second] + parts[1]
+
+
+# Shared by the module-level helpers; it grows by one entry per distinct day rendered
+_DAYS = DayCache()
+
+
+def datetime_epoch(moment):
+    """Epoch seconds of a naive datetime, read as wall-clock time (whole seconds)"""
+    return (moment.toordinal() - _EPOCH_ORDINAL) * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def render_epoch(epoch):
+    """Timestamp text for epoch seconds"""
+    return _DAYS.render(epoch)
+
+
+def render_timestamp(moment):
+    """moment.strftime(TIMESTAMP_FORMAT) for a naive datetime, from the day cache and HMS table"""
+    parts = _DAYS.day_parts(moment.toordinal() - _EPOCH_ORDINAL)
+    return parts[0] + HMS[moment.hour * 3600 + moment.minute * 60 + moment.second] + parts[1]
+
+
+def render_timestamps(start, offsets):
+    """Render start (a naive datetime) plus each whole-second offset"""
+    base = datetime_epoch(start)
+    render = _DAYS.render
+    return [render(base + offset) for offset in offsets]
+
+
+def pack_ipv4(value):
+    """Packed address for a canonical dotted quad, or None"""
+    try:
+        packed = socket.inet_aton(value)
+    except OSError:
+        return None
+    # inet_aton also accepts shorthand such as "10.1" or "0x0a.0.0.1"; only exact round-trips are packed
+    if socket.inet_ntoa(packed) != value:
+        return None
+    return int.from_bytes(packed, 'big')
+
+
+def render_ipv4(packed):
+    """Dotted quad for a packed address"""
+    d = DOTTED_OCTETS
+    return f"{d[packed >> 24]}{d[packed >> 16 & 255]}{d[packed >> 8 & 255]}{OCTETS[packed & 255]}"
+
+
+def render_ipv4_column(packed):
+    """Dotted quads for an iterable of packed addresses"""
+    d = DOTTED_OCTETS
+    o = OCTETS
+    return [f"{d[p >> 24]}{d[p >> 16 & 255]}{d[p >> 8 & 255]}{o[p & 255]}" for p in packed]
+
+
+def random_ipv4(rng=random):
+    """Dotted quad of four rng.randint(1, 255) octets, drawn in the same order as the f-string it replaces"""
+    d = DOTTED_OCTETS
+    randint = rng.randint
+    return f"{d[randint(1, 255)]}{d[randint(1, 255)]}{d[randint(1, 255)]}{OCTETS[randint(1, 255)]}"
+
+
+def _time_per_row(function, rows, repeat):
+    """Best seconds per row of function() (which handles rows rows) over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / rows
+
+
+def bench(rows, repeat=3):
+    """[(case, strftime/f-string ns per row, table ns per row)] for the hot-loop renderers"""
+    moments = [datetime(2024, 1, 15, 8) + timedelta(seconds=2 * i) for i in range(rows)]
+    rng = random.Random(0)
+    packed = [rng.getrandbits(32) for _ in range(rows)]
+    cases = [
+        ('timestamp from datetime',
+         lambda: [moment.strftime(TIMESTAMP_FORMAT) for moment in moments],
+         lambda: list(map(render_timestamp, moments))),
+        ('timestamp column from offsets',
+         lambda: [(moments[0] + timedelta(seconds=offset)).strftime(TIMESTAMP_FORMAT) for offset in range(rows)],
+         lambda: render_timestamps(moments[0], range(rows))),
+        ('ipv4 from packed int',
+         lambda: [f"{p >> 24}.{p >> 16 & 255}.{p >> 8 & 255}.{p & 255}" for p in packed],
+         lambda: list(map(render_ipv4, packed))),
+        ('ipv4 column from packed ints',
+         lambda: [f"{p >> 24}.{p >> 16 & 255}.{p >> 8 & 255}.{p & 255}" for p in packed],
+         lambda: render_ipv4_column(packed)),
+        ('ipv4 from four randint draws',
+         lambda: [(lambda rng: f"{rng.randint(1, 255)}.{rng.randint(1, 255)}.{rng.randint(1, 255)}."
+                   f"{rng.randint(1, 255)}")(rng) for rng in [random.Random(0)] for _ in range(rows)],
+         lambda: [random_ipv4(rng) for rng in [random.Random(0)] for _ in range(rows)]),
+    ]
+    results = []
+    for name, before, after in cases:
+        if before() != after():
+            raise AssertionError(f"{name}: table rendering differs from the code it replaces")
+        results.append((name, _time_per_row(before, rows, repeat) * 1e9, _time_per_row(after, rows, repeat) * 1e9))
+    return results
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Precomputed timestamp and IPv4 rendering tables")
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench_parser = commands.add_parser('bench', help="time the tables against strftime and f-strings")
+    bench_parser.add_argument('--rows', type=int, default=200000, help="rows per case (default: 200000)")
+    bench_parser.add_argument('--repeat', type=int, default=3, help="runs per case; the best is kept (default: 3)")
+    args = parser.parse_args()
+
+    print(f"{'case':32} {'before':>10} {'tables':>10} {'speedup':>8}")
+    for name, before, after in bench(args.rows, args.repeat):
+        print(f"{name:32} {before:8.0f}ns {after:8.0f}ns {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
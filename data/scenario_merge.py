@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Timestamp-ordered k-way merge of background traffic and anomaly scenario streams.
+
+Each anomaly block from generate_correct_logs is replayed as its own lazily
+generated, time-sorted stream of bursts, and the columnar background stream
+from batch_synthesis runs underneath. heapq.merge combines them into one
+ordered output without materializing or sorting the corpus, so anomalies can
+be injected at a fixed density into an arbitrarily large background.
+"""
+
+import heapq
+import math
+import random
+from datetime import timedelta
+from itertools import islice, repeat
+
+from anomaly_labels import NORMAL
+from batch_synthesis import INTERVAL, stream_background
+from generate_correct_logs import ANOMALY_BLOCKS, BASE_TIME
+
+MONTHS = {
+    'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06',
+    'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12',
+}
+
+
+def timestamp_key(row):
+    """Sortable key for a "%a %b %d %H:%M:%S %Y" timestamp in field 0, without parsing it"""
+    ts = row[0]
+    return ts[20:24] + MONTHS[ts[4:7]] + ts[8:19]
+
+
+def scenario_stream(block, first_start, period, rng):
+    """Replay one anomaly block as a burst every period seconds, forever"""
+    start = first_start
+    while True:
+        yield from block(start, rng)
+        start += period
+
+
+def burst_period(density, scenarios=ANOMALY_BLOCKS):
+    """Seconds between bursts of each scenario so anomalies make up `density` of all rows"""
+    if not 0 < density < 1:
+        raise ValueError("density must be between 0 and 1")
+    # Every block yields one row per second, so its length is also its duration in seconds
+    burst_rows = [sum(1 for _ in block(BASE_TIME, random.Random())) for _, block, _ in scenarios]
+    anomaly_rate = density / (1 - density) / INTERVAL
+    period = math.ceil(sum(burst_rows) / anomaly_rate)
+    if period < max(burst_rows):
+        raise ValueError(f"density {density} would overlap bursts of the same scenario")
+    return period
+
+
+def _pair_key(pair):
+    """timestamp_key() of a (label, row) pair"""
+    return timestamp_key(pair[1])
+
+
+def merged_logs(rows=None, density=0.01, seed=0, base_time=BASE_TIME, scenarios=ANOMALY_BLOCKS, background=None,
+                labelled=False):
+    """
+    Yield background traffic with every anomaly scenario merged in at `density`, in timestamp order.
+
+    background defaults to stream_background(); any endless stream with rows every INTERVAL seconds
+    from base_time (such as cardinality.stream_skewed_background()) can be passed instead.
+    With labelled, yield (scenario id, row) pairs instead, with background rows labelled NORMAL.
+    """
+    rng = random.Random(seed)
+    period = burst_period(density, scenarios)
+    if background is None:
+        background = stream_background(seed=seed, base_time=base_time)
+    streams = [zip(repeat(NORMAL), background) if labelled else background]
+    for index, (name, block, _) in enumerate(scenarios):
+        # Stagger the scenarios evenly across each period
+        first_start = base_time + timedelta(seconds=period * (index + 1) // (len(scenarios) + 1))
+        stream = scenario_stream(block, first_start, timedelta(seconds=period), rng)
+        streams.append(zip(repeat(name), stream) if labelled else stream)
+    return islice(heapq.merge(*streams, key=_pair_key if labelled else timestamp_key), rows)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Declarative scenario registry for generated log corpora.
+
+Each scenario is declared once as data:
+- the fields it fixes, applied on top of BASE_ROW
+- the slots that vary per row
+- when it starts, the seconds between rows, and how many rows it yields
+  (or how long it lasts)
+
+compile_scenario() resolves a declaration into a full 34-field template plus
+the precomputed values of its varying slots. Generation then copies the
+template and patches a handful of columns per row instead of building a
+34-field literal. New datasets only need new declarations.
+"""
+
+from collections import namedtuple
+
+from render_tables import render_timestamps
+
+# Columns each named field is written to in the sample_zscaler_logs.csv layout
+FIELDS = {
+    'login': (1, 19),
+    'protocol': (2,),
+    'url': (3,),
+    'action': (4,),
+    'app_name': (5,),
+    'app_class': (6,),
+    'risk_score': (7,),
+    'request_size': (8,),
+    'response_size': (9,),
+    'total_size': (10,),
+    'url_class': (11,),
+    'url_super_category': (12,),
+    'url_category': (13,),
+    'department': (20,),
+    'client_ip': (21,),
+    'server_ip': (22,),
+    'method': (23,),
+    'response_code': (24,),
+    'user_agent': (25,),
+    'rule_type': (27,),
+    'rule_label': (28,),
+    'file_name': (32,),
+    'file_type': (33,),
+}
+
+# Values shared by almost every generated row; scenarios override what differs
+BASE_ROW = [
+    "", "", "HTTP", "", "Allowed", "", "", "", "", "", "", "", "", "",
+    "None", "None", "0", "None", "None", "", "", "", "", "GET", "200",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "None", "URLFilter", "", "Other", "None", "NA", "NA", "N/A",
+]
+
+# name: scenario id (the ground-truth label of its rows)
+# start: seconds after the cycle start of the first row; interval: seconds between rows (may be fractional)
+# count: rows per burst, or None to derive it from duration (seconds)
+# fields: {field: value} fixed for every row
+# slots: {field: spec} varying per row i, where spec is a str formatted with i and n = i + 1,
+#        a sequence indexed by i (cycled), or a callable of i
+Scenario = namedtuple('Scenario', 'name start interval count fields slots duration',
+                      defaults=(1, None, None, None, None))
+
+CompiledScenario = namedtuple('CompiledScenario', 'name template columns offsets patches')
+
+
+def _slot_values(spec, count):
+    """Render one slot spec for rows 0..count-1"""
+    if isinstance(spec, str):
+        return [spec.format(i=i, n=i + 1) for i in range(count)]
+    if callable(spec):
+        return [spec(i) for i in range(count)]
+    return [spec[i % len(spec)] for i in range(count)]
+
+
+def scenario_rows(scenario):
+    """Rows one burst of scenario yields"""
+    if scenario.count is not None:
+        return scenario.count
+    if scenario.duration is None:
+        raise ValueError(f"Scenario {scenario.name} needs a count or a duration")
+    return int(scenario.duration // scenario.interval)
+
+
+def compile_scenario(scenario):
+    """Resolve a declaration into a template row, the patched columns and per-row patch values"""
+    template = list(BASE_ROW)
+    for field, value in (scenario.fields or {}).items():
+        for column in FIELDS[field]:
+            template[column] = value
+    count = scenario_rows(scenario)
+    columns = []
+    values = []
+    for field, spec in (scenario.slots or {}).items():
+        rendered = _slot_values(spec, count)
+        for column in FIELDS[field]:
+            columns.append(column)
+            values.append(rendered)
+    # Timestamps have whole-second resolution, so fractional intervals (e.g. a Fraction) are floored per row
+    offsets = [int(scenario.start + i * scenario.interval) for i in range(count)]
+    return CompiledScenario(scenario.name, template, tuple(columns), offsets, list(zip(*values)) or [()] * count)
+
+
+def compile_scenarios(scenarios):
+    """Compile a registry (a list of declarations) in order"""
+    return [compile_scenario(scenario) for scenario in scenarios]
+
+
+def generate_scenario(compiled, base_time):
+    """Yield one burst of a compiled scenario starting from base_time"""
+    template = compiled.template
+    columns = compiled.columns
+    for timestamp, values in zip(render_timestamps(base_time, compiled.offsets), compiled.patches):
+        row = template.copy()
+        row[0] = timestamp
+        for column, value in zip(columns, values):
+            row[column] = value
+        yield row
+
+
+def registry_labels(scenarios):
+    """(row offset, scenario id) runs of one pass over a registry"""
+    runs = []
+    offset = 0
+    for scenario in scenarios:
+        runs.append((offset, scenario.name))
+        offset += scenario_rows(scenario)
+    return runs
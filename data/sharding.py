@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Multi-process sharded corpus generation.
+
+The timeline of a corpus is split into contiguous row ranges (shards). Each shard
+is generated in a process pool with its own random.Random seeded from
+(seed, shard index) and written to its own part file. Because shards cover
+consecutive slices of the timeline, concatenating the parts in shard order
+yields a timestamp-ordered corpus that is byte-identical for a given
+(seed, shard count) no matter how many workers run.
+"""
+
+import hashlib
+import os
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from compressed_output import compress_block, open_output
+from fast_csv import FastCSVWriter, format_rows
+
+
+def shard_seed(seed, index):
+    """Derive a stable per-shard seed from the corpus seed and shard index"""
+    digest = hashlib.sha256(f"{seed}:{index}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def shard_ranges(total_rows, shards):
+    """Split [0, total_rows) into `shards` contiguous (start, stop) row ranges"""
+    return [(total_rows * i // shards, total_rows * (i + 1) // shards) for i in range(shards)]
+
+
+def write_rows(rows, path, unsafe_columns=None, compression=None):
+    """Write rows to path in buffered chunks, returning the row count"""
+    # Shards already run one per process, so each part is compressed on a single thread
+    with open_output(path, compression, workers=1) as out, \
+            FastCSVWriter(out, unsafe_columns=unsafe_columns) as writer:
+        return writer.writerows(rows)
+
+
+def _write_shard(task):
+    """Generate one shard into its part file (runs in a worker process)"""
+    row_source, start, stop, seed, path, unsafe_columns, compression = task
+    return write_rows(row_source(start, stop, random.Random(seed)), path, unsafe_columns, compression)
+
+
+def generate_sharded(row_source, total_rows, output, shards, seed=0, workers=None, header=None,
+                     unsafe_columns=None, compression=None):
+    """
+    Generate total_rows rows across `shards` part files in a process pool and
+    concatenate them in timeline order into output.
+
+    row_source(start, stop, rng) must be a module-level function yielding the
+    rows with global indices [start, stop) using only rng for randomness.
+    """
+    parts = [f"{output}.part{index:04d}" for index in range(shards)]
+    tasks = [
+        (row_source, start, stop, shard_seed(seed, index), parts[index], unsafe_columns, compression)
+        for index, (start, stop) in enumerate(shard_ranges(total_rows, shards))
+    ]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            count = sum(executor.map(_write_shard, tasks))
+
+        with open(output, 'wb') as out:
+            if header:
+                out.write(compress_block(format_rows([header]).encode('utf-8'), compression))
+            for part in parts:
+                with open(part, 'rb') as shard_file:
+                    shutil.copyfileobj(shard_file, out, 1 << 20)
+                os.remove(part)
+    finally:
+        # A failed worker or copy leaves parts behind
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+
+    return count
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Bounded-memory approximate LogAnalysisService summaries for huge corpora.
+
+reference_analysis.py is exact, so it holds every distinct IP, URL and
+category. Here the same single pass keeps fixed-size sketches instead, so
+memory stays flat however many distinct keys the corpus has:
+- HyperLogLog for unique client IPs, URLs and users (logins)
+- Count-Min plus Space-Saving for the heaviest client IPs, URLs,
+  categories and applications
+- exact hourly and daily request counts (one counter per hour or day),
+  each hour also carrying a small HyperLogLog of its unique client IPs
+
+Each file chunk is first counted exactly (memory bounded by the chunk
+size, --chunk-size), then folded into the sketches. All sketches merge,
+so chunks run across a process pool and the results of separate shards
+(`--save-sketch`) combine with `merge`. The totals and the blocked,
+allowed and high-severity counts stay exact.
+
+Every estimate comes with bounds:
+- distinct counts: the estimate +/- two standard errors
+  (1.04 / sqrt(registers)), about 95% of the time
+- heavy hitters: a [low, high] range. The Space-Saving error bounds low.
+  high is the smaller of the Space-Saving count and the Count-Min
+  estimate, which exceeds the true count by at most epsilon * N with
+  probability 1 - delta.
+
+`bench` runs the exact and sketch paths over the same corpus. It reports
+their speed, retained memory and the sketch errors:
+
+    python sketch_analysis.py analyze huge.csv.gz --output approx.json
+    python sketch_analysis.py analyze shard3.csv --save-sketch shard3.sketch
+    python sketch_analysis.py merge shard*.sketch --output approx.json
+    python sketch_analysis.py bench skewed.csv
+"""
+
+import argparse
+import heapq
+import json
+import math
+import pickle
+import sys
+import time
+from array import array
+from hashlib import blake2b
+from itertools import islice
+from operator import add
+
+from compact_records import traced_bytes
+from reference_analysis import (ACTION_COLUMN, APP_CLASS_COLUMN, APP_COLUMN, TIMESTAMP_COLUMN, TOP,
+                                URL_CATEGORY_COLUMN, _ORDER, _SKIPPED_NAMES, Summary, _Clock, analyze, blocks,
+                                in_order, top)
+from validate_corpus import CHUNK_SIZE, CLIENT_IP_COLUMN, URL_COLUMN, parse_csv_line
+
+LOGIN_COLUMN = 1
+
+# HyperLogLog registers are 2**precision bytes; standard error 1.04 / sqrt(2**precision)
+PRECISION = 14
+
+# Precision of the per-hour unique client IP sketches
+HOURLY_PRECISION = 10
+
+# Count-Min: estimates exceed the true count by at most EPSILON * N with probability 1 - DELTA
+EPSILON = 0.0005
+DELTA = 0.01
+
+# Space-Saving counters per heavy-hitter table
+COUNTERS = 1000
+
+# Heavy-hitter tables: report key -> (JSON name of the key, what it counts)
+HEAVY_HITTERS = {
+    'topSourceIPs': ('ip', "client IP (field 21)"),
+    'topURLs': ('url', "url (field 3)"),
+    'topCategories': ('name', "urlCategory, else appClass (fields 13, 6)"),
+    'topThreats': ('name', "appName (field 5)"),
+}
+
+# Distinct-count estimates: report key -> what they count
+DISTINCT = {
+    'uniqueIPs': "client IP (field 21)",
+    'uniqueURLs': "url (field 3)",
+    'uniqueUsers': "login (field 1)",
+}
+
+
+def _sigma(x):
+    """sigma(x) = x + sum(x**(2**k) * 2**(k-1) for k >= 1) of the improved HyperLogLog estimator"""
+    if x == 1:
+        return math.inf
+    y = 1
+    z = x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x):
+    """tau(x) = (1 - x - sum((1 - x**(2**-k))**2 * 2**-k for k >= 1)) / 3 of the improved HyperLogLog estimator"""
+    if x == 0 or x == 1:
+        return 0.0
+    y = 1.0
+    z = 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+def key_hash(key):
+    """Stable 64-bit hash of a string; built-in hash() is salted per process, so it would not merge"""
+    return int.from_bytes(blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**precision one-byte registers"""
+
+    def __init__(self, precision=PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add_hashes(self, hashes):
+        """Record the 64-bit hashes of some keys"""
+        registers = self.registers
+        shift = 64 - self.precision
+        mask = (1 << shift) - 1
+        for value in hashes:
+            index = value >> shift
+            # Rank of the first set bit in the remaining bits, counting from 1
+            rank = shift - (value & mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog sketches must share a precision to merge")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    @property
+    def standard_error(self):
+        """Relative standard error of estimate()"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self):
+        """Estimated distinct keys, by Ertl's improved estimator (arXiv:1702.01284)"""
+        # Switching from linear counting to the raw estimate at 2.5 * m overestimates by ~2% near the switch;
+        # this estimator reads the histogram of register values and stays unbiased without correction tables
+        m = len(self.registers)
+        q = 64 - self.precision
+        histogram = [self.registers.count(value) for value in range(q + 2)]
+        z = m * _tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        return m * m / (2 * math.log(2) * z)
+
+    def report(self):
+        """Estimate with a two-standard-error range"""
+        estimate = self.estimate()
+        spread = 2 * self.standard_error * estimate
+        return {'estimate': round(estimate), 'low': max(0, math.floor(estimate - spread)),
+                'high': math.ceil(estimate + spread), 'standardError': round(self.standard_error, 5)}
+
+    def nbytes(self):
+        return len(self.registers)
+
+
+class CountMinSketch:
+    """Point counts that overestimate by at most epsilon * N with probability 1 - delta"""
+
+    def __init__(self, epsilon=EPSILON, delta=DELTA):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.rows = [array('q', bytes(8 * self.width)) for _ in range(self.depth)]
+        self.total = 0
+
+    def _columns(self, value):
+        """One column per row from a 64-bit hash (double hashing of its two halves)"""
+        first = value & 0xffffffff
+        second = value >> 32 | 1
+        width = self.width
+        return [(first + row * second) % width for row in range(self.depth)]
+
+    def add(self, value, count):
+        """Add count to the key with hash value"""
+        for row, column in zip(self.rows, self._columns(value)):
+            row[column] += count
+        self.total += count
+
+    def estimate(self, value):
+        return min(row[column] for row, column in zip(self.rows, self._columns(value)))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-Min sketches must share epsilon and delta to merge")
+        self.rows = [array('q', map(add, mine, theirs)) for mine, theirs in zip(self.rows, other.rows)]
+        self.total += other.total
+        return self
+
+    @property
+    def error(self):
+        """Overestimate bound, epsilon * N"""
+        return self.epsilon * self.total
+
+    def nbytes(self):
+        return sum(row.itemsize * len(row) for row in self.rows)
+
+
+class SpaceSaving:
+    """The heaviest keys in k counters; each count overestimates by at most its error, itself at most N / k"""
+
+    def __init__(self, k=COUNTERS):
+        self.k = k
+        # key -> [count, overestimate bound]
+        self.counters = {}
+
+    def floor(self):
+        """Count any key missing from a full summary could have"""
+        if len(self.counters) < self.k:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def update(self, counts):
+        """Add exact counts {key: count} of a block"""
+        return self._combine({key: [count, 0] for key, count in counts.items()}, 0)
+
+    def merge(self, other):
+        return self._combine(other.counters, other.floor())
+
+    def _combine(self, counters, floor):
+        """Merge another summary (Cafaro et al.): a key missing from one side may have had its floor there"""
+        own_floor = self.floor()
+        merged = {}
+        for key, (count, error) in self.counters.items():
+            theirs = counters.get(key)
+            if theirs is None:
+                merged[key] = [count + floor, error + floor]
+            else:
+                merged[key] = [count + theirs[0], error + theirs[1]]
+        for key, (count, error) in counters.items():
+            if key not in merged:
+                merged[key] = [count + own_floor, error + own_floor]
+        if len(merged) > self.k:
+            merged = dict(heapq.nlargest(self.k, merged.items(), key=lambda item: item[1][0]))
+        self.counters = merged
+        return self
+
+    def heaviest(self, limit):
+        """[(key, count, error)] of the limit largest counters"""
+        return [(key, count, error) for key, (count, error)
+                in heapq.nlargest(limit, self.counters.items(), key=lambda item: item[1][0])]
+
+
+class HeavyHitters:
+    """Space-Saving candidates with Count-Min point estimates bounding their counts"""
+
+    def __init__(self, counters=COUNTERS, epsilon=EPSILON, delta=DELTA):
+        self.candidates = SpaceSaving(counters)
+        self.counts = CountMinSketch(epsilon, delta)
+
+    def update(self, counts, hashes):
+        """Add exact counts {key: count} of a block; hashes maps each key to key_hash(key)"""
+        for key, count in counts.items():
+            self.counts.add(hashes[key], count)
+        self.candidates.update(counts)
+
+    def merge(self, other):
+        self.candidates.merge(other.candidates)
+        self.counts.merge(other.counts)
+        return self
+
+    def report(self, name, limit=TOP):
+        """[{name: key, count, low, high}] of the heaviest keys, by their upper bound"""
+        ranked = []
+        for key, count, error in self.candidates.heaviest(self.candidates.k):
+            high = min(count, self.counts.estimate(key_hash(key)))
+            ranked.append((high, max(0, count - error), key))
+        ranked = heapq.nlargest(limit, ranked, key=lambda item: item[0])
+        return [{name: key, 'count': high, 'low': low, 'high': high} for high, low, key in ranked]
+
+    def nbytes(self):
+        counters = self.candidates.counters
+        return (self.counts.nbytes() + sys.getsizeof(counters)
+                + sum(sys.getsizeof(key) + sys.getsizeof(entry) for key, entry in counters.items()))
+
+
+class SketchSummary:
+    """Mergeable fixed-size sketches of analyzeLogs() over some of a corpus's rows"""
+
+    def __init__(self):
+        self.lines = 0
+        self.rejected = 0
+        self.total = 0
+        self.blocked = 0
+        self.allowed = 0
+        self.severe = 0
+        self.distinct = {name: HyperLogLog() for name in DISTINCT}
+        self.heavy = {name: HeavyHitters() for name in HEAVY_HITTERS}
+        # (hourly key, daily key) -> [count, first order key], as in Summary
+        self.times = {}
+        # hourly key -> HyperLogLog of its client IPs
+        self.hourly_ips = {}
+
+    def add_block(self, text, offset=0, clock=None):
+        """Count the lines of newline-aligned text exactly, then fold the counts into the sketches"""
+        clock = clock or _Clock()
+        ips, urls, categories, apps, users, times = {}, {}, {}, {}, set(), self.times
+        hour_ips = {}
+        lines = text.split('\n')
+        if lines and not lines[-1]:
+            lines.pop()
+        self.lines += len(lines)
+        for position, line in enumerate(lines, offset):
+            fields = parse_csv_line(line) if '"' in line else line.split(',')
+            if len(fields) <= CLIENT_IP_COLUMN:
+                if line.strip():
+                    self.rejected += 1
+                continue
+            ip = fields[CLIENT_IP_COLUMN].strip()
+            url = fields[URL_COLUMN].strip()
+            parsed = clock(fields[TIMESTAMP_COLUMN].strip())
+            if parsed is None or not ip or not url:
+                self.rejected += 1
+                continue
+            epoch, hour, day = parsed
+            self.total += 1
+            action = fields[ACTION_COLUMN].strip().lower()
+            if 'block' in action:
+                self.blocked += 1
+            if 'allow' in action:
+                self.allowed += 1
+            if 'high' in action or 'critical' in action:
+                self.severe += 1
+            ips[ip] = ips.get(ip, 0) + 1
+            urls[url] = urls.get(url, 0) + 1
+            users.add(fields[LOGIN_COLUMN].strip())
+            app = fields[APP_COLUMN].strip()
+            if app and app not in _SKIPPED_NAMES:
+                apps[app] = apps.get(app, 0) + 1
+            category = fields[URL_CATEGORY_COLUMN].strip() or fields[APP_CLASS_COLUMN].strip() or 'Unknown'
+            if category not in _SKIPPED_NAMES:
+                categories[category] = categories.get(category, 0) + 1
+            order = epoch * _ORDER + position
+            entry = times.get((hour, day))
+            if entry is None:
+                times[hour, day] = [1, order]
+            else:
+                entry[0] += 1
+                if order < entry[1]:
+                    entry[1] = order
+            seen = hour_ips.get(hour)
+            if seen is None:
+                seen = hour_ips[hour] = set()
+            seen.add(ip)
+
+        ip_hashes = {ip: key_hash(ip) for ip in ips}
+        url_hashes = {url: key_hash(url) for url in urls}
+        self.distinct['uniqueIPs'].add_hashes(ip_hashes.values())
+        self.distinct['uniqueURLs'].add_hashes(url_hashes.values())
+        self.distinct['uniqueUsers'].add_hashes(map(key_hash, users))
+        self.heavy['topSourceIPs'].update(ips, ip_hashes)
+        self.heavy['topURLs'].update(urls, url_hashes)
+        for name, counts in (('topCategories', categories), ('topThreats', apps)):
+            self.heavy[name].update(counts, {key: key_hash(key) for key in counts})
+        for hour, seen in hour_ips.items():
+            sketch = self.hourly_ips.get(hour)
+            if sketch is None:
+                sketch = self.hourly_ips[hour] = HyperLogLog(HOURLY_PRECISION)
+            sketch.add_hashes(map(ip_hashes.__getitem__, seen))
+        return self
+
+    def merge(self, other):
+        """Fold another partial (from any chunk or shard) into this one"""
+        for name in ('lines', 'rejected', 'total', 'blocked', 'allowed', 'severe'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for name, sketch in other.distinct.items():
+            self.distinct[name].merge(sketch)
+        for name, sketch in other.heavy.items():
+            self.heavy[name].merge(sketch)
+        for key, (count, order) in other.times.items():
+            entry = self.times.get(key)
+            if entry is None:
+                self.times[key] = [count, order]
+            else:
+                entry[0] += count
+                entry[1] = min(entry[1], order)
+        for hour, sketch in other.hourly_ips.items():
+            if hour in self.hourly_ips:
+                self.hourly_ips[hour].merge(sketch)
+            else:
+                self.hourly_ips[hour] = sketch
+        return self
+
+    breakdown = Summary.breakdown
+
+    def nbytes(self):
+        """Approximate bytes held by the sketches"""
+        return (sum(sketch.nbytes() for sketch in self.distinct.values())
+                + sum(sketch.nbytes() for sketch in self.heavy.values())
+                + sum(sketch.nbytes() for sketch in self.hourly_ips.values()))
+
+    def result(self):
+        """The approximate summary with its error bounds"""
+        heavy = next(iter(self.heavy.values()))
+        return {
+            'totalRequests': self.total,
+            'blockedRequests': self.blocked,
+            'allowedRequests': self.allowed,
+            'highSeverityEvents': self.severe,
+            **{name: sketch.report() for name, sketch in self.distinct.items()},
+            **{name: self.heavy[name].report(key) for name, (key, _) in HEAVY_HITTERS.items()},
+            'hourlyBreakdown': [{'hour': hour, 'count': count, 'uniqueIPs': self.hourly_ips[hour].report()['estimate']}
+                                for hour, count in in_order(self.breakdown(0))],
+            'dailyBreakdown': [{'date': day, 'count': count} for day, count in in_order(self.breakdown(1))],
+            'bounds': {
+                'distinct': "estimate +/- 2 standard errors (~95%)",
+                'heavyHitters': f"true count in [low, high]; high exceeds it by at most {heavy.counts.error:.0f} "
+                                f"(epsilon * N) with probability {1 - heavy.counts.delta:g}",
+                'precision': PRECISION,
+                'hourlyPrecision': HOURLY_PRECISION,
+                'epsilon': heavy.counts.epsilon,
+                'delta': heavy.counts.delta,
+                'counters': heavy.candidates.k,
+            },
+            'reference': {'lines': self.lines, 'rejectedLines': self.rejected, 'sketchBytes': self.nbytes(),
+                          'fields': {**DISTINCT, **{name: counted for name, (_, counted) in HEAVY_HITTERS.items()}}},
+        }
+
+
+def _summarize(path, rows, chunk_size, summary):
+    """A summary of every block, built in this process"""
+    merged = summary()
+    clock = _Clock()
+    for data, offset in blocks(path, rows, chunk_size):
+        merged.merge(summary().add_block(data.decode('utf-8', 'replace'), offset, clock))
+    return merged
+
+
+def bench(path=None, rows=None, workers=None, chunk_size=CHUNK_SIZE):
+    """Speed, retained memory and sketch accuracy of both paths over the same corpus (generated rows are held in memory)"""
+    rows = list(rows) if rows is not None else None
+    timings = {}
+    summaries = {}
+    for name, summary in (('exact', Summary), ('sketch', SketchSummary)):
+        start = time.perf_counter()
+        summaries[name] = analyze(path, rows, workers, chunk_size, summary=summary)
+        timings[name] = time.perf_counter() - start
+    # Retained state, measured in a separate in-process run because tracing slows the pass down
+    memory = {name: traced_bytes(lambda summary=summary: _summarize(path, rows, chunk_size, summary))[1]
+              for name, summary in (('exact', Summary), ('sketch', SketchSummary))}
+    exact, sketch = summaries['exact'], summaries['sketch']
+    approximate = sketch.result()
+    accuracy = {}
+    for name, actual in (('uniqueIPs', len(exact.ips)), ('uniqueURLs', len(exact.urls))):
+        estimate = approximate[name]
+        accuracy[name] = {'exact': actual, **estimate,
+                          'relativeError': abs(estimate['estimate'] - actual) / actual if actual else 0.0,
+                          'withinBounds': estimate['low'] <= actual <= estimate['high']}
+    for name, counts, key in (('topSourceIPs', exact.ips, 'ip'), ('topCategories', exact.categories, 'name'),
+                              ('topThreats', exact.apps, 'name')):
+        truth = dict(top(counts))
+        found = {entry[key]: entry for entry in approximate[name]}
+        accuracy[name] = {
+            'recall': len(truth.keys() & found.keys()) / len(truth) if truth else 1.0,
+            'maxRelativeError': max((abs(found[k]['count'] - count) / count for k, count in truth.items() if k in found),
+                                    default=0.0),
+            'withinBounds': all(found[k]['low'] <= count <= found[k]['high'] for k, count in truth.items() if k in found),
+        }
+    return {'rows': exact.total, 'seconds': timings, 'retainedBytes': memory, 'accuracy': accuracy}
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Bounded-memory sketch summaries of huge corpora")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('analyze', "stream a corpus into sketches and report the estimates"),
+                            ('bench', "compare the sketch and exact paths on one corpus")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('path', nargs='?', help="CSV corpus (may be .gz/.bz2/.xz)")
+        command.add_argument('--source', help="analyse rows from a live_feed generator source instead")
+        command.add_argument('--rows', type=int, help="rows to generate (required with --source)")
+        command.add_argument('--seed', type=int, default=0, help="seed for --source")
+        command.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+        command.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="bytes per analysed chunk")
+        command.add_argument('--output', help="JSON report path (default: stdout)")
+        if name == 'analyze':
+            command.add_argument('--timezone', default='UTC', help="the backend's TZ, an IANA name (default: UTC)")
+            command.add_argument('--save-sketch', help="also pickle the merged sketches here, for merge")
+    merge_parser = commands.add_parser('merge', help="combine sketches saved by analyze --save-sketch")
+    merge_parser.add_argument('sketches', nargs='+', help="saved sketch files")
+    merge_parser.add_argument('--output', help="JSON report path (default: stdout)")
+    return parser.parse_args()
+
+
+def _rows(args):
+    """Generated rows for --source, None for a corpus path"""
+    if args.source:
+        if args.rows is None:
+            raise SystemExit("--source requires --rows")
+        # Imported lazily: live_feed imports every generator
+        from live_feed import SOURCES
+        return islice(SOURCES[args.source](args.seed), args.rows)
+    if not args.path:
+        raise SystemExit("Give a corpus or --source")
+    return None
+
+
+def _emit(report, output):
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    start = time.perf_counter()
+    if args.command == 'merge':
+        summary = SketchSummary()
+        for path in args.sketches:
+            with open(path, 'rb') as f:
+                summary.merge(pickle.load(f))
+        _emit(summary.result(), args.output)
+    elif args.command == 'analyze':
+        summary = analyze(args.path, _rows(args), args.workers, args.chunk_size, args.timezone,
+                          summary=SketchSummary)
+        if args.save_sketch:
+            with open(args.save_sketch, 'wb') as f:
+                pickle.dump(summary, f)
+        _emit(summary.result(), args.output)
+        seconds = time.perf_counter() - start
+        print(f"{summary.total} entries in {seconds:.1f}s ({summary.lines / seconds:,.0f} lines/sec), "
+              f"{summary.nbytes() / 1e6:.1f} MB of sketches", file=sys.stderr)
+    else:
+        report = bench(args.path, _rows(args), args.workers, args.chunk_size)
+        _emit(report, args.output)
+        print(f"{report['rows']} rows: exact {report['seconds']['exact']:.1f}s "
+              f"{report['retainedBytes']['exact'] / 1e6:.1f} MB, sketch {report['seconds']['sketch']:.1f}s "
+              f"{report['retainedBytes']['sketch'] / 1e6:.1f} MB", file=sys.stderr)
+        for name, figures in report['accuracy'].items():
+            print(f"  {name}: " + ", ".join(f"{key} {value:.4g}" if isinstance(value, float) else f"{key} {value}"
+                                            for key, value in figures.items()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Pathological-input corpora for stress testing the upload ingest path.
+
+LogParser.parseCSVLine() builds every field with `current += char`, and
+processLogFile() reads the whole upload, splits it on '\\n' and splits it
+again in validateLogFormat(). Each shape below takes correct_format_logs
+rows and stretches one input dimension those steps scale with:
+- long_urls / long_user_agents: one very long field per row
+- quote_heavy: every text field quoted, with embedded commas and "" pairs
+- wide_rows: thousands of extra columns after the 34 real ones
+- huge_line: rows of several megabytes each
+- crlf / mixed_endings: CRLF, bare CR and blank-line terminators
+
+The scale of each shape is set by --length. For long fields it is the field
+length, for quote_heavy the length of each quoted field, for wide_rows the
+column count and for huge_line the line length. Output stops at a row
+boundary before --size. Next to each corpus, <output>.manifest.json
+describes its shape the way the backend will see it: lines after the '\\n'
+split, line lengths, fields per line after parseCSVLine(), line endings,
+quote count. `sweep` writes a grid of corpora and an index.json, ready for
+throughput-vs-shape curves:
+
+    python stress_corpus.py generate quote_heavy stress.csv --size 10M
+    python stress_corpus.py sweep --shapes long_urls,wide_rows --sizes 1M,10M --lengths 1K,16K --dir stress
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import time
+from datetime import datetime
+
+from compressed_output import COMPRESSORS, open_output
+from generate_correct_logs import stream_correct_logs
+from validate_corpus import MIN_FIELDS, parse_csv_line
+
+URL_COLUMN = 3
+USER_AGENT_COLUMN = 25
+
+# Free-text columns quote_heavy quotes: app name/class, category, department, user agent, ...
+TEXT_COLUMNS = (5, 6, 11, 12, 13, 20, 25, 29)
+
+# Bytes of encoded output buffered between writes
+CHUNK_SIZE = 4 << 20
+
+# Random text that padding is sliced from, so long fields cost no per-character sampling
+POOL_SIZE = 1 << 20
+
+LINE_ENDINGS = {
+    'lf': (('\n',), (1,)),
+    'crlf': (('\r\n',), (1,)),
+    # A bare CR does not end a line for the backend, so it joins two rows
+    'mixed': (('\n', '\r\n', '\r', '\n\n'), (50, 30, 10, 10)),
+}
+
+_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+# name -> (function(fields, rng, pool, length), default length, line ending, what the length means)
+SHAPES = {}
+
+
+def shape(name, length=None, line_ending='lf', meaning=None):
+    """Register function(fields, rng, pool, length) -> fields as a stress shape"""
+    def register(function):
+        SHAPES[name] = (function, length, line_ending, meaning)
+        return function
+    return register
+
+
+def _padding(rng, pool, length):
+    """length characters of random text (letters, digits and '/')"""
+    repeats, remainder = divmod(length, len(pool))
+    start = rng.randrange(len(pool) - remainder + 1)
+    return pool * repeats + pool[start:start + remainder]
+
+
+@shape('long_urls', length=8192, meaning='url length')
+def long_urls(fields, rng, pool, length):
+    """Each url grows a path to length characters"""
+    url = fields[URL_COLUMN]
+    fields[URL_COLUMN] = url + _padding(rng, pool, max(0, length - len(url)))
+    return fields
+
+
+@shape('long_user_agents', length=8192, meaning='user agent length')
+def long_user_agents(fields, rng, pool, length):
+    """Each user agent grows a comment to length characters"""
+    agent = fields[USER_AGENT_COLUMN] + ' ('
+    fields[USER_AGENT_COLUMN] = agent + _padding(rng, pool, max(0, length - len(agent) - 1)) + ')'
+    return fields
+
+
+@shape('quote_heavy', length=256, meaning='quoted field length')
+def quote_heavy(fields, rng, pool, length):
+    """Every text field quoted and repeated to length characters, with embedded commas and "" pairs"""
+    for column in TEXT_COLUMNS:
+        value = fields[column] + ', ' + '""' + fields[column] + '"", '
+        repeated = (value * (length // len(value) + 1))[:length]
+        # An odd quote left by the cut would flip parseCSVLine's quote state for the rest of the row
+        if repeated.count('"') % 2:
+            repeated = repeated[:-1]
+        fields[column] = '"' + repeated + '"'
+    return fields
+
+
+@shape('wide_rows', length=1024, meaning='columns per row')
+def wide_rows(fields, rng, pool, length):
+    """Extra short columns after the 34 real ones, up to length columns"""
+    return fields + [f"x{index}" for index in range(len(fields), length)]
+
+
+@shape('huge_line', length=16 << 20, meaning='line length')
+def huge_line(fields, rng, pool, length):
+    """The url grows until the whole row is length characters"""
+    line_length = sum(map(len, fields)) + len(fields) - 1
+    fields[URL_COLUMN] += _padding(rng, pool, max(0, length - line_length))
+    return fields
+
+
+@shape('crlf', line_ending='crlf')
+def crlf(fields, rng, pool, length):
+    """Rows unchanged, terminated by \\r\\n"""
+    return fields
+
+
+@shape('mixed_endings', line_ending='mixed')
+def mixed_endings(fields, rng, pool, length):
+    """Rows unchanged, terminated by a mix of \\n, \\r\\n, bare \\r and blank lines"""
+    return fields
+
+
+def parse_size(text):
+    """Bytes in a size such as 512K, 10M, 1G or 4096"""
+    text = text.strip().upper()
+    if text[-1:] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+class ShapeStats:
+    """Shape of a corpus as the backend sees it, fed the text as it is written"""
+
+    def __init__(self):
+        self.lines = 0
+        self.blank_lines = 0
+        self.rejected_lines = 0
+        self.line_endings = {'lf': 0, 'crlf': 0, 'cr': 0}
+        self.quotes = 0
+        self.min_line = self.max_line = None
+        self.line_chars = 0
+        self.min_fields = self.max_fields = None
+        self.max_field = 0
+        self._carry = ''
+
+    def feed(self, text):
+        """Account for text; a trailing partial line waits for the next call"""
+        lines = (self._carry + text).split('\n')
+        self._carry = lines.pop()
+        for line in lines:
+            if line.endswith('\r'):
+                self.line_endings['crlf'] += 1
+                self.line_endings['cr'] += line.count('\r', 0, -1)
+            else:
+                self.line_endings['lf'] += 1
+                self.line_endings['cr'] += line.count('\r')
+            self._line(line)
+
+    def _line(self, line):
+        if not line.strip():
+            self.blank_lines += 1
+            return
+        self.lines += 1
+        length = len(line)
+        self.line_chars += length
+        self.min_line = length if self.min_line is None else min(self.min_line, length)
+        self.max_line = length if self.max_line is None else max(self.max_line, length)
+        self.quotes += line.count('"')
+        fields = parse_csv_line(line)
+        count = len(fields)
+        self.min_fields = count if self.min_fields is None else min(self.min_fields, count)
+        self.max_fields = count if self.max_fields is None else max(self.max_fields, count)
+        self.max_field = max(self.max_field, max(map(len, fields)))
+        if count < MIN_FIELDS:
+            self.rejected_lines += 1
+
+    def finish(self):
+        """Dict of the backend's view of the corpus"""
+        if self._carry:
+            # The final line has no terminator but is still a line after split('\n')
+            self.line_endings['cr'] += self._carry.count('\r')
+            self._line(self._carry)
+            self._carry = ''
+        return {
+            'lines': self.lines,
+            'blank_lines': self.blank_lines,
+            'rejected_lines': self.rejected_lines,
+            'line_chars': {'min': self.min_line, 'mean': round(self.line_chars / (self.lines or 1), 1),
+                           'max': self.max_line},
+            'fields': {'min': self.min_fields, 'max': self.max_fields},
+            'max_field_chars': self.max_field,
+            'line_endings': self.line_endings,
+            'quotes': self.quotes,
+        }
+
+
+def generate_stress(name, output, size, length=None, line_ending=None, seed=0, compression=None):
+    """Write a stress corpus of shape name up to size bytes (uncompressed) and its manifest; return the manifest"""
+    function, default_length, default_ending, meaning = SHAPES[name]
+    length = default_length if length is None else length
+    line_ending = line_ending or default_ending
+    endings, weights = LINE_ENDINGS[line_ending]
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + '/'
+    pool = ''.join(rng.choices(alphabet, k=POOL_SIZE))
+    stats = ShapeStats()
+    start = time.perf_counter()
+    rows = 0
+    written = 0
+    pending = []
+    pending_size = 0
+    with open_output(output, compression) as out:
+        for fields in stream_correct_logs(rng=random.Random(seed)):
+            ending = endings[0] if len(endings) == 1 else rng.choices(endings, weights)[0]
+            line = ','.join(function(fields, rng, pool, length)) + ending
+            # Always write at least one row, even if it alone exceeds size
+            if rows and written + len(line) > size:
+                break
+            pending.append(line)
+            pending_size += len(line)
+            written += len(line)
+            rows += 1
+            if pending_size >= CHUNK_SIZE:
+                text = ''.join(pending)
+                stats.feed(text)
+                out.write(text.encode('utf-8'))
+                pending = []
+                pending_size = 0
+        text = ''.join(pending)
+        stats.feed(text)
+        out.write(text.encode('utf-8'))
+    manifest = {
+        'shape': name,
+        'description': function.__doc__,
+        'length': length,
+        'length_meaning': meaning,
+        'line_ending': line_ending,
+        'seed': seed,
+        'target_bytes': size,
+        'bytes': written,
+        'rows': rows,
+        'backend': stats.finish(),
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+    with open(output + '.manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote {rows} {name} rows ({written} bytes) to {output}")
+    return manifest
+
+
+def sweep(names, sizes, lengths, directory, seed=0, compression=None):
+    """Write every shape at every size (and every length, where the shape has one); return the index"""
+    os.makedirs(directory, exist_ok=True)
+    suffix = '.csv' + (f".{compression}" if compression else '')
+    corpora = []
+    for name in names:
+        shape_lengths = lengths if lengths and SHAPES[name][1] is not None else [None]
+        for size in sizes:
+            for length in shape_lengths:
+                stem = f"{name}_{size}" + (f"_{length}" if length is not None else '')
+                path = os.path.join(directory, stem + suffix)
+                manifest = generate_stress(name, path, size, length, seed=seed, compression=compression)
+                corpora.append({'path': os.path.basename(path), 'manifest': os.path.basename(path) + '.manifest.json',
+                                'shape': name, 'bytes': manifest['bytes'], 'length': manifest['length']})
+    index = {'generated': datetime.now().isoformat(timespec='seconds'), 'seed': seed, 'corpora': corpora}
+    with open(os.path.join(directory, 'index.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Generate pathological corpora for stress testing the ingest path")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = commands.add_parser('generate', help="write one stress corpus and its manifest")
+    generate_parser.add_argument('shape', choices=list(SHAPES), help="input shape")
+    generate_parser.add_argument('output', help="output CSV path")
+    generate_parser.add_argument('--size', default='10M', help="size cap such as 512K, 10M or 1G (default: 10M)")
+    generate_parser.add_argument('--length', help="shape scale: field, line or row length, or column count")
+    generate_parser.add_argument('--line-ending', choices=sorted(LINE_ENDINGS), help="override the shape's line ending")
+    generate_parser.add_argument('--seed', type=int, default=0, help="random seed")
+    generate_parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the output (implied by a .gz/.bz2/.xz output)")
+
+    sweep_parser = commands.add_parser('sweep', help="write a grid of stress corpora and an index")
+    sweep_parser.add_argument('--shapes', help=f"comma-separated shapes (default: all of {', '.join(SHAPES)})")
+    sweep_parser.add_argument('--sizes', default='1M,10M', help="comma-separated size caps (default: 1M,10M)")
+    sweep_parser.add_argument('--lengths', help="comma-separated shape scales (default: each shape's own)")
+    sweep_parser.add_argument('--dir', default='stress_corpora', help="output directory")
+    sweep_parser.add_argument('--seed', type=int, default=0, help="random seed")
+    sweep_parser.add_argument('--compress', choices=sorted(COMPRESSORS), help="compress the corpora")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    if args.command == 'generate':
+        length = parse_size(args.length) if args.length else None
+        generate_stress(args.shape, args.output, parse_size(args.size), length, args.line_ending, args.seed,
+                        args.compress)
+    else:
+        names = args.shapes.split(',') if args.shapes else list(SHAPES)
+        unknown = [name for name in names if name not in SHAPES]
+        if unknown:
+            raise SystemExit(f"Unknown shapes: {', '.join(unknown)}")
+        sizes = [parse_size(size) for size in args.sizes.split(',')]
+        lengths = [parse_size(length) for length in args.lengths.split(',')] if args.lengths else None
+        index = sweep(names, sizes, lengths, args.dir, args.seed, args.compress)
+        print(f"Wrote {len(index['corpora'])} corpora to {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
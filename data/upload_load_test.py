@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+Concurrent upload load test for POST /api/logs/upload and the processing pipeline.
+
+The harness generates corpora of the requested sizes, logs in through
+/api/auth/login (registering the user first with --register), then runs one
+round per concurrency level. In each round, that many clients share a pool of
+keep-alive HTTP connections and upload the corpora as multipart `logFile`
+forms. After each upload, the client polls GET /api/logs/files/:id until the
+file's status is `completed` or `error`. Each round reports:
+- an upload-latency histogram (request start to the upload response)
+- a time-to-completed histogram (request start to the poll that saw a final status)
+- the round's throughput in uploads/sec and MB/sec, giving a throughput
+  curve across the levels
+
+The HTTP client is a small asyncio HTTP/1.1 implementation, so the harness
+needs nothing outside the standard library. The `stub` command (or `run
+--stub`, in-process on a free port) serves the same endpoints without the
+backend or Postgres. It counts the uploaded rows and marks a file completed
+after rows / --stub-rate seconds:
+
+    python upload_load_test.py run --stub --sizes 1MB,10MB --concurrency 1,4,16 --uploads 32
+    python upload_load_test.py run --url http://localhost:3001 --username loadtest --password secret123 --register
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+from urllib.parse import urlsplit
+
+from generate_correct_logs import stream_correct_logs, write_csv
+from histograms import LatencyHistogram
+
+DEFAULT_URL = 'http://127.0.0.1:3001'
+
+BOUNDARY = 'loadtestboundary7MA4YWxkTrZu0gW'
+
+# Bytes streamed per write of an upload body
+UPLOAD_CHUNK = 1 << 20
+
+FINAL_STATUSES = ('completed', 'error')
+
+_SIZE = re.compile(r'^(\d+(?:\.\d+)?)\s*([KMG]?)B?$', re.IGNORECASE)
+_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def parse_size(text):
+    """Bytes of a size such as 500KB, 10MB or 1048576"""
+    match = _SIZE.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def generate_corpora(sizes, directory, seed=0):
+    """Write one generated corpus per size (bytes) to directory, reusing existing ones; return their paths"""
+    paths = []
+    for size in sizes:
+        path = os.path.join(directory, f"load_{size}.csv")
+        if not os.path.exists(path):
+            write_csv(stream_correct_logs(rng=random.Random(seed)), path, max_bytes=size)
+        paths.append(path)
+    return paths
+
+
+class HTTPError(Exception):
+    """A request answered with an unexpected status"""
+
+
+class HTTPConnection:
+    """One keep-alive HTTP/1.1 connection"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._reader = self._writer = None
+
+    async def request(self, method, path, headers=None, body=b'', body_file=None, body_suffix=b''):
+        """
+        Send a request and return (status, response body bytes).
+
+        The body is body, then the contents of body_file (a path) if given, then body_suffix.
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        length = len(body) + len(body_suffix) + (os.path.getsize(body_file) if body_file else 0)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {length}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer = self._writer
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        if body_file:
+            with open(body_file, 'rb') as f:
+                while True:
+                    chunk = f.read(UPLOAD_CHUNK)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    await writer.drain()
+        writer.write(body_suffix)
+        await writer.drain()
+        return await self._read_response()
+
+    async def _read_response(self):
+        reader = self._reader
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed before the response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if not size:
+                    await reader.readline()
+                    break
+                parts.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b''.join(parts)
+        else:
+            data = await reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, data
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+class ConnectionPool:
+    """At most size HTTPConnections to one server, opened lazily and reused across requests"""
+
+    def __init__(self, host, port, size):
+        self._idle = asyncio.LifoQueue()
+        for _ in range(size):
+            self._idle.put_nowait(HTTPConnection(host, port))
+
+    async def request(self, method, path, headers=None, **kwargs):
+        """Send a request on a free connection; return (status, decoded JSON body)"""
+        connection = await self._idle.get()
+        try:
+            status, data = await connection.request(method, path, headers, **kwargs)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # The server dropped the keep-alive connection; retry once on a fresh one
+            connection.close()
+            status, data = await connection.request(method, path, headers, **kwargs)
+        except BaseException:
+            connection.close()
+            raise
+        finally:
+            self._idle.put_nowait(connection)
+        return status, json.loads(data) if data else None
+
+    async def post_json(self, path, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        return await self.request('POST', path, {'Content-Type': 'application/json', **(headers or {})}, body=body)
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+async def login(pool, username, password, register=False):
+    """Log in through /api/auth (registering first if asked) and return the bearer token"""
+    if register:
+        status, body = await pool.post_json('/api/auth/register', {
+            'username': username, 'email': f"{username}@example.com", 'password': password,
+        })
+        if status not in (201, 409):
+            raise HTTPError(f"Register failed ({status}): {body}")
+    status, body = await pool.post_json('/api/auth/login', {'username': username, 'password': password})
+    if status != 200:
+        raise HTTPError(f"Login failed ({status}): {body}")
+    return body['data']['token']
+
+
+async def upload_and_wait(pool, token, path, poll_interval, timeout):
+    """Upload path, then poll until it is processed; return (upload seconds, completion seconds, final status)"""
+    loop = asyncio.get_running_loop()
+    auth = {'Authorization': f"Bearer {token}"}
+    name = os.path.basename(path)
+    head = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"logFile\"; filename=\"{name}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n").encode('utf-8')
+    tail = f"\r\n--{BOUNDARY}--\r\n".encode('utf-8')
+    start = loop.time()
+    status, body = await pool.request('POST', '/api/logs/upload',
+                                      {**auth, 'Content-Type': f"multipart/form-data; boundary={BOUNDARY}"},
+                                      body=head, body_file=path, body_suffix=tail)
+    uploaded = loop.time() - start
+    if status != 200:
+        raise HTTPError(f"Upload of {name} failed ({status}): {body}")
+    file_id = body['data']['logFile']['id']
+    file_status = body['data']['logFile']['status']
+    while file_status not in FINAL_STATUSES:
+        if loop.time() - start > timeout:
+            return uploaded, None, 'timeout'
+        await asyncio.sleep(poll_interval)
+        status, body = await pool.request('GET', f"/api/logs/files/{file_id}", auth)
+        if status != 200:
+            raise HTTPError(f"Polling {file_id} failed ({status}): {body}")
+        file_status = body['data']['logFile']['status']
+    return uploaded, loop.time() - start, file_status
+
+
+async def run_level(pool, token, corpora, concurrency, uploads, poll_interval, timeout):
+    """Run uploads uploads (cycling through corpora) with concurrency clients; return the round's report"""
+    loop = asyncio.get_running_loop()
+    upload_latency = LatencyHistogram()
+    completion = LatencyHistogram()
+    outcomes = {}
+    queue = asyncio.Queue()
+    for i in range(uploads):
+        queue.put_nowait(corpora[i % len(corpora)])
+    total_bytes = 0
+
+    async def client():
+        nonlocal total_bytes
+        while not queue.empty():
+            path = queue.get_nowait()
+            try:
+                uploaded, completed, status = await upload_and_wait(pool, token, path, poll_interval, timeout)
+            except (HTTPError, OSError, asyncio.IncompleteReadError) as e:
+                print(f"  {e}", file=sys.stderr)
+                outcomes['failed'] = outcomes.get('failed', 0) + 1
+                continue
+            upload_latency.record(uploaded)
+            total_bytes += os.path.getsize(path)
+            if completed is not None:
+                completion.record(completed)
+            outcomes[status] = outcomes.get(status, 0) + 1
+
+    start = loop.time()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = loop.time() - start
+    return {
+        'concurrency': concurrency,
+        'uploads': uploads,
+        'outcomes': outcomes,
+        'seconds': round(elapsed, 3),
+        'uploads_per_sec': round(upload_latency.total / elapsed, 3),
+        'mb_per_sec': round(total_bytes / elapsed / 1e6, 3),
+        'upload_latency': upload_latency.summary(),
+        'time_to_completed': completion.summary(),
+        '_histograms': (upload_latency, completion),
+    }
+
+
+def print_report(report):
+    """Print one round's histograms and throughput"""
+    upload_latency, completion = report['_histograms']
+    print(f"\n== concurrency {report['concurrency']}: {report['uploads']} uploads in {report['seconds']} s, "
+          f"{report['uploads_per_sec']} uploads/s, {report['mb_per_sec']} MB/s, outcomes {report['outcomes']}")
+    print("upload latency:")
+    print(upload_latency.render())
+    print("time to completed:")
+    print(completion.render())
+
+
+class StubServer:
+    """Just enough of the backend's auth and logs routes to exercise the harness"""
+
+    def __init__(self, rows_per_sec=20000.0, max_bytes=100 * 1024 * 1024):
+        self.rows_per_sec = rows_per_sec
+        self.max_bytes = max_bytes
+        self.files = {}
+        self.users = set()
+        self._next_id = 0
+        self._server = None
+        self._handlers = set()
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening; return (server, bound port)"""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server, self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop listening and end the open connections"""
+        self._server.close()
+        # Closing a connection ends its handler's read loop
+        for _, writer in self._handlers:
+            writer.close()
+        await asyncio.gather(*[task for task, _ in self._handlers], return_exceptions=True)
+
+    async def _handle(self, reader, writer):
+        handler = (asyncio.current_task(), writer)
+        self._handlers.add(handler)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if target == '/api/logs/upload' and method == 'POST':
+                    status, payload = await self._upload(reader, headers, length)
+                else:
+                    body = await reader.readexactly(length)
+                    status, payload = self._route(method, urlsplit(target).path, headers, body)
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode('latin-1') + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
+
+    def _authorized(self, headers):
+        return headers.get('authorization', '').startswith('Bearer stub-')
+
+    def _route(self, method, path, headers, body):
+        if method == 'POST' and path == '/api/auth/register':
+            username = json.loads(body)['username']
+            if username in self.users:
+                return 409, {'success': False, 'error': 'Username or email already exists'}
+            self.users.add(username)
+            return 201, {'success': True, 'data': {'token': f"stub-{username}"}}
+        if method == 'POST' and path == '/api/auth/login':
+            return 200, {'success': True, 'data': {'token': f"stub-{json.loads(body)['username']}"}}
+        if method == 'GET' and path.startswith('/api/logs/files/'):
+            if not self._authorized(headers):
+                return 401, {'success': False, 'error': 'Access token required'}
+            logFile = self.files.get(path.rsplit('/', 1)[1])
+            if logFile is None:
+                return 404, {'success': False, 'error': 'Log file not found'}
+            return 200, {'success': True, 'data': {'logFile': self._view(logFile), 'analysis': {}}}
+        return 404, {'success': False, 'error': 'Route not found'}
+
+    def _view(self, logFile):
+        view = dict(logFile)
+        ready_at = view.pop('_ready_at')
+        if asyncio.get_running_loop().time() >= ready_at:
+            view['status'] = 'completed'
+        else:
+            view['totalEntries'] = 0
+        return view
+
+    async def _upload(self, reader, headers, length):
+        """Stream a multipart body, counting the lines of its file part"""
+        if not self._authorized(headers):
+            await reader.readexactly(length)
+            return 401, {'success': False, 'error': 'Access token required'}
+        if length > self.max_bytes:
+            await reader.readexactly(length)
+            return 500, {'success': False, 'error': 'File too large'}
+        remaining = length
+        preamble = b''
+        newlines = 0
+        while remaining:
+            chunk = await reader.read(min(remaining, UPLOAD_CHUNK))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b'', remaining)
+            remaining -= len(chunk)
+            if preamble is not None:
+                # Skip the part headers, which end at the first blank line
+                preamble += chunk
+                end = preamble.find(b'\r\n\r\n')
+                if end < 0:
+                    continue
+                chunk = preamble[end + 4:]
+                preamble = None
+            newlines += chunk.count(b'\n')
+        # The closing delimiter adds two line breaks after the file
+        rows = max(0, newlines - 2)
+        self._next_id += 1
+        file_id = f"stub{self._next_id}"
+        loop = asyncio.get_running_loop()
+        self.files[file_id] = {
+            'id': file_id, 'filename': f"{file_id}.csv", 'originalName': f"{file_id}.csv", 'fileSize': length,
+            'status': 'processing', 'totalEntries': rows, 'userId': 'stub',
+            '_ready_at': loop.time() + rows / self.rows_per_sec,
+        }
+        return 200, {'success': True, 'data': {'logFile': self._view(self.files[file_id]),
+                                               'message': 'File uploaded successfully and processing started'}}
+
+
+async def run(args):
+    """Generate corpora, log in and run every concurrency level; return the reports"""
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    levels = [int(level) for level in args.concurrency.split(',')]
+    directory = args.corpus_dir or tempfile.mkdtemp(prefix='upload_load_')
+    os.makedirs(directory, exist_ok=True)
+    corpora = generate_corpora(sizes, directory, args.seed)
+
+    stub = None
+    if args.stub:
+        stub = StubServer(args.stub_rate)
+        _, port = await stub.start()
+        host = '127.0.0.1'
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    pool = ConnectionPool(host, port, max(levels))
+    reports = []
+    try:
+        token = await login(pool, args.username, args.password, args.register)
+        for level in levels:
+            uploads = args.uploads or 2 * level
+            report = await run_level(pool, token, corpora, level, uploads, args.poll_interval, args.timeout)
+            print_report(report)
+            reports.append(report)
+    finally:
+        pool.close()
+        if stub is not None:
+            await stub.close()
+
+    print("\nthroughput curve:")
+    print("  concurrency  uploads/s     MB/s  p50 upload ms  p50 completed ms")
+    for report in reports:
+        print(f"  {report['concurrency']:>11}  {report['uploads_per_sec']:>9}  {report['mb_per_sec']:>7}  "
+              f"{report['upload_latency']['p50_ms']:>13}  {report['time_to_completed']['p50_ms']:>16}")
+    for report in reports:
+        del report['_histograms']
+    return reports
+
+
+async def serve_stub(args):
+    """Run the stub server until interrupted"""
+    server, port = await StubServer(args.stub_rate).start(args.host, args.port)
+    print(f"Stub backend listening on http://{args.host}:{port}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Load test concurrent log uploads and their processing")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the load test")
+    run_parser.add_argument('--url', default=DEFAULT_URL, help=f"backend base URL (default: {DEFAULT_URL})")
+    run_parser.add_argument('--stub', action='store_true', help="test against an in-process stub backend")
+    run_parser.add_argument('--username', default='loadtest', help="account to log in with")
+    run_parser.add_argument('--password', default='loadtest123', help="password of the account")
+    run_parser.add_argument('--register', action='store_true', help="register the account first (409 is fine)")
+    run_parser.add_argument('--sizes', default='1MB', help="comma-separated corpus sizes, e.g. 1MB,10MB,100MB")
+    run_parser.add_argument('--corpus-dir', help="where corpora are generated and reused (default: a temp dir)")
+    run_parser.add_argument('--seed', type=int, default=0, help="seed for the generated corpora")
+    run_parser.add_argument('--concurrency', default='1,2,4,8', help="comma-separated concurrency levels")
+    run_parser.add_argument('--uploads', type=int, help="uploads per level (default: twice the concurrency)")
+    run_parser.add_argument('--poll-interval', type=float, default=0.5, help="seconds between status polls")
+    run_parser.add_argument('--timeout', type=float, default=600.0, help="seconds to wait for one file to finish")
+    run_parser.add_argument('--json', help="also write the reports to this JSON file")
+
+    stub_parser = commands.add_parser('stub', help="serve the stub backend")
+    stub_parser.add_argument('--host', default='127.0.0.1')
+    stub_parser.add_argument('--port', type=int, default=3001)
+
+    for sub in (run_parser, stub_parser):
+        sub.add_argument('--stub-rate', type=float, default=20000.0,
+                         help="rows per second the stub 'processes' (default: 20000)")
+    return parser.parse_args()
+
+
+def main():
+    """Main function"""
+    args = parse_args()
+    if args.command == 'stub':
+        try:
+            asyncio.run(serve_stub(args))
+        except KeyboardInterrupt:
+            pass
+        return
+    reports = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"Wrote reports to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Parallel streaming validator for corpora bound for POST /api/logs/upload.
+
+The rules mirror backend/src/utils/logParser.ts as the upload pipeline applies it:
+- The file is split on '\\n' and blank lines are skipped, so a quoted
+  newline breaks its row.
+- parseCSVLine() toggles a quote state on every '"' and drops the quote. It
+  splits on commas outside quotes and trims each field. "" escapes are not
+  understood; they simply toggle twice.
+- parseLogLine() drops rows with fewer than 20 fields, an unparseable
+  timestamp, or an empty clientIP (21) or url (3).
+- parseNumber() silently drops a riskScore or size (7-10) that does not
+  start with digits.
+
+On top of that, the validator holds rows to the 34-column
+sample_zscaler_logs.csv layout and to a strict "%a %b %d %H:%M:%S %Y"
+timestamp. An odd number of quotes is also an error: it leaves
+parseCSVLine's quote state open. A leading header row (first field
+`timestamp`) is noted rather than counted.
+
+Plain files are cut into newline-aligned byte ranges that worker processes
+read themselves. Compressed corpora are decompressed once and handed to the
+pool in newline-aligned blocks. The report lists:
+- the error count per kind and per column
+- the line number, byte offset and reasons of the first bad rows
+- the exit status: non-zero if any row is bad
+
+    python validate_corpus.py big_corpus.csv
+    python validate_corpus.py big_corpus.csv.gz --first 20 --json report.json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from compressed_output import OPENERS, compression_for
+
+COLUMNS = 34
+
+# parseLogLine() rejects rows with fewer fields
+MIN_FIELDS = 20
+
+TIMESTAMP_COLUMN = 0
+URL_COLUMN = 3
+CLIENT_IP_COLUMN = 21
+
+# Columns LogParser.parseNumber() reads
+NUMBER_COLUMNS = (7, 8, 9, 10)
+
+# Values parseNumber() deliberately maps to undefined
+NUMBER_SENTINELS = frozenset(['', '-', 'None', 'N/A', 'NA'])
+
+# Column each error kind is charged to (None: the row as a whole)
+ERROR_COLUMNS = {
+    'encoding': None,
+    'quotes': None,
+    'rejected': None,
+    'columns': None,
+    'timestamp': TIMESTAMP_COLUMN,
+    'url': URL_COLUMN,
+    'client_ip': CLIENT_IP_COLUMN,
+}
+
+# Bytes per validated chunk
+CHUNK_SIZE = 32 << 20
+
+# Bad rows reported in full by default
+FIRST_BAD_ROWS = 10
+
+# Distinct valid timestamps remembered per block before the cache is reset
+TIMESTAMP_CACHE = 1 << 16
+
+_TIMESTAMP = re.compile(r'^[A-Z][a-z]{2} [A-Z][a-z]{2} \d{1,2} ([01]\d|2[0-3]):[0-5]\d:([0-5]\d|6[01]) \d{4}$')
+_NUMBER = re.compile(r'^\s*[+-]?\d')
+
+
+def parse_csv_line(line):
+    """Fields of a line exactly as LogParser.parseCSVLine() splits them"""
+    if '"' not in line:
+        return [field.strip() for field in line.split(',')]
+    fields = []
+    current = []
+    # Segments between quotes alternate outside/inside; commas only split outside
+    for index, segment in enumerate(line.split('"')):
+        if index % 2:
+            current.append(segment)
+            continue
+        parts = segment.split(',')
+        current.append(parts[0])
+        for part in parts[1:]:
+            fields.append(''.join(current).strip())
+            current = [part]
+    fields.append(''.join(current).strip())
+    return fields
+
+
+class _TimestampChecker:
+    """Strict timestamp check, caching the calendar validation of each date"""
+
+    def __init__(self):
+        self._dates = {}
+
+    def __call__(self, value):
+        if not _TIMESTAMP.match(value):
+            return False
+        weekday, month, day, _, year = value.split(' ')
+        key = (weekday, month, day, year)
+        valid = self._dates.get(key)
+        if valid is None:
+            try:
+                datetime.strptime(f"{weekday} {month} {day} {year}", "%a %b %d %Y")
+                valid = True
+            except ValueError:
+                valid = False
+            self._dates[key] = valid
+        return valid
+
+
+def row_errors(line, timestamp_ok):
+    """Error kinds of one non-blank line ([] if it is valid), plus the number columns that fail parseNumber()"""
+    if line.count('"') % 2:
+        errors = ['quotes']
+    else:
+        errors = []
+    fields = parse_csv_line(line)
+    if len(fields) < MIN_FIELDS:
+        errors.append('rejected')
+        if not timestamp_ok(fields[0]):
+            errors.append('timestamp')
+        return errors, ()
+    if len(fields) != COLUMNS:
+        errors.append('columns')
+    if not timestamp_ok(fields[TIMESTAMP_COLUMN]):
+        errors.append('timestamp')
+    if not fields[URL_COLUMN]:
+        errors.append('url')
+    if len(fields) <= CLIENT_IP_COLUMN or not fields[CLIENT_IP_COLUMN]:
+        errors.append('client_ip')
+    numbers = tuple(column for column in NUMBER_COLUMNS
+                    if column < len(fields) and fields[column] not in NUMBER_SENTINELS
+                    and not _NUMBER.match(fields[column]))
+    if numbers:
+        errors.append('number')
+    return errors, numbers
+
+
+class _Partial:
+    """Error tallies of one block"""
+
+    def __init__(self, first):
+        self.first = first
+        self.kinds = {}
+        self.columns = {}
+        self.bad = []
+        self.bad_rows = 0
+
+    def add(self, errors, numbers, line, offset, text):
+        self.bad_rows += 1
+        for kind in errors:
+            self.kinds[kind] = self.kinds.get(kind, 0) + 1
+            column = ERROR_COLUMNS.get(kind)
+            if column is not None:
+                self.columns[column] = self.columns.get(column, 0) + 1
+        for column in numbers:
+            self.columns[column] = self.columns.get(column, 0) + 1
+        if len(self.bad) < self.first:
+            self.bad.append({'line': line, 'offset': offset, 'errors': errors, 'text': text[:200]})
+
+    def report(self, lines, rows, header):
+        return {'lines': lines, 'rows': rows, 'bad_rows': self.bad_rows, 'kinds': self.kinds,
+                'columns': self.columns, 'first_bad': self.bad, 'header': header}
+
+
+def _is_header(line):
+    return parse_csv_line(line)[0].lower() == 'timestamp'
+
+
+def validate_block(data, offset=0, first=FIRST_BAD_ROWS, is_start=True):
+    """
+    Validate newline-aligned bytes starting at byte offset; return a partial report.
+
+    Line numbers in the partial are relative to the block; merge() makes them absolute.
+    Rows without quotes and with exactly COLUMNS fields take a fast path that looks only
+    at the checked columns; anything else is parsed field by field. Blocks that are not
+    valid UTF-8 are checked line by line, so the bad bytes are pinned to their rows.
+    """
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return _validate_lines(data, offset, first, is_start)
+    timestamp_ok = _TimestampChecker()
+    good_timestamps = set()
+    partial = _Partial(first)
+    separators = COLUMNS - 1
+    ascii_only = text.isascii()
+    lines = text.split('\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    rows = 0
+    header = False
+    position = 0
+    for number, line in enumerate(lines):
+        start = position
+        position += len(line) + 1
+        if '"' not in line and line.count(',') == separators:
+            fields = line.split(',')
+            timestamp = fields[0]
+            if timestamp not in good_timestamps and timestamp_ok(timestamp.strip()):
+                if len(good_timestamps) >= TIMESTAMP_CACHE:
+                    good_timestamps.clear()
+                good_timestamps.add(timestamp)
+            if (timestamp in good_timestamps and fields[URL_COLUMN].strip() and fields[CLIENT_IP_COLUMN].strip()
+                    and ''.join([fields[column] for column in NUMBER_COLUMNS]).isdigit()):
+                rows += 1
+                continue
+        if not line.strip():
+            continue
+        rows += 1
+        errors, numbers = row_errors(line, timestamp_ok)
+        if not errors:
+            continue
+        if is_start and number == 0 and _is_header(line):
+            header = True
+            rows -= 1
+            continue
+        if len(partial.bad) < first and not ascii_only:
+            start = len(text[:start].encode('utf-8'))
+        partial.add(errors, numbers, number + 1, offset + start, line)
+    return partial.report(len(lines), rows, header)
+
+
+def _validate_lines(data, offset, first, is_start):
+    """validate_block() one line at a time, for blocks that need per-line decoding or date checks"""
+    timestamp_ok = _TimestampChecker()
+    partial = _Partial(first)
+    rows = 0
+    header = False
+    lines = data.split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    for number, raw in enumerate(lines):
+        start = offset
+        offset += len(raw) + 1
+        try:
+            line = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            errors, numbers = ['encoding'], ()
+        else:
+            if not line.strip():
+                continue
+            rows += 1
+            errors, numbers = row_errors(line, timestamp_ok)
+            if not errors:
+                continue
+            if is_start and number == 0 and _is_header(line):
+                header = True
+                rows -= 1
+                continue
+        partial.add(errors, numbers, number + 1, start, raw.decode('utf-8', 'replace'))
+    return partial.report(len(lines), rows, header)
+
+
+def _validate_range(task):
+    """Validate byte range [start, stop) of a plain file (runs in a worker process)"""
+    path, start, stop, first = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    return validate_block(data, start, first, is_start=start == 0)
+
+
+def _validate_chunk(task):
+    """Validate one block of a decompressed stream (runs in a worker process)"""
+    data, offset, first = task
+    return validate_block(data, offset, first, is_start=offset == 0)
+
+
+def newline_ranges(path, chunk_size=CHUNK_SIZE):
+    """Split a plain file into (start, stop) byte ranges that each end just after a newline (or at EOF)"""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            stop = min(f.tell(), size)
+            ranges.append((start, stop))
+            start = stop
+    return ranges
+
+
+def stream_blocks(path, compression, chunk_size=CHUNK_SIZE):
+    """Yield (newline-aligned bytes, offset in the decompressed stream) blocks of a compressed corpus"""
+    offset = 0
+    tail = b''
+    with OPENERS[compression](path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            data = tail + data
+            cut = data.rfind(b'\n') + 1
+            tail = data[cut:]
+            if cut:
+                yield data[:cut], offset
+                offset += cut
+    if tail:
+        yield tail, offset
+
+
+def _bounded_map(pool, function, tasks, window):
+    """pool.map() that keeps at most window tasks in flight, so a long stream is never read ahead in full"""
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(function, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def merge(partials, first=FIRST_BAD_ROWS):
+    """Combine per-chunk partial reports (in file order) into one, numbering lines from 1"""
+    report = {'lines': 0, 'rows': 0, 'bad_rows': 0, 'kinds': {}, 'columns': {}, 'first_bad': [], 'header': False}
+    for partial in partials:
+        for bad in partial['first_bad']:
+            if len(report['first_bad']) < first:
+                report['first_bad'].append({**bad, 'line': bad['line'] + report['lines']})
+        for key in ('lines', 'rows', 'bad_rows'):
+            report[key] += partial[key]
+        for key in ('kinds', 'columns'):
+            for name, count in partial[key].items():
+                report[key][name] = report[key].get(name, 0) + count
+        report['header'] = report['header'] or partial['header']
+    report['columns'] = dict(sorted(report['columns'].items()))
+    return report
+
+
+def validate(path, workers=None, first=FIRST_BAD_ROWS, chunk_size=CHUNK_SIZE, compression=None):
+    """Validate a (possibly compressed) corpus across a process pool and return the report"""
+    compression = compression or compression_for(path)
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if compression is None:
+            tasks = [(path, start, stop, first) for start, stop in newline_ranges(path, chunk_size)]
+            partials = pool.map(_validate_range, tasks)
+        else:
+            tasks = ((data, offset, first) for data, offset in stream_blocks(path, compression, chunk_size))
+            partials = _bounded_map(pool, _validate_chunk, tasks, workers * 2)
+        return merge(partials, first)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Validate a corpus against the backend LogParser rules before upload")
+    parser.add_argument('path', help="CSV corpus (may be .gz/.bz2/.xz)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--first', type=int, default=FIRST_BAD_ROWS, help="bad rows to report in full")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="bytes per validated chunk")
+    parser.add_argument('--json', help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = validate(args.path, args.workers, args.first, args.chunk_size)
+    seconds = time.perf_counter() - start
+    report['seconds'] = round(seconds, 3)
+
+    size = os.path.getsize(args.path)
+    print(f"{args.path}: {report['rows']} rows, {report['bad_rows']} bad "
+          f"({size / seconds / 1e6:.1f} MB/s on disk){' (header row skipped)' if report['header'] else ''}")
+    for kind, count in sorted(report['kinds'].items(), key=lambda item: -item[1]):
+        print(f"  {kind:>10}: {count}")
+    if report['columns']:
+        print("  by column: " + ", ".join(f"[{column}] {count}" for column, count in report['columns'].items()))
+    for bad in report['first_bad']:
+        print(f"  line {bad['line']} (byte {bad['offset']}): {', '.join(bad['errors'])}: {bad['text'][:120]}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report['bad_rows'] else 0)
+
+
+if __name__ == "__main__":
+    main()